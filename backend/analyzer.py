@@ -8,18 +8,37 @@ import uuid
 import logging
 import json
 import re
+import codecs
 import random
-from urllib.parse import urlparse
-from typing import List, Dict, Optional, Any
+import asyncio
+import time
+import unicodedata
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import List, Dict, Optional, Any, Awaitable, Callable, Tuple
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import concurrent.futures
+from collections import OrderedDict
 import threading
 
-import requests
+import httpx
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from cancellation import CancellationToken
+from concurrency import get_concurrency_controller, classify_exception, OUTCOME_OVERLOAD, OUTCOME_TIMEOUT
+from rate_limiter import get_rate_limiter, RateLimitExceeded
+from http_client import get_http_clients
+from circuit_breaker import get_circuit_breakers, CircuitOpenError
+from deadline import Deadline, BudgetExhausted
+from cache_store import open_cache, make_key
+from single_flight import SingleFlight
+from micro_batch import MicroBatcher
+from json_stream import JSONStreamParser
+from gemini_client import GeminiClient
+from tech_detect import get_tech_detector
+from html_signals import get_html_signal_extractor
+
 # Load environment variables
 load_dotenv()
 
@@ -27,6 +46,148 @@ load_dotenv()
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
+# Sentinel closing a pipeline queue
+_END_OF_STREAM = object()
+
+# Shared part of every Gemini system instruction (single and batch)
+GEMINI_SCORING_RULES = """- Alle scores muessen INTEGER sein (0-100).
+- Nutze die AUTOMATISCHEN SIGNale aus der Anfrage:
+  - Wenn PageSpeed Score fehlt/Timeout: erwaehne das als Issue.
+  - Wenn Security Issues existieren: uebernimm sie in issues_found (mind. 1-2 davon).
+- Bitte NICHT immer die gleichen Score-Zahlen verwenden; schaetze realistisch je Website/Quelle."""
+
+# Fields every analysis must have (enforced by the response schema and checked again after parsing)
+GEMINI_REQUIRED_FIELDS = ["lead_quality", "scores", "report_card", "email_pitch"]
+
+_GEMINI_STRING_LIST = {"type": "array", "items": {"type": "string"}, "max_items": 5}
+
+# Gemini JSON mode: the model can only produce objects of this shape
+GEMINI_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "lead_quality": {"type": "string", "format": "enum", "enum": ["High", "Medium", "Low"]},
+        "tech_stack": _GEMINI_STRING_LIST,
+        "scores": {
+            "type": "object",
+            "properties": {name: {"type": "integer"} for name in ("ui", "ux", "seo", "content", "total")},
+            "required": ["ui", "ux", "seo", "content", "total"],
+        },
+        "report_card": {
+            "type": "object",
+            "properties": {
+                "executive_summary": {"type": "string", "description": "<= 160 Zeichen"},
+                "issues_found": _GEMINI_STRING_LIST,
+                "recommendations": _GEMINI_STRING_LIST,
+            },
+            "required": ["executive_summary", "issues_found", "recommendations"],
+        },
+        "email_pitch": {
+            "type": "object",
+            "properties": {
+                "subject": {"type": "string", "description": "<= 80 Zeichen"},
+                "body_text": {"type": "string", "description": "<= 300 Zeichen"},
+            },
+            "required": ["subject", "body_text"],
+        },
+    },
+    "required": GEMINI_REQUIRED_FIELDS,
+}
+
+# Batch answer: one analysis per business, identified by its place_id
+GEMINI_BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        **GEMINI_RESPONSE_SCHEMA,
+        "properties": {"place_id": {"type": "string"}, **GEMINI_RESPONSE_SCHEMA["properties"]},
+        "required": ["place_id"] + GEMINI_REQUIRED_FIELDS,
+    },
+}
+
+GEMINI_JSON_FORMAT = """{
+  "lead_quality": "High|Medium|Low",
+  "tech_stack": ["..."],
+  "scores": {
+    "ui": 0,
+    "ux": 0,
+    "seo": 0,
+    "content": 0,
+    "total": 0
+  },
+  "report_card": {
+    "executive_summary": "Kurze Zusammenfassung (<= 160 Zeichen)",
+    "issues_found": ["..."],
+    "recommendations": ["..."]
+  },
+  "email_pitch": {
+    "subject": "Betreff (<= 80 Zeichen)",
+    "body_text": "Email Text (<= 300 Zeichen)"
+  }
+}"""
+
+# Static prompt prefixes (sent as system instruction, cacheable); the per-business part is the prompt
+GEMINI_SYSTEM_INSTRUCTION = f"""Du analysierst Businesses und erstellst Lead-Reports.
+
+WICHTIG:
+- Antworte NUR mit einem JSON-Objekt (keine Markdown-Codeblocks, kein Text davor/danach).
+{GEMINI_SCORING_RULES}
+
+JSON Format:
+
+{GEMINI_JSON_FORMAT}
+"""
+
+GEMINI_BATCH_SYSTEM_INSTRUCTION = f"""Du analysierst mehrere Businesses auf einmal und erstellst fuer JEDES einen eigenen Lead-Report.
+
+WICHTIG:
+- Antworte NUR mit einem JSON-Array (keine Markdown-Codeblocks, kein Text davor/danach).
+- Genau ein Objekt pro Business, mit "place_id" exakt wie angegeben.
+- Bewerte jedes Business unabhaengig von den anderen.
+{GEMINI_SCORING_RULES}
+
+JSON Format pro Array-Element ("place_id" plus):
+
+{GEMINI_JSON_FORMAT}
+"""
+
+
+class _EngineLoop:
+    """
+    Dedicated asyncio event loop running in a daemon thread
+
+    All async analysis work (HTTP clients, Gemini calls, semaphores) lives on
+    this single loop, so it can be shared by jobs started from any thread
+    (SSE worker threads, FastAPI handlers, test scripts).
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread on first use and return the loop"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="analyzer-engine",
+                    daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """Schedule a coroutine on the engine loop (thread-safe)"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable) -> Any:
+        """Run a coroutine on the engine loop and block until it finishes"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Cannot block on the engine loop from inside the engine loop - await the coroutine instead")
+        return self.submit(coro).result()
+
 
 class DeepAnalyzer:
     """
@@ -96,9 +257,135 @@ class DeepAnalyzer:
         self.max_scan_limit = int(os.getenv("MAX_SCAN_LIMIT", 200))
         self.max_pages = int(os.getenv("MAX_PAGES", 5))
         self.rapidapi_timeout = int(os.getenv("RAPIDAPI_TIMEOUT", 30))
+        self.website_max_bytes = int(os.getenv("WEBSITE_MAX_BYTES", 200000))  # HTML read per audited site (email scan needs 200 KB)
+        
+        # Time budgets: every stage gets what is left of its lead's (and job's) deadline
+        self.lead_max_seconds = float(os.getenv("LEAD_MAX_SECONDS", 60))
+        self.job_max_seconds = float(os.getenv("JOB_MAX_SECONDS", 0))  # 0 = unbounded
+        self.gemini_timeout = float(os.getenv("GEMINI_TIMEOUT", 30))
+        self.gemini_max_output_tokens = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", 2048))  # Schema-constrained JSON, no prose
+        self.stage_min_seconds = {
+            "pagespeed": float(os.getenv("PAGESPEED_MIN_BUDGET", 10)),
+            "website": float(os.getenv("WEBSITE_MIN_BUDGET", 2)),
+            "gemini": float(os.getenv("GEMINI_MIN_BUDGET", 5)),
+        }
+
+        # Async engine: max leads analyzed concurrently per job (I/O-bound)
+        self.analysis_concurrency = int(os.getenv("ANALYSIS_CONCURRENCY", 50))
+        self.pipeline_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", 40))  # Businesses buffered between page fetch and filters
+        self.page_fanout = max(1, int(os.getenv("PAGE_FANOUT", 3)))  # RapidAPI offset windows fetched concurrently
+        self._engine = _EngineLoop()
+        
+        # Pooled keep-alive HTTP clients, shared with the rest of the process
+        self._http = get_http_clients()
+        
+        # Adaptive (AIMD) in-flight limits per external provider, shared by all jobs
+        self._concurrency = get_concurrency_controller()
+        
+        # Token buckets per provider (request rate + daily cap), shared by all jobs
+        self._rate_limiter = get_rate_limiter()
+
+        # Circuit breakers per provider: fail fast while a provider is down
+        self._breakers = get_circuit_breakers()
+
+        # Supabase writes held back while its circuit is open (place_id -> row), flushed once it recovers
+        self.write_buffer_size = int(os.getenv("SUPABASE_WRITE_BUFFER_SIZE", 1000))
+        self._write_buffer: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._write_buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        # On-disk cache of RapidAPI search pages (repeated searches cost no API calls)
+        self._page_cache = None
+        if os.getenv("RAPIDAPI_CACHE", "true").lower() == "true":
+            self._page_cache = open_cache(
+                "rapidapi_pages",
+                ttl=float(os.getenv("RAPIDAPI_CACHE_TTL", 86400)),
+                max_entries=int(os.getenv("RAPIDAPI_CACHE_SIZE", 5000))
+            )
+        
+        # PageSpeed metrics by canonical URL; stale entries are served while refreshed in the background
+        self._pagespeed_cache = None
+        if os.getenv("PAGESPEED_CACHE", "true").lower() == "true":
+            self._pagespeed_cache = open_cache(
+                "pagespeed",
+                ttl=float(os.getenv("PAGESPEED_CACHE_TTL", 7 * 86400)),
+                max_entries=int(os.getenv("PAGESPEED_CACHE_SIZE", 20000)),
+                stale_ttl=float(os.getenv("PAGESPEED_CACHE_STALE", 30 * 86400))
+            )
+        self._pagespeed_refreshing: set = set()  # Cache keys with a background refresh running
+        
+        # Parsed Gemini analyses by hash of (model, generation config, prompt); fallbacks are never stored
+        self._gemini_cache = None
+        if os.getenv("GEMINI_CACHE", "true").lower() == "true":
+            self._gemini_cache = open_cache(
+                "gemini",
+                ttl=float(os.getenv("GEMINI_CACHE_TTL", 7 * 86400)),
+                max_entries=int(os.getenv("GEMINI_CACHE_SIZE", 20000)),
+                memory_entries=int(os.getenv("GEMINI_CACHE_MEMORY_SIZE", 1000))
+            )
+        self._background_tasks: set = set()
+        
+        # One warmed model per static prompt prefix; GEMINI_PREFIX_CACHE=remote uses Gemini context caching
+        self._gemini = GeminiClient(
+            self.gemini_model,
+            prefix_cache=os.getenv("GEMINI_PREFIX_CACHE", "off").lower(),
+            cache_ttl=float(os.getenv("GEMINI_PREFIX_CACHE_TTL", 3600))
+        )
+        
+        # Gemini batching: leads analyzed at the same time share one request
+        # (one rate-limit token for up to 20 businesses; GEMINI_BATCH_SIZE=1 disables it)
+        self.gemini_batch_size = min(20, max(1, int(os.getenv("GEMINI_BATCH_SIZE", 10))))
+        self.gemini_batch_timeout = float(os.getenv("GEMINI_BATCH_TIMEOUT", 60))
+        self.gemini_batch_tokens_per_lead = int(os.getenv("GEMINI_BATCH_TOKENS_PER_LEAD", 1024))
+        self._gemini_batcher = None
+        if self.gemini_batch_size > 1:
+            self._gemini_batcher = MicroBatcher(
+                self._analyze_gemini_batch,
+                max_size=self.gemini_batch_size,
+                max_wait=float(os.getenv("GEMINI_BATCH_WAIT", 1.0)),
+                name="Gemini batch"
+            )
         
+        # Two-tier analysis: leads with a website are pre-scored from Maps data and the
+        # website fetch; below the threshold PageSpeed and Gemini are skipped.
+        # Off by default (0 = always full): enabling it changes which leads get a Gemini analysis
+        self.prescore_threshold = int(os.getenv("PRESCORE_THRESHOLD", 0))
+
+        # Local tech-stack fingerprints (signatures compiled once per process), matched in
+        # the same single pass over the HTML as the contact, mobile and SEO signals
+        self._tech_detector = get_tech_detector()
+        self._html_signals = get_html_signal_extractor()
+
+        # Concurrent analyses of the same business / website (overlapping jobs) share one computation
+        self._single_flight = SingleFlight()
+
         logger.info("DeepAnalyzer initialized successfully")
-    
+
+    def _get_http_client(self, profile: str = "api") -> httpx.AsyncClient:
+        """
+        Get a pooled async HTTP client (must be called on the engine loop)
+
+        Args:
+            profile: 'api' (RapidAPI, PageSpeed) or 'website' (audited sites)
+
+        Returns:
+            httpx.AsyncClient bound to the engine loop
+        """
+        return self._http.async_client(profile)
+
+    def warm_up(self):
+        """Open keep-alive connections to the provider APIs and create the Gemini models (once per process, at startup)"""
+        pagespeed = urlparse(self.pagespeed_endpoint)
+        self._engine.run(self._http.warm_async([
+            f"https://{self.rapidapi_host}/",
+            f"{pagespeed.scheme}://{pagespeed.netloc}/",
+        ]))
+        if self.gemini_api_key:
+            # Model handles (and cached prompt prefixes) for single and batch calls
+            self._engine.run(self._gemini.model(GEMINI_SYSTEM_INSTRUCTION))
+            if self._gemini_batcher is not None:
+                self._engine.run(self._gemini.model(GEMINI_BATCH_SYSTEM_INSTRUCTION))
+
     def process_bulk_search(
         self,
         industry: str,
@@ -107,11 +394,17 @@ class DeepAnalyzer:
         filters: Dict[str, Any],
         bulk_analysis_id: Optional[str] = None,
         stream_callback: Optional[callable] = None,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        resume_from: Optional[Dict[str, Any]] = None,
+        progress_callback: Optional[callable] = None,
+        max_seconds_per_lead: Optional[float] = None,
+        refresh_pagespeed: bool = False,
+        full_analysis: bool = False
     ) -> Dict[str, Any]:
         """
-        Main Deep Search loop - finds leads matching filters using pagination
-        
+        Blocking wrapper around process_bulk_search_async (runs on the engine loop)
+
         Args:
             industry: Search keyword (e.g., "Zahnarzt", "Restaurant")
             location: City/Location (e.g., "Zürich", "Berlin")
@@ -119,7 +412,98 @@ class DeepAnalyzer:
             filters: Sniper Mode filters dictionary
             bulk_analysis_id: UUID of the bulk analysis job
             stream_callback: Optional callback function for streaming results (called for each completed lead)
+            user_id: Authenticated user ID (for RLS)
+            cancel_token: Optional token to abort the job from another thread
+            resume_from: Checkpoint from progress_callback of an interrupted run
+            progress_callback: Optional callback receiving resume checkpoints
+            max_seconds_per_lead: Time budget per analyzed lead (default: LEAD_MAX_SECONDS)
+            refresh_pagespeed: Ignore cached PageSpeed metrics
+            full_analysis: Run PageSpeed and Gemini for every lead (no pre-score gate)
+
+        Returns:
+            Dictionary with results and statistics
+        """
+        return self._engine.run(self.process_bulk_search_async(
+            industry=industry,
+            location=location,
+            target_results=target_results,
+            filters=filters,
+            bulk_analysis_id=bulk_analysis_id,
+            stream_callback=stream_callback,
+            user_id=user_id,
+            cancel_token=cancel_token,
+            resume_from=resume_from,
+            progress_callback=progress_callback,
+            max_seconds_per_lead=max_seconds_per_lead,
+            refresh_pagespeed=refresh_pagespeed,
+            full_analysis=full_analysis
+        ))
+
+    async def process_bulk_search_async(
+        self,
+        industry: str,
+        location: str,
+        target_results: int,
+        filters: Dict[str, Any],
+        bulk_analysis_id: Optional[str] = None,
+        stream_callback: Optional[callable] = None,
+        user_id: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        resume_from: Optional[Dict[str, Any]] = None,
+        progress_callback: Optional[callable] = None,
+        max_seconds_per_lead: Optional[float] = None,
+        refresh_pagespeed: bool = False,
+        full_analysis: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Main Deep Search pipeline - finds leads matching filters using pagination
+
+        Runs as three stages joined by bounded queues so no page boundary
+        ever blocks the analysis workers:
+          1. fetch_pages: pulls RapidAPI pages, fanning out over up to
+             PAGE_FANOUT predicted offset windows at once (the next batch
+             is fetched as soon as the previous one is filtered, while its
+             leads are still being analyzed)
+          2. filter_businesses: applies Sniper Filters and only dispatches
+             as many leads as are still needed to reach the target
+          3. analysis_worker (x ANALYSIS_CONCURRENCY): analyzes leads
+
+        stream_callback is invoked from the engine thread for each completed lead.
         
+        Reaching the target cancels cancel_token ("target_reached"). Any
+        cancellation (target reached, client disconnect, cancel endpoint)
+        cancels all stages, dropping queued businesses and aborting
+        in-flight PageSpeed / website / Gemini calls.
+
+        progress_callback receives a checkpoint ({"page", "scanned",
+        "done_place_ids"}) whenever the resume point advances: the first
+        page that still has unfinished businesses plus every business that
+        is already filtered out or analyzed. Passing it back as resume_from
+        restarts from that page and skips the finished businesses, so an
+        interrupted job neither loses nor repeats work. target_results is
+        then the number of leads still missing.
+
+        Every lead is analyzed within max_seconds_per_lead (stages share
+        the budget, optional stages are skipped when it runs low). With
+        JOB_MAX_SECONDS set, the whole run stops at the job deadline
+        ("job_deadline_reached", status partial) and lead budgets never
+        extend past it.
+
+        Args:
+            industry: Search keyword (e.g., "Zahnarzt", "Restaurant")
+            location: City/Location (e.g., "Zürich", "Berlin")
+            target_results: Number of leads to find (1-1000)
+            filters: Sniper Mode filters dictionary
+            bulk_analysis_id: UUID of the bulk analysis job
+            stream_callback: Optional callback function for streaming results (called for each completed lead)
+            user_id: Authenticated user ID (for RLS)
+            cancel_token: Optional token to abort the job from another thread
+            resume_from: Checkpoint from progress_callback of an interrupted run
+            progress_callback: Optional callback receiving resume checkpoints
+            max_seconds_per_lead: Time budget per analyzed lead (default: LEAD_MAX_SECONDS)
+            refresh_pagespeed: Ignore cached PageSpeed metrics
+            full_analysis: Run PageSpeed and Gemini for every lead (no pre-score gate)
+
         Returns:
             Dictionary with results and statistics (includes stream_events if callback provided)
         """
@@ -133,134 +517,299 @@ class DeepAnalyzer:
         logger.info(f"Starting bulk search: {industry} in {location}, target: {target_results}")
         
         # Initialize counters
+        resume_from = resume_from or {}
         found_leads = []
-        scanned_count = 0
-        page_count = 0
-        current_offset = 0  # Track offset for pagination
+        scanned_count = resume_from.get("scanned", 0)
+        page_count = resume_from.get("page", 0)
         stop_reason = None
+        in_flight = 0  # Leads dispatched to workers but not finished yet
+        
+        # Resume bookkeeping: businesses still pending per page, finished place IDs
+        resumed_place_ids = set(resume_from.get("done_place_ids", []))
+        done_place_ids = set(resumed_place_ids)
+        page_pending: Dict[int, int] = {}
+        page_scanned_start: Dict[int, int] = {}
+        
+        if resume_from:
+            print(f"⏯️  Resuming from page {page_count + 1} ({len(resumed_place_ids)} businesses already processed)")
+            logger.info(f"Resuming bulk search at page {page_count + 1}, scanned {scanned_count}")
         
         # Build search query
         query = f"{industry} {location}"
         print(f"🔍 Search Query: {query}\n")
         
-        # Pagination loop
-        while len(found_leads) < target_results and scanned_count < self.max_scan_limit:
-            if page_count >= self.max_pages:
-                stop_reason = f"max_pages_reached ({self.max_pages})"
-                logger.warning(f"Stopping early: reached max pages ({self.max_pages})")
-                break
-
-            page_count += 1
-            print(f"\n📄 Page {page_count} | Progress: {len(found_leads)}/{target_results} leads found")
-            logger.info(f"Fetching page {page_count} (found: {len(found_leads)}/{target_results})")
+        # Pipeline plumbing
+        worker_count = max(1, min(self.analysis_concurrency, target_results))
+        business_queue: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        lead_queue: asyncio.Queue = asyncio.Queue(maxsize=worker_count)
+        capacity = asyncio.Condition()
+        
+        # Cancellation may be requested from any thread; mirror it onto the loop
+        cancel_token = cancel_token or CancellationToken()
+        stop_requested = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        remove_cancel_callback = cancel_token.add_callback(
+            lambda: loop.call_soon_threadsafe(stop_requested.set)
+        )
+        
+        # Time budgets: the job's deadline bounds every lead's deadline
+        job_deadline = Deadline(self.job_max_seconds)
+        lead_seconds = max_seconds_per_lead or self.lead_max_seconds
+        page_cache_stats = {"hits": 0, "misses": 0}
+        job_timer = None
+        if job_deadline.bounded:
+            job_timer = loop.call_later(
+                job_deadline.remaining(),
+                lambda: cancel_token.cancel("job_deadline_reached")
+            )
+        
+        def mark_done(page_index: int, business: Dict):
+            """Record a finished business and publish the new resume point"""
+            place_id = business.get("place_id") or business.get("google_id")
+            if place_id:
+                done_place_ids.add(place_id)
+            page_pending[page_index] -= 1
+            
+            if progress_callback:
+                pending_pages = [page for page, pending in page_pending.items() if pending > 0]
+                resume_page = min(pending_pages) if pending_pages else page_count
+                try:
+                    progress_callback({
+                        "page": resume_page,
+                        "scanned": page_scanned_start.get(resume_page, scanned_count),
+                        "done_place_ids": sorted(done_place_ids),
+                        "total_scanned": scanned_count,  # Progress only (not used for resuming)
+                    })
+                except Exception as e:
+                    logger.error(f"Progress callback error: {str(e)}")
+        
+        async def fetch_pages():
+            """Stage 1: fetch RapidAPI pages (up to PAGE_FANOUT windows at once) and feed businesses into the pipeline"""
+            nonlocal scanned_count, page_count, stop_reason
+            seen_place_ids = set()  # Overlapping windows must never be analyzed twice
             
-            # Fetch page from RapidAPI with offset
             try:
-                businesses, _, next_offset = self._fetch_google_maps_page(
-                    query=query,
-                    offset=current_offset
-                )
-                
-                # 🎯 Apply Hybrid Ranking for diversification
-                # This adds a small random component while preserving relevance
-                if businesses:
-                    businesses = self._apply_hybrid_ranking(businesses)
-                    print(f"   🎯 Hybrid ranking applied (quality + popularity + randomness)")
-                
-                # 🎲 Smart Shuffling: Mix results while keeping top 5 stable
-                # This ensures variety while maintaining the most relevant results
-                if businesses and len(businesses) > 5:
-                    businesses = self._shuffle_results(businesses, keep_top_n=5)
-                    print(f"   🎲 Results shuffled (kept top 5 stable for relevance)")
-                
+                while not stop_requested.is_set():
+                    if scanned_count >= self.max_scan_limit:
+                        stop_reason = f"max_scanned_reached ({self.max_scan_limit})"
+                        logger.warning(f"Reached max scan limit: {self.max_scan_limit}")
+                        break
+                    
+                    if page_count >= self.max_pages:
+                        stop_reason = f"max_pages_reached ({self.max_pages})"
+                        logger.warning(f"Stopping early: reached max pages ({self.max_pages})")
+                        break
+                    
+                    # Wait until the filter stage consumed the previous pages and more
+                    # leads are actually needed, so we never pay for unneeded pages
+                    await business_queue.join()
+                    async with capacity:
+                        await capacity.wait_for(lambda: len(found_leads) + in_flight < target_results)
+                    
+                    # Predict the next offset windows and fetch them concurrently
+                    offsets = self._plan_page_offsets(
+                        first_page=page_count,
+                        needed=target_results - len(found_leads) - in_flight,
+                        scanned=scanned_count
+                    )
+                    print(f"\n📄 Page {page_count + 1}{f'-{page_count + len(offsets)}' if len(offsets) > 1 else ''} | Progress: {len(found_leads)}/{target_results} leads found")
+                    logger.info(f"Fetching {len(offsets)} page(s) at offsets {offsets} (found: {len(found_leads)}/{target_results})")
+                    
+                    pages = await asyncio.gather(
+                        *[self._fetch_google_maps_page(query=query, offset=offset, deadline=job_deadline, cache_stats=page_cache_stats)
+                          for offset in offsets],
+                        return_exceptions=True
+                    )
+                    
+                    # Consume windows in offset order; anything after an empty page is past the end
+                    end_of_results = False
+                    for offset, page in zip(offsets, pages):
+                        page_index = page_count
+                        page_count += 1
+                        
+                        # A slow window is not the end of the results: retry it once on its own
+                        if isinstance(page, httpx.TimeoutException) and not stop_requested.is_set() and job_deadline.allows(1):
+                            print(f"   🔁 Retrying timed-out window (offset {offset})")
+                            try:
+                                page = await self._fetch_google_maps_page(query=query, offset=offset, deadline=job_deadline, cache_stats=page_cache_stats)
+                            except Exception as e:
+                                page = e
+                        
+                        if isinstance(page, httpx.TimeoutException):
+                            stop_reason = "rapidapi_timeout"
+                            print(f"⏱️  RapidAPI window at offset {offset} timed out twice, stopping")
+                            logger.warning(f"RapidAPI window at offset {offset} timed out twice")
+                            end_of_results = True
+                            break
+                        
+                        if isinstance(page, RateLimitExceeded):
+                            stop_reason = "rapidapi_rate_limited"
+                            print(f"🚦 {str(page)}")
+                            logger.warning(str(page))
+                            end_of_results = True
+                            break
+                        
+                        if isinstance(page, CircuitOpenError):
+                            stop_reason = "rapidapi_circuit_open"
+                            print(f"🔌 {str(page)}")
+                            logger.warning(str(page))
+                            end_of_results = True
+                            break
+                        
+                        if isinstance(page, Exception):
+                            print(f"❌ Failed to fetch page {page_count}: {str(page)}")
+                            logger.error(f"Failed to fetch page {page_count}: {str(page)}")
+                            end_of_results = True
+                            break
+                        
+                        businesses, _, next_offset = page
+                        
+                        # Check if we got results
+                        if not businesses:
+                            stop_reason = "no_more_results"
+                            print("⚠️  No more results from API")
+                            logger.warning("No more results from API")
+                            end_of_results = True
+                            break
+                        
+                        # De-duplicate by place_id across overlapping windows
+                        # (and skip businesses an interrupted run already finished)
+                        unique_businesses = []
+                        already_processed = 0
+                        for business in businesses:
+                            place_id = business.get("place_id") or business.get("google_id")
+                            if place_id:
+                                if place_id in seen_place_ids:
+                                    continue
+                                seen_place_ids.add(place_id)
+                                if place_id in resumed_place_ids:
+                                    already_processed += 1
+                                    continue
+                            unique_businesses.append(business)
+                        
+                        duplicates = len(businesses) - len(unique_businesses) - already_processed
+                        if duplicates:
+                            print(f"   ♻️  Skipped {duplicates} duplicate businesses (offset {offset})")
+                        if already_processed:
+                            print(f"   ⏯️  Skipped {already_processed} businesses processed before the restart")
+                        businesses = unique_businesses
+                        
+                        # 🎯 Apply Hybrid Ranking for diversification
+                        # This adds a small random component while preserving relevance
+                        if businesses:
+                            businesses = self._apply_hybrid_ranking(businesses)
+                            print(f"   🎯 Hybrid ranking applied (quality + popularity + randomness)")
+                        
+                        # 🎲 Smart Shuffling: Mix results while keeping top 5 stable
+                        # This ensures variety while maintaining the most relevant results
+                        if businesses and len(businesses) > 5:
+                            businesses = self._shuffle_results(businesses, keep_top_n=5)
+                            print(f"   🎲 Results shuffled (kept top 5 stable for relevance)")
+                        
+                        page_scanned_start[page_index] = scanned_count
+                        page_pending[page_index] = len(businesses)
+                        scanned_count += len(businesses) + already_processed
+                        print(f"   Scanned: {len(businesses)} businesses (total: {scanned_count})")
+                        logger.info(f"Scanned {len(businesses)} businesses (total scanned: {scanned_count})")
+                        
+                        # Hand off to the filter stage (blocks only when the pipeline is full)
+                        for business in businesses:
+                            await business_queue.put((page_index, business))
+                        
+                        if next_offset is None:
+                            stop_reason = stop_reason or "no_more_pages"
+                            logger.info("No more pages available")
+                            end_of_results = True
+                            break
+                    
+                    if end_of_results:
+                        break
             except Exception as e:
-                print(f"❌ Failed to fetch page {page_count}: {str(e)}")
-                logger.error(f"Failed to fetch page {page_count}: {str(e)}")
-                break
-            
-            # Update offset for next iteration
-            if next_offset is not None:
-                current_offset = next_offset
-            
-            # Check if we got results
-            if not businesses:
-                stop_reason = "no_more_results"
-                print("⚠️  No more results from API")
-                logger.warning("No more results from API")
-                break
+                logger.error(f"Page fetch stage failed: {str(e)}")
             
-            scanned_count += len(businesses)
-            print(f"   Scanned: {len(businesses)} businesses (total: {scanned_count})")
-            logger.info(f"Scanned {len(businesses)} businesses (total scanned: {scanned_count})")
+            await business_queue.put(_END_OF_STREAM)
+        
+        async def filter_businesses():
+            """Stage 2: apply Sniper Filters and dispatch passing businesses to the workers"""
+            nonlocal in_flight
+            idx = 0
             
-            # Apply Sniper Filters to collect valid businesses
             print(f"\n🔍 Applying Sniper Filters...")
-            passed_businesses = []
-            
-            for idx, business in enumerate(businesses, 1):
-                # Check if we've reached target
-                if len(found_leads) >= target_results:
-                    print(f"   🎯 Target reached! Stopping scan.")
+            while True:
+                item = await business_queue.get()
+                if item is _END_OF_STREAM:
                     break
                 
-                business_name = business.get('name', 'Unknown')
-                
-                # Apply filters
-                if not self._passes_filters(business, filters):
-                    continue
-                
-                print(f"   ✅ {idx}. {business_name[:40]} - PASSED filters")
-                passed_businesses.append(business)
-                
-                # Stop collecting if we have enough to reach target
-                if len(passed_businesses) + len(found_leads) >= target_results:
-                    break
-            
-            if len(passed_businesses) == 0:
-                print(f"   ⚠️  No businesses passed filters on this page")
-                continue
-            
-            # Process leads in parallel (3 at a time)
-            print(f"\n🚀 Processing {len(passed_businesses)} leads in parallel (max 3 concurrent)...")
-            
-            def analyze_business(business):
-                """Helper function to analyze a single business (thread-safe)"""
-                business_name = business.get('name', 'Unknown')
                 try:
-                    website = business.get("website")
+                    idx += 1
+                    page_index, business = item
+                    business_name = business.get('name', 'Unknown')
                     
-                    if website:
-                        # Full AI Analysis (PageSpeed + Security + Gemini)
-                        lead_data = self.analyze_single(
-                            url=website,
-                            map_data=business,
-                            bulk_analysis_id=None,
-                            industry=industry,
-                            user_id=user_id
-                        )
-                    else:
-                        # No website - save basic data without AI analysis
-                        print(f"   ⏭️  {business_name[:40]}: No website - saving basic data only")
-                        lead_data = self._save_lead_to_database(
-                            business=business,
-                            industry=industry,
-                            bulk_analysis_id=None,
-                            user_id=user_id
-                        )
+                    # Apply filters
+                    if not self._passes_filters(business, filters):
+                        mark_done(page_index, business)
+                        continue
                     
-                    return {"success": True, "data": lead_data, "name": business_name}
-                except Exception as e:
-                    logger.error(f"Failed to process {business_name}: {str(e)}")
-                    return {"success": False, "error": str(e), "name": business_name}
+                    # Only dispatch as many leads as are still needed to reach the target
+                    async with capacity:
+                        await capacity.wait_for(lambda: len(found_leads) + in_flight < target_results)
+                        in_flight += 1
+                    
+                    print(f"   ✅ {idx}. {business_name[:40]} - PASSED filters")
+                    await lead_queue.put(item)
+                finally:
+                    business_queue.task_done()
             
-            # Use ThreadPoolExecutor for parallel processing
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                # Submit all businesses to the thread pool
-                futures = {executor.submit(analyze_business, biz): biz for biz in passed_businesses}
+            for _ in range(worker_count):
+                await lead_queue.put(_END_OF_STREAM)
+        
+        async def analyze_business(business):
+            """Helper coroutine to analyze a single business"""
+            business_name = business.get('name', 'Unknown')
+            try:
+                website = business.get("website")
+                
+                if website:
+                    # Full AI Analysis (PageSpeed + Security + Gemini)
+                    lead_data = await self.analyze_single_async(
+                        url=website,
+                        map_data=business,
+                        bulk_analysis_id=None,
+                        industry=industry,
+                        user_id=user_id,
+                        deadline=job_deadline.child(lead_seconds),
+                        refresh_pagespeed=refresh_pagespeed,
+                        full_analysis=full_analysis
+                    )
+                else:
+                    # No website - save basic data without AI analysis
+                    print(f"   ⏭️  {business_name[:40]}: No website - saving basic data only")
+                    lead_data = await asyncio.to_thread(
+                        self._save_lead_to_database,
+                        business=business,
+                        industry=industry,
+                        bulk_analysis_id=None,
+                        user_id=user_id
+                    )
+                
+                return {"success": True, "data": lead_data, "name": business_name}
+            except Exception as e:
+                logger.error(f"Failed to process {business_name}: {str(e)}")
+                return {"success": False, "error": str(e), "name": business_name}
+        
+        async def analysis_worker():
+            """Stage 3: analyze leads until the filter stage signals end of stream"""
+            nonlocal in_flight
+            while True:
+                item = await lead_queue.get()
+                if item is _END_OF_STREAM:
+                    return
+                
+                page_index, business = item
+                result = await analyze_business(business)
                 
-                # Process results as they complete
-                for future in as_completed(futures):
-                    result = future.result()
+                async with capacity:
+                    in_flight -= 1
                     
                     if result["success"]:
                         found_leads.append(result["data"])
@@ -273,28 +822,66 @@ class DeepAnalyzer:
                                 stream_callback(result["data"])
                             except Exception as e:
                                 logger.error(f"Stream callback error: {str(e)}")
+                        
+                        # Check if we've reached target
+                        if len(found_leads) >= target_results:
+                            print(f"   🎯 Target reached! Stopping scan.")
+                            cancel_token.cancel("target_reached")
                     else:
                         print(f"   ❌ Analysis failed: {result['name'][:40]} - {result['error'][:80]}")
                     
-                    # Check if we've reached target
-                    if len(found_leads) >= target_results:
-                        break
-            
-            # Check termination conditions
-            if next_offset is None:
-                stop_reason = stop_reason or "no_more_pages"
-                logger.info("No more pages available")
-                break
-            
-            if scanned_count >= self.max_scan_limit:
-                stop_reason = f"max_scanned_reached ({self.max_scan_limit})"
-                logger.warning(f"Reached max scan limit: {self.max_scan_limit}")
-                break
+                    # Only after the lead was streamed, so a checkpoint never skips an unreported lead
+                    mark_done(page_index, business)
+                    
+                    # A finished lead frees capacity for the filter stage
+                    capacity.notify_all()
+        
+        print(f"🚀 Pipeline started ({worker_count} analysis workers)")
+        stages = [
+            asyncio.create_task(fetch_pages()),
+            asyncio.create_task(filter_businesses()),
+            *[asyncio.create_task(analysis_worker()) for _ in range(worker_count)]
+        ]
+        pipeline = asyncio.gather(*stages, return_exceptions=True)
+        stop_waiter = asyncio.create_task(stop_requested.wait())
+        
+        try:
+            # Runs until every stage drained naturally or the job was cancelled
+            await asyncio.wait({pipeline, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Abort queued work and in-flight calls; never leave orphaned stages running
+            remove_cancel_callback()
+            if job_timer is not None:
+                job_timer.cancel()
+            stop_waiter.cancel()
+            for stage in stages:
+                stage.cancel()
+            stage_results = await pipeline
+        
+        for outcome in stage_results:
+            if isinstance(outcome, Exception):
+                raise outcome
+        
+        # Writes held back by an open Supabase circuit get another chance before the job ends
+        if self._write_buffer:
+            await asyncio.to_thread(self._flush_write_buffer)
         
         # Final statistics
-        status = "completed" if len(found_leads) >= target_results else "partial"
+        if len(found_leads) >= target_results:
+            status = "completed"
+        elif cancel_token.reason == "job_deadline_reached":
+            status = "partial"
+            stop_reason = "job_deadline_reached"
+        elif cancel_token.cancelled and cancel_token.reason != "target_reached":
+            status = "cancelled"
+            stop_reason = f"cancelled ({cancel_token.reason})"
+        else:
+            status = "partial"
+        
         if status == "completed":
             message = f"Found {len(found_leads)}/{target_results} leads"
+        elif status == "cancelled":
+            message = f"Search cancelled: found {len(found_leads)}/{target_results} leads ({cancel_token.reason})"
         else:
             reason = stop_reason or "insufficient_results"
             message = (
@@ -309,7 +896,16 @@ class DeepAnalyzer:
             "leads": found_leads,
             "status": status,
             "message": message,
-            "stop_reason": stop_reason
+            "stop_reason": stop_reason,
+            "circuit_breakers": self._breakers.snapshot(),
+            "cache": {"rapidapi": page_cache_stats},
+            "gemini_batching": self._gemini_batcher.snapshot() if self._gemini_batcher else None,
+            "gemini_usage": self._gemini.snapshot(),
+            "prescore": {
+                "threshold": self.prescore_threshold if not full_analysis else 0,
+                "local": sum(1 for lead in found_leads if lead.get("analysis_tier") == "local"),
+                "full": sum(1 for lead in found_leads if lead.get("analysis_tier") == "full"),
+            }
         }
         
         # Print final summary
@@ -318,28 +914,89 @@ class DeepAnalyzer:
         print(f"   Status: {result['status'].upper()}")
         print(f"   Found: {result['total_found']}/{target_results} leads")
         print(f"   Scanned: {result['total_scanned']} businesses")
-        print(f"   Pages: {result['pages_fetched']}")
+        print(f"   Pages: {result['pages_fetched']} (cache hits: {page_cache_stats['hits']})")
+        if result["prescore"]["local"]:
+            print(f"   Pre-score: {result['prescore']['local']} local only, {result['prescore']['full']} full analyses")
         print("🏁 "*30 + "\n")
         
         logger.info(f"Bulk search completed: {result['total_found']}/{target_results} leads found")
         return result
     
-    def _fetch_google_maps_page(
+    @staticmethod
+    def _page_limit(offset: int) -> int:
+        """
+        RapidAPI page size for an offset window
+        
+        First page: 20 results
+        Later pages: Can request up to 50 for more diversity (we use 40)
+        """
+        return 20 if offset == 0 else 40
+    
+    @staticmethod
+    def _page_cache_key(params: Dict[str, str]) -> str:
+        """Cache key of a RapidAPI search request (query case, spacing and Unicode form ignored)"""
+        query = " ".join(unicodedata.normalize("NFC", params["query"]).casefold().split())
+        return make_key(query, int(params["offset"]), int(params["limit"]), params["language"].lower(), params["region"].lower())
+    
+    def _plan_page_offsets(self, first_page: int, needed: int, scanned: int) -> List[int]:
+        """
+        Predict the next RapidAPI offset windows to fetch concurrently
+        
+        Windows follow _page_limit (0, 20, 60, 100, ...). Never plans more
+        windows than PAGE_FANOUT, MAX_PAGES or MAX_SCAN_LIMIT allow, nor more
+        than could be needed if every business passed the filters.
+        
+        Args:
+            first_page: Zero-based index of the next page
+            needed: Leads still needed to reach the target
+            scanned: Businesses scanned so far
+        
+        Returns:
+            List of offsets (at least one)
+        """
+        offsets: List[int] = []
+        covered = 0
+        page = first_page
+        
+        while len(offsets) < self.page_fanout and page < self.max_pages:
+            offset = 0 if page == 0 else self._page_limit(0) + self._page_limit(1) * (page - 1)
+            offsets.append(offset)
+            covered += self._page_limit(offset)
+            page += 1
+            
+            if covered >= needed or scanned + covered >= self.max_scan_limit:
+                break
+        
+        return offsets
+    
+    async def _fetch_google_maps_page(
         self,
         query: str,
         next_page_token: Optional[str] = None,
-        offset: int = 0
+        offset: int = 0,
+        deadline: Optional[Deadline] = None,
+        cache_stats: Optional[Dict[str, int]] = None
     ) -> tuple[List[Dict], Optional[str], int]:
         """
         Fetch a page of results from RapidAPI Google Maps with smart offset for result diversification
         
+        Pages are served from the on-disk page cache when an identical
+        request (normalized query, offset, limit, language, region) was
+        made within RAPIDAPI_CACHE_TTL; a hit skips rate limiting and the
+        API call entirely.
+        
         Args:
             query: Search query
             next_page_token: Pagination token from previous request (not used by this API)
             offset: Starting position for results (0, 20, 40, etc.)
+            deadline: Job deadline (bounds the 15s request timeout)
+            cache_stats: Optional per-job counters ("hits" / "misses") to update
         
         Returns:
             Tuple of (businesses list, next_page_token, next_offset)
+        
+        Raises:
+            httpx.TimeoutException: The window timed out (distinct from an empty page)
         """
         # Use the configured endpoint URL (from .env)
         # Local Business Data API uses /search (not /maps/search)
@@ -351,9 +1008,7 @@ class DeepAnalyzer:
         }
         
         # Dynamic limit based on offset to get more variety
-        # First page: 20 results
-        # Later pages: Can request up to 50 for more diversity
-        limit = 20 if offset == 0 else 40
+        limit = self._page_limit(offset)
         
         params = {
             "query": query,
@@ -363,18 +1018,33 @@ class DeepAnalyzer:
             "offset": str(offset)  # Key parameter for result diversification!
         }
         
+        cache_key = None
+        if self._page_cache is not None:
+            cache_key = self._page_cache_key(params)
+            businesses = await asyncio.to_thread(self._page_cache.get, cache_key)
+            if cache_stats is not None:
+                cache_stats["hits" if businesses is not None else "misses"] += 1
+            if businesses is not None:
+                print(f"⚡ RapidAPI cache hit: {len(businesses)} businesses (offset {offset})")
+                return businesses, None, (offset + len(businesses) if businesses else None)
+        
         print(f"⏳ Calling RapidAPI: {url}")
         print(f"   Query: {query}")
         print(f"   Offset: {offset} | Limit: {limit}")
         
         try:
-            response = requests.get(
-                url,
-                headers=headers,
-                params=params,
-                timeout=15  # 15 second timeout
-            )
-            response.raise_for_status()
+            rate_bucket = self._rate_limiter.bucket("rapidapi")
+            with self._breakers.breaker("rapidapi").guard():
+                await rate_bucket.acquire()
+                async with self._concurrency.limiter("rapidapi").slot():
+                    response = await self._get_http_client().get(
+                        url,
+                        headers=headers,
+                        params=params,
+                        timeout=(deadline or Deadline()).timeout(15)  # 15 second timeout
+                    )
+                    rate_bucket.update_from_headers(response.headers, response.status_code)
+                    response.raise_for_status()
             
             response_data = response.json()
             
@@ -383,17 +1053,21 @@ class DeepAnalyzer:
             
             print(f"✅ RapidAPI done: {len(businesses)} businesses found")
             
+            if cache_key is not None:
+                await asyncio.to_thread(self._page_cache.set, cache_key, businesses)
+            
             # Calculate next offset for pagination
             next_offset = offset + len(businesses) if businesses else None
             
             return businesses, None, next_offset
             
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
+            # Re-raised: with concurrent windows an empty page would end the whole search
             print(f"❌ RapidAPI Timeout after 15s")
-            logger.error(f"RapidAPI timeout for query: {query}")
-            return [], None, None
+            logger.error(f"RapidAPI timeout for query: {query} (offset {offset})")
+            raise
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ RapidAPI Error: {str(e)}")
             logger.error(f"RapidAPI request failed: {str(e)}")
             raise
@@ -684,12 +1358,8 @@ class DeepAnalyzer:
             return lead_data
         
         try:
-            response = self.supabase.table("analyses").upsert(
-                lead_data,
-                on_conflict="google_maps_place_id"
-            ).execute()
-            
-            logger.debug(f"✅ Lead saved to database: {lead_id}")
+            if self._upsert_analysis(lead_data):
+                logger.debug(f"✅ Lead saved to database: {lead_id}")
             return lead_data
             
         except Exception as e:
@@ -697,6 +1367,112 @@ class DeepAnalyzer:
             # Return data anyway (graceful degradation)
             return lead_data
     
+    def _upsert_analysis(self, row: Dict[str, Any]) -> bool:
+        """
+        Upsert one analyses row through the Supabase circuit breaker (blocking, run in a thread)
+        
+        While the circuit is open (or Supabase is unreachable, overloaded or
+        reports PGRST000-003) the row is held in the in-process write buffer instead; the buffer is flushed
+        after the next successful write and at the end of every bulk search.
+        Buffered rows are lost if the process exits before Supabase recovers.
+        
+        Args:
+            row: analyses row (upserted on google_maps_place_id)
+        
+        Returns:
+            True if saved, False if buffered
+        
+        Raises:
+            Exception: If Supabase rejected the row (constraint, RLS, schema)
+        """
+        try:
+            with self._breakers.breaker("supabase").guard():
+                self.supabase.table("analyses").upsert(row, on_conflict="google_maps_place_id").execute()
+        except Exception as e:
+            if not self._is_database_outage(e):
+                raise
+            self._buffer_write(row)
+            print(f"🔌 Database write buffered ({len(self._write_buffer)} pending): {str(e)[:100]}")
+            logger.warning(f"Supabase write buffered for {row.get('id')}: {str(e)}")
+            return False
+        
+        if self._write_buffer:
+            self._flush_write_buffer()
+        return True
+    
+    @staticmethod
+    def _is_database_outage(error: Exception) -> bool:
+        """True if a Supabase write failed because the database is unavailable, not because it rejected the row"""
+        if isinstance(error, (CircuitOpenError, httpx.TransportError)):
+            return True
+        return classify_exception(error) in (OUTCOME_OVERLOAD, OUTCOME_TIMEOUT)
+    
+    def _buffer_write(self, row: Dict[str, Any]):
+        """Hold a row until Supabase recovers (newest row per place wins, oldest dropped when full)"""
+        key = row.get("google_maps_place_id") or row["id"]
+        with self._write_buffer_lock:
+            self._write_buffer[key] = row
+            self._write_buffer.move_to_end(key)
+            while len(self._write_buffer) > self.write_buffer_size:
+                dropped_key, _ = self._write_buffer.popitem(last=False)
+                logger.error(f"⚠️  Write buffer full - dropped pending write for {dropped_key}")
+    
+    def _flush_write_buffer(self, batch_size: int = 100):
+        """Write buffered rows in batches until the buffer is empty or Supabase fails again"""
+        if not self._flush_lock.acquire(blocking=False):
+            return  # Another thread is already flushing
+        
+        flushed = 0
+        try:
+            while True:
+                with self._write_buffer_lock:
+                    batch = list(self._write_buffer.items())[:batch_size]
+                if not batch:
+                    break
+                
+                # A rejected batch is split in halves until the rejected rows are isolated,
+                # so one bad row never costs the valid rows written with it
+                done = []
+                parts = [batch]
+                paused = False
+                while parts:
+                    part = parts.pop()
+                    try:
+                        with self._breakers.breaker("supabase").guard():
+                            self.supabase.table("analyses").upsert(
+                                [row for _, row in part],
+                                on_conflict="google_maps_place_id"
+                            ).execute()
+                    except Exception as e:
+                        if self._is_database_outage(e):
+                            logger.warning(f"Write buffer flush paused ({len(self._write_buffer)} pending): {str(e)}")
+                            paused = True
+                            break
+                        if len(part) > 1:
+                            middle = len(part) // 2
+                            parts.extend([part[middle:], part[:middle]])
+                            continue
+                        # Rejected rows would block the buffer forever
+                        logger.error(f"⚠️  Dropped buffered write for {part[0][0]} rejected by Supabase: {str(e)}")
+                    else:
+                        flushed += len(part)
+                    done.extend(part)
+                
+                with self._write_buffer_lock:
+                    for key, row in done:
+                        # Keep a newer row for the same place buffered meanwhile
+                        if self._write_buffer.get(key) is row:
+                            del self._write_buffer[key]
+                
+                if paused:
+                    break
+        finally:
+            self._flush_lock.release()
+        
+        if flushed:
+            print(f"💾 Flushed {flushed} buffered database writes")
+            logger.info(f"Flushed {flushed} buffered Supabase writes")
+    
     def _calculate_initial_score(self, business: Dict) -> int:
         """
         Calculate initial quality score based on Google Maps data
@@ -758,50 +1534,114 @@ class DeepAnalyzer:
         map_data: Dict[str, Any],
         bulk_analysis_id: Optional[str] = None,
         industry: Optional[str] = None,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        refresh_pagespeed: bool = False,
+        full_analysis: bool = False
     ) -> Dict[str, Any]:
         """
-        Complete AI analysis combining PageSpeed Insights and Gemini AI
+        Blocking wrapper around analyze_single_async (runs on the engine loop)
         
         Args:
             url: Website URL (can be None/Empty)
             map_data: Business data from Google Maps
             bulk_analysis_id: UUID of the bulk analysis job
+            deadline: Time budget for the lead (default: LEAD_MAX_SECONDS from now)
+            refresh_pagespeed: Ignore cached PageSpeed metrics
+            full_analysis: Skip the pre-score gate (on-demand full analysis of a pre-scored lead)
         
         Returns:
             Complete analysis with scores, report, and pitch
         """
-        print("\n" + "="*60)
-        print(f"🔍 Starting AI Analysis")
-        print(f"   Business: {map_data.get('name', 'Unknown')}")
-        print(f"   Website: {url if url else '❌ NO WEBSITE'}")
-        print("="*60)
-        
-        logger.info(f"Starting AI analysis for: {map_data.get('name', 'Unknown')}")
-        
-        # Clean URL
-        url = url.strip() if url else None
-        has_website = bool(url and url != "")
-        
-        # Step 1: PageSpeed Insights (if website exists)
-        pagespeed_data = None
-        if has_website:
-            print("\n📊 Step 1/4: PageSpeed Insights")
-            pagespeed_data = self._fetch_pagespeed_data(url)
-        else:
-            print("\n📊 Step 1/4: PageSpeed (skipped - no website)")
+        return self._engine.run(self.analyze_single_async(
+            url=url,
+            map_data=map_data,
+            bulk_analysis_id=bulk_analysis_id,
+            industry=industry,
+            user_id=user_id,
+            deadline=deadline,
+            refresh_pagespeed=refresh_pagespeed,
+            full_analysis=full_analysis
+        ))
+    
+    async def analyze_single_async(
+        self,
+        url: Optional[str],
+        map_data: Dict[str, Any],
+        bulk_analysis_id: Optional[str] = None,
+        industry: Optional[str] = None,
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        refresh_pagespeed: bool = False,
+        full_analysis: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Complete AI analysis combining PageSpeed Insights and Gemini AI
         
-        # Step 2: Security Header Audit (if website exists)
-        security_data = None
-        if has_website:
-            print("\n🔒 Step 2/4: Security Header Audit")
-            security_data = self._fetch_website_for_security_check(url)
-        else:
-            print("\n🔒 Step 2/4: Security Audit (skipped - no website)")
+        Stages run as a small dependency graph: PageSpeed and the website
+        fetch are independent and start together, Gemini starts once both
+        finished. Wall time is roughly max(PageSpeed, fetch) + Gemini.
         
-        # Step 3: Gemini AI Analysis
-        print("\n🤖 Step 3/4: Gemini AI Analysis")
-        gemini_data = self._analyze_with_gemini(url, map_data, pagespeed_data, security_data)
+        All stages share the lead's deadline: PageSpeed and the website
+        fetch get the remaining budget minus Gemini's minimum, Gemini gets
+        the rest. A stage whose minimum budget is no longer available is
+        skipped (PageSpeed/website data missing, Gemini falls back to the
+        rule-based analysis). Saving always runs.
+        
+        With PRESCORE_THRESHOLD set and unless full_analysis is set, a
+        lead with a website is analyzed in two tiers: the website fetch
+        feeds a local pre-score (_local_prescore); below the threshold the
+        lead is stored with local scores only and PageSpeed and Gemini are
+        never called. Calling again with full_analysis=True runs them on
+        demand.
+        
+        Args:
+            url: Website URL (can be None/Empty)
+            map_data: Business data from Google Maps
+            bulk_analysis_id: UUID of the bulk analysis job
+            deadline: Time budget for the lead (default: LEAD_MAX_SECONDS from now)
+            refresh_pagespeed: Ignore cached PageSpeed metrics
+            full_analysis: Skip the pre-score gate (on-demand full analysis of a pre-scored lead)
+        
+        Returns:
+            Complete analysis with scores, report, pitch, the pre-score and
+            analysis_tier ("local" or "full"; a local-tier lead is stored
+            with status "local_only"; both are persisted only while
+            PRESCORE_THRESHOLD is set), plus per-stage timings in seconds
+            (stage_timings) and Gemini token counts (gemini_usage) - the
+            last two are not persisted
+        """
+        print("\n" + "="*60)
+        print(f"🔍 Starting AI Analysis")
+        print(f"   Business: {map_data.get('name', 'Unknown')}")
+        print(f"   Website: {url if url else '❌ NO WEBSITE'}")
+        print("="*60)
+        
+        logger.info(f"Starting AI analysis for: {map_data.get('name', 'Unknown')}")
+        
+        started = time.perf_counter()
+        stage_timings: Dict[str, float] = {}
+        deadline = deadline or Deadline(self.lead_max_seconds)
+        
+        # Clean URL
+        url = url.strip() if url else None
+        has_website = bool(url and url != "")
+        
+        # Steps 1-3 depend only on the business and its website, not on the caller:
+        # a concurrent analysis of the same place + URL (another job) is joined, not repeated.
+        # Callers only join flights with the same tier and PageSpeed refresh setting, so a
+        # refresh request never receives metrics another caller took from the cache
+        place_id = map_data.get("place_id") or map_data.get("google_id")
+        tier = "full" if full_analysis else "tiered"
+        pagespeed_mode = "refresh" if refresh_pagespeed else "cached"
+        flight_key = f"lead:{place_id}:{self._canonical_url(url) if has_website else ''}:{tier}:{pagespeed_mode}" if place_id else None
+        signals = await self._single_flight.run(flight_key, lambda: self._collect_signals(
+            url, map_data, deadline, refresh_pagespeed, full_analysis
+        ))
+        pagespeed_data = signals["pagespeed"]
+        security_data = signals["security"]
+        gemini_data = signals["gemini"]
+        stage_timings.update(signals["stage_timings"])
         
         # Step 4: Merge all data
         print("\n🔗 Step 4/4: Merging Data & Saving")
@@ -815,13 +1655,23 @@ class DeepAnalyzer:
             industry=industry,
             user_id=user_id
         )
+        
+        # Record which tier produced the scores, so a gated lead is never mistaken
+        # for a full analysis (POST .../leads/{place_id}/full upgrades it on demand).
+        # The columns and the 'local_only' status need migration 002, so they are
+        # only persisted while the gate is enabled
+        tier = {"analysis_tier": signals["analysis_tier"], "prescore": signals["prescore"]}
+        if self.prescore_threshold > 0:
+            complete_analysis.update(tier)
+            if signals["analysis_tier"] == "local":
+                complete_analysis["status"] = "local_only"
 
         # Build API-friendly issues list (not persisted to Supabase)
         issues_for_ui: List[str] = []
         if security_data and security_data.get("security_issues"):
             issues_for_ui.extend(security_data.get("security_issues", [])[:3])
 
-        if has_website:
+        if has_website and signals["analysis_tier"] == "full":
             if pagespeed_data is None:
                 issues_for_ui.append("PageSpeed: Timeout / Unavailable")
             else:
@@ -847,68 +1697,331 @@ class DeepAnalyzer:
         if self.supabase:
             try:
                 print("💾 Saving to Supabase...")
-                self.supabase.table("analyses").upsert(
-                    complete_analysis,
-                    on_conflict="google_maps_place_id"
-                ).execute()
-                print(f"✅ Saved to database: {complete_analysis['id']}")
-                logger.info(f"✅ Analysis saved to database: {complete_analysis['id']}")
+                saved = await self._run_stage("save", stage_timings, asyncio.to_thread(
+                    self._upsert_analysis, complete_analysis
+                ))
+                if saved:
+                    print(f"✅ Saved to database: {complete_analysis['id']}")
+                    logger.info(f"✅ Analysis saved to database: {complete_analysis['id']}")
             except Exception as e:
                 print(f"⚠️  Database save failed: {str(e)[:100]}")
                 logger.error(f"⚠️  Failed to save analysis: {str(e)}")
         else:
             print("⏭️  Supabase not available, skipping save")
         
-        print("\n✅ AI Analysis Complete!")
+        stage_timings["total"] = round(time.perf_counter() - started, 3)
+        
+        print(f"\n✅ AI Analysis Complete! ({stage_timings['total']}s)")
         print("="*60 + "\n")
 
         api_analysis = dict(complete_analysis)
+        api_analysis.update(tier)
         api_analysis["issues"] = issues_for_ui
+        api_analysis["stage_timings"] = stage_timings
+        api_analysis["gemini_usage"] = signals["gemini_usage"]
         return api_analysis
     
-    def _fetch_website_for_security_check(self, url: str) -> Optional[Dict[str, Any]]:
+    async def _collect_signals(
+        self,
+        url: Optional[str],
+        map_data: Dict[str, Any],
+        deadline: Deadline,
+        refresh_pagespeed: bool = False,
+        full_analysis: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Run analysis steps 1-3 (PageSpeed, website audit, Gemini) for one business
+        
+        PageSpeed and the website audit are additionally shared per
+        canonical URL, so businesses with the same website (branches of a
+        chain) analyzed at the same time measure it only once.
+        
+        PageSpeed and the website audit always start together. With the
+        pre-score gate active (PRESCORE_THRESHOLD > 0, not full_analysis)
+        PageSpeed runs speculatively: the audit feeds the lead's local
+        pre-score, and below the threshold PageSpeed is cancelled and
+        Gemini skipped, so promising leads never wait for the audit before
+        PageSpeed starts.
+        
+        Args:
+            url: Cleaned website URL (can be None)
+            map_data: Business data from Google Maps
+            deadline: Time budget for the lead
+            refresh_pagespeed: Ignore cached PageSpeed metrics
+            full_analysis: Skip the pre-score gate
+        
+        Returns:
+            Dict with pagespeed, security and gemini data plus stage_timings,
+            gemini_usage (token counts), prescore (None if not gated) and
+            analysis_tier ("local" or "full")
+        """
+        stage_timings: Dict[str, float] = {}
+        gemini_usage: Dict[str, Any] = {"calls": 0}
+        has_website = bool(url)
+        gated = has_website and not full_analysis and self.prescore_threshold > 0
+        prescore = None
+        
+        # Step 1+2: PageSpeed Insights and Security Header Audit (if website exists)
+        pagespeed_data = None
+        security_data = None
+        if has_website:
+            # Keep Gemini's minimum budget free for step 3
+            fetch_deadline = deadline.shortened(self.stage_min_seconds["gemini"])
+            canonical_url = self._canonical_url(url)
+            
+            async def fetch_pagespeed():
+                return await self._run_stage("pagespeed", stage_timings, self._single_flight.run(
+                    f"pagespeed:{canonical_url}:{'refresh' if refresh_pagespeed else 'cached'}",
+                    lambda: self._fetch_pagespeed_data(url, deadline=fetch_deadline, force_refresh=refresh_pagespeed)
+                ), fetch_deadline)
+            
+            async def fetch_website():
+                return await self._run_stage("website", stage_timings, self._single_flight.run(
+                    f"website:{canonical_url}",
+                    lambda: self._fetch_website_for_security_check(url, deadline=fetch_deadline)
+                ), fetch_deadline)
+            
+            if gated:
+                # Tier 1: the website audit decides whether the expensive calls are worth it;
+                # PageSpeed starts alongside it and is cancelled if the lead scores too low
+                print("\n📊 Step 1/4: PageSpeed Insights (speculative) + 🔒 Step 2/4: Security Header Audit (pre-score tier)")
+                pagespeed_task = asyncio.ensure_future(fetch_pagespeed())
+                try:
+                    security_data = await fetch_website()
+                except BaseException:
+                    pagespeed_task.cancel()
+                    raise
+                prescore = self._local_prescore(url, map_data, security_data)
+                if prescore < self.prescore_threshold:
+                    print(f"⏭️  Pre-score {prescore}/100 < {self.prescore_threshold} - cancelling PageSpeed, skipping Gemini")
+                    logger.info(f"Pre-score {prescore} below threshold for {url}: local analysis only")
+                    pagespeed_task.cancel()
+                    await asyncio.gather(pagespeed_task, return_exceptions=True)
+                    stage_timings.pop("pagespeed", None)  # Cancelled, not measured
+                    return {
+                        "pagespeed": None,
+                        "security": security_data,
+                        "gemini": self._get_local_analysis(url, map_data, security_data, prescore),
+                        "stage_timings": stage_timings,
+                        "gemini_usage": gemini_usage,
+                        "prescore": prescore,
+                        "analysis_tier": "local",
+                    }
+                print(f"\n📊 Pre-score {prescore}/100 - keeping PageSpeed")
+                pagespeed_data = await pagespeed_task
+            else:
+                print("\n📊 Step 1/4: PageSpeed Insights + 🔒 Step 2/4: Security Header Audit (parallel)")
+                pagespeed_data, security_data = await asyncio.gather(fetch_pagespeed(), fetch_website())
+        else:
+            print("\n📊 Step 1/4: PageSpeed (skipped - no website)")
+            print("\n🔒 Step 2/4: Security Audit (skipped - no website)")
+        
+        # Step 3: Gemini AI Analysis (needs both signals above)
+        print("\n🤖 Step 3/4: Gemini AI Analysis")
+        gemini_data = await self._run_stage(
+            "gemini",
+            stage_timings,
+            self._analyze_with_gemini(url, map_data, pagespeed_data, security_data, deadline=deadline, usage=gemini_usage),
+            deadline,
+            on_timeout=lambda: self._get_fallback_analysis(url, map_data)
+        )
+        
+        return {
+            "pagespeed": pagespeed_data,
+            "security": security_data,
+            "gemini": gemini_data,
+            "stage_timings": stage_timings,
+            "gemini_usage": gemini_usage,
+            "prescore": prescore,
+            "analysis_tier": "full",
+        }
+    
+    def _local_prescore(
+        self,
+        url: Optional[str],
+        map_data: Dict[str, Any],
+        security_data: Optional[Dict[str, Any]]
+    ) -> int:
+        """
+        Cheap local estimate of how promising a lead is (tier 1)
+        
+        Uses only data that costs no paid API call: Google Maps fields and
+        the website audit (security headers, mobile score, copyright year,
+        email found).
+        Unlike the quality scores, higher means a better lead - more to
+        fix and a reachable, established business.
+        
+        Args:
+            url: Website URL (can be None)
+            map_data: Business data from Google Maps
+            security_data: Result of _fetch_website_for_security_check (can be None)
+        
+        Returns:
+            Pre-score 0-100 (higher = more worth a full analysis)
+        """
+        score = 50
+        
+        # Website problems = what we can sell
+        if not url:
+            score += 30
+        elif not security_data or security_data.get("security_score") is None:
+            score += 20  # Unreachable / timed out
+        else:
+            security_score = security_data["security_score"]
+            if security_score < 50:
+                score += 10
+            elif security_score >= 80:
+                score -= 10
+            
+            mobile_score = security_data.get("mobile_score") or 0
+            if mobile_score == 0:
+                score += 20  # No viewport = not mobile-optimized
+            elif mobile_score >= 90:
+                score -= 10
+            
+            copyright_year = security_data.get("copyright_year")
+            if copyright_year and copyright_year <= datetime.utcnow().year - 3:
+                score += 10  # Outdated footer = site not maintained
+        
+        # Reputation: room to improve, but established enough to pay
+        rating = map_data.get("rating")
+        if rating:
+            if rating < 4.0:
+                score += 10
+            elif rating >= 4.7:
+                score -= 5
+        
+        review_count = map_data.get("review_count") or 0
+        if review_count < 5:
+            score -= 15  # Barely active business
+        elif review_count < 20:
+            score -= 5
+        elif review_count > 200:
+            score += 5
+        
+        # Reachability
+        score += 5 if map_data.get("phone_number") else -5
+        if security_data and security_data.get("email"):
+            score += 5
+        
+        return max(0, min(100, score))
+    
+    async def _run_stage(
+        self,
+        name: str,
+        timings: Dict[str, float],
+        coro: Awaitable,
+        deadline: Optional[Deadline] = None,
+        on_timeout: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """
+        Await one analysis stage and record its wall time
+        
+        Stages bound their own calls by the deadline; this is the hard
+        stop for anything that still overruns it (e.g. rate-limit waits).
+        
+        Args:
+            name: Stage name used as key in timings
+            timings: Dict collecting stage durations (seconds)
+            coro: Stage coroutine
+            deadline: Budget for the stage (None = unbounded)
+            on_timeout: Produces the stage result if the deadline passes (default: None)
+        
+        Returns:
+            Result of the stage coroutine
+        """
+        started = time.perf_counter()
+        try:
+            if deadline is None or not deadline.bounded:
+                return await coro
+            # One second of grace so the stage's own (deadline-bound) call timeout fires first
+            return await asyncio.wait_for(coro, timeout=deadline.remaining() + 1.0)
+        except asyncio.TimeoutError:
+            print(f"⏱️  {name} stage cut off at the lead deadline")
+            logger.warning(f"{name} stage exceeded its deadline")
+            return on_timeout() if on_timeout else None
+        finally:
+            timings[name] = round(time.perf_counter() - started, 3)
+    
+    async def _fetch_website_for_security_check(
+        self,
+        url: str,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Fetch website to perform security header audit
         
         Args:
             url: Website URL to check
+            deadline: Stage budget (bounds the 10s timeout; skipped below WEBSITE_MIN_BUDGET)
         
         Returns:
-            Dict with security_score and security_issues, or None if failed
+            Dict with security_score, security_issues, mobile_score, email
+            (if found), the detected tech_stack / has_ads_pixel and the page
+            signals (copyright_year, title, meta_description, json_ld_types,
+            links), or None if failed
         """
+        deadline = deadline or Deadline()
+        if not deadline.allows(self.stage_min_seconds["website"]):
+            print("⏭️  Security audit skipped - lead time budget used up")
+            logger.info(f"Security audit skipped for {url}: {deadline}")
+            return None
+        
         print(f"⏳ Fetching website for security audit: {url[:50]}...")
         
         try:
-            # Fetch the website with a reasonable timeout
-            response = requests.get(
-                url,
-                timeout=10,
-                allow_redirects=True,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (compatible; LeadScraperBot/1.0; +security-audit)'
-                }
-            )
-            
-            # Calculate security score based on headers
-            security_data = self._calculate_security_score(response)
+            # Stream the website with a reasonable timeout: headers first, then at most
+            # website_max_bytes of HTML (never the whole body of huge / endless pages)
+            # (status codes of third-party sites say nothing about our capacity, only latency/timeouts count)
+            async with self._concurrency.limiter("website").slot():
+                async with self._get_http_client("website").stream(
+                    "GET",
+                    url,
+                    timeout=deadline.timeout(10),
+                    follow_redirects=True,
+                    headers={
+                        'User-Agent': 'Mozilla/5.0 (compatible; LeadScraperBot/1.0; +security-audit)'
+                    }
+                ) as response:
+                    # Calculate security score based on headers (available before the body)
+                    security_data = self._calculate_security_score(response)
+                    
+                    content_type = response.headers.get("content-type", "").lower()
+                    if content_type and "html" not in content_type:
+                        print(f"   ⏭️  Not HTML ({content_type.split(';')[0]}) - skipping body")
+                        html = ""
+                    else:
+                        html = await self._read_html_capped(response)
+
+            # One pass over the HTML for all page signals
+            signals = self._html_signals.extract(html, str(response.url))
+
+            # Tech stack and ads pixels from local fingerprints (HTML hits, headers, cookies)
+            security_data.update(self._tech_detector.detect(
+                html, response.headers.multi_items(), html_hits=signals["tech_hits"]
+            ))
 
             # Best-effort email extraction from HTML
-            email = self._extract_email_from_html(response.text or "", url)
+            email = self._pick_contact_email(signals["emails"], url)
             if email:
                 security_data["email"] = email
             
             # Mobile-Friendly Check (viewport meta tag)
-            mobile_score = self._calculate_mobile_score(response.text or "")
+            mobile_score = self._calculate_mobile_score(signals)
             security_data["mobile_score"] = mobile_score
+
+            # SEO / freshness signals (copyright year None if the page states none)
+            for key in ("copyright_year", "title", "meta_description", "json_ld_types", "links"):
+                security_data[key] = signals[key]
             
             score = security_data['security_score']
             issues_count = len(security_data['security_issues'])
-            print(f"✅ Security audit done: Score={score}/100, Issues={issues_count}, Mobile={mobile_score}/100")
+            print(f"✅ Security audit done: Score={score}/100, Issues={issues_count}, Mobile={mobile_score}/100, Tech={len(security_data['tech_stack'])}")
             
             return security_data
             
-        except requests.exceptions.Timeout:
-            print(f"❌ Security check timeout after 10s")
+        except httpx.TimeoutException:
+            print(f"❌ Security check timeout")
             logger.warning(f"Security check timeout for: {url}")
             return {
                 "security_score": None,
@@ -916,7 +2029,7 @@ class DeepAnalyzer:
                 "mobile_score": 0
             }
         
-        except requests.exceptions.RequestException as e:
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
             print(f"❌ Security check failed: {str(e)[:80]}")
             logger.warning(f"Security check failed for {url}: {str(e)}")
             return {
@@ -925,12 +2038,47 @@ class DeepAnalyzer:
                 "mobile_score": 0
             }
     
-    def _calculate_security_score(self, response: requests.Response) -> Dict[str, Any]:
+    async def _read_html_capped(self, response: httpx.Response) -> str:
+        """
+        Read and decode a streamed response body up to website_max_bytes
+        
+        Decodes chunk by chunk (multi-byte characters split across chunks
+        are handled by the incremental decoder) and closes the stream once
+        the cap is reached.
+        
+        Args:
+            response: Streaming httpx.Response (inside client.stream())
+        
+        Returns:
+            Decoded HTML prefix
+        """
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        
+        parts = []
+        remaining = self.website_max_bytes
+        async for chunk in response.aiter_bytes():
+            if len(chunk) >= remaining:
+                parts.append(decoder.decode(chunk[:remaining], final=True))
+                remaining = 0
+                break
+            parts.append(decoder.decode(chunk))
+            remaining -= len(chunk)
+        else:
+            parts.append(decoder.decode(b"", final=True))
+        
+        if remaining == 0:
+            logger.debug(f"Website body capped at {self.website_max_bytes} bytes: {response.url}")
+        return "".join(parts)
+    
+    def _calculate_security_score(self, response: httpx.Response) -> Dict[str, Any]:
         """
         Professional Security Header Audit - calculates security score based on HTTP headers
         
         Args:
-            response: The requests.Response object from the website fetch
+            response: The httpx.Response object from the website fetch
         
         Returns:
             Dict with security_score (0-100) and list of security_issues
@@ -938,8 +2086,8 @@ class DeepAnalyzer:
         score = 100
         issues = []
         
-        # Get the URL to check protocol
-        url = response.url
+        # Get the URL to check protocol (final URL after redirects)
+        url = str(response.url)
         
         # Critical Check: Must be HTTPS
         if not url.startswith('https://'):
@@ -1024,33 +2172,11 @@ class DeepAnalyzer:
             "security_issues": issues
         }
 
-    def _extract_email_from_html(self, html: str, url: str) -> Optional[str]:
+    def _pick_contact_email(self, emails: List[str], url: str) -> Optional[str]:
         """
-        Extract a likely contact email from HTML (best-effort).
+        Pick a likely contact email among the addresses found on the page (best-effort).
         Prefers emails matching the website domain.
         """
-        if not html:
-            return None
-
-        # Limit scanning to avoid very large pages
-        snippet = html[:200000]
-        candidates = re.findall(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", snippet, flags=re.IGNORECASE)
-        if not candidates:
-            return None
-
-        # Normalize and de-duplicate while preserving order
-        seen = set()
-        emails: List[str] = []
-        for email in candidates:
-            clean = email.strip().lower()
-            if clean in seen:
-                continue
-            seen.add(clean)
-            emails.append(clean)
-
-        if not emails:
-            return None
-
         # Filter out obvious placeholders
         blocked_domains = {"example.com", "email.com", "test.com"}
         emails = [e for e in emails if e.split("@")[-1] not in blocked_domains]
@@ -1070,29 +2196,19 @@ class DeepAnalyzer:
 
         return emails[0]
 
-    def _calculate_mobile_score(self, html: str) -> int:
+    def _calculate_mobile_score(self, signals: Dict[str, Any]) -> int:
         """
         Check if website is mobile-friendly based on viewport meta tag.
         
         Args:
-            html: Website HTML content
+            signals: Page signals from the HTML signal extractor
         
         Returns:
             Mobile score 0-100:
             - 0 = No viewport tag (not mobile-optimized)
             - 80-100 = Viewport present + responsive indicators
         """
-        if not html:
-            return 0
-        
-        # Limit scanning to first 50KB (viewport is always in <head>)
-        snippet = html[:50000].lower()
-        
-        # Check for viewport meta tag (flexible pattern)
-        viewport_pattern = r'<meta\s+name=["\']?viewport["\']?'
-        has_viewport = bool(re.search(viewport_pattern, snippet, re.IGNORECASE))
-        
-        if not has_viewport:
+        if signals.get("viewport") is None:
             logger.debug("Mobile check: No viewport tag found")
             return 0  # Clear fail - not mobile-friendly
         
@@ -1100,31 +2216,42 @@ class DeepAnalyzer:
         score = 80
         
         # Bonus points for responsive framework indicators
-        responsive_hints = [
-            ('bootstrap', 4),      # Bootstrap framework
-            ('responsive', 3),     # Responsive CSS
-            ('@media', 4),        # Media queries
-            ('flexbox', 3),       # Flexbox layout
-            ('grid-template', 3), # CSS Grid
-        ]
+        responsive_hints = {
+            'bootstrap': 4,      # Bootstrap framework
+            'responsive': 3,     # Responsive CSS
+            '@media': 4,         # Media queries
+            'flexbox': 3,        # Flexbox layout
+            'grid-template': 3,  # CSS Grid
+        }
         
-        for hint, bonus in responsive_hints:
-            if hint in snippet:
-                score += bonus
-                logger.debug(f"Mobile check: Found '{hint}' (+{bonus} points)")
+        for hint in signals.get("responsive_hints", []):
+            bonus = responsive_hints.get(hint, 0)
+            score += bonus
+            logger.debug(f"Mobile check: Found '{hint}' (+{bonus} points)")
         
         # Cap at 100
         final_score = min(100, score)
-        logger.info(f"✅ Mobile-friendly check: Score={final_score}/100 (viewport={'found' if has_viewport else 'missing'})")
+        logger.info(f"✅ Mobile-friendly check: Score={final_score}/100 (viewport=found)")
         
         return final_score
      
-    def _fetch_pagespeed_data(self, url: str) -> Optional[Dict[str, Any]]:
+    async def _fetch_pagespeed_data(
+        self,
+        url: str,
+        deadline: Optional[Deadline] = None,
+        force_refresh: bool = False
+    ) -> Optional[Dict[str, Any]]:
         """
         Fetch performance metrics from Google PageSpeed Insights (Desktop only)
         
+        Metrics are cached by canonical URL and strategy. A fresh entry
+        (PAGESPEED_CACHE_TTL) skips the API call; a stale one is returned
+        as well, but refreshed in the background for the next lead.
+        
         Args:
             url: Website URL to analyze
+            deadline: Stage budget (bounds the 45s timeout; skipped below PAGESPEED_MIN_BUDGET)
+            force_refresh: Ignore cached metrics and call the API
         
         Returns:
             PageSpeed data or None if failed
@@ -1134,6 +2261,59 @@ class DeepAnalyzer:
             logger.warning("PageSpeed API key not available, skipping...")
             return None
         
+        cache_key = None
+        if self._pagespeed_cache is not None:
+            cache_key = make_key(self._canonical_url(url), "desktop")
+            if not force_refresh:
+                entry = await asyncio.to_thread(self._pagespeed_cache.get_entry, cache_key)
+                if entry is not None:
+                    metrics, fresh = entry
+                    if not fresh:
+                        self._refresh_pagespeed_in_background(url, cache_key)
+                    print(f"⚡ PageSpeed cache hit{'' if fresh else ' (stale, refreshing)'}: Score={metrics.get('performance_score')}/100")
+                    return metrics
+        
+        deadline = deadline or Deadline()
+        if not deadline.allows(self.stage_min_seconds["pagespeed"]):
+            print("⏭️  PageSpeed skipped - lead time budget too small")
+            logger.info(f"PageSpeed skipped for {url}: {deadline}")
+            return None
+        
+        metrics = await self._request_pagespeed(url, deadline)
+        if metrics is not None and cache_key is not None:
+            await asyncio.to_thread(self._pagespeed_cache.set, cache_key, metrics)
+        return metrics
+    
+    def _refresh_pagespeed_in_background(self, url: str, cache_key: str):
+        """Re-fetch stale PageSpeed metrics without holding up the current lead (once per key at a time)"""
+        if cache_key in self._pagespeed_refreshing:
+            return
+        self._pagespeed_refreshing.add(cache_key)
+        
+        async def refresh():
+            try:
+                metrics = await self._request_pagespeed(url, Deadline())
+                if metrics is not None:
+                    await asyncio.to_thread(self._pagespeed_cache.set, cache_key, metrics)
+            finally:
+                self._pagespeed_refreshing.discard(cache_key)
+        
+        # Not part of any job: keeps running when the lead's job is cancelled
+        task = asyncio.ensure_future(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _request_pagespeed(self, url: str, deadline: Deadline) -> Optional[Dict[str, Any]]:
+        """
+        Call the PageSpeed Insights API
+        
+        Args:
+            url: Website URL to analyze
+            deadline: Budget for the call (bounds the 45s timeout)
+        
+        Returns:
+            Extracted metrics (the multi-MB Lighthouse report is dropped), or None if failed
+        """
         print(f"⏳ Calling PageSpeed Insights (desktop) for: {url[:50]}...")
         
         try:
@@ -1144,11 +2324,19 @@ class DeepAnalyzer:
                 "category": "performance",
             }
             
-            response = requests.get(
-                self.pagespeed_endpoint,
-                params=params,
-                timeout=45  # Generous timeout for better success rate
-            )
+            rate_bucket = self._rate_limiter.bucket("pagespeed")
+            with self._breakers.breaker("pagespeed").guard() as call:
+                await rate_bucket.acquire()
+                deadline.require(self.stage_min_seconds["pagespeed"], "PageSpeed")
+                async with self._concurrency.limiter("pagespeed").slot() as slot:
+                    response = await self._get_http_client().get(
+                        self.pagespeed_endpoint,
+                        params=params,
+                        timeout=deadline.timeout(45)  # Generous timeout for better success rate
+                    )
+                    slot.record_status(response.status_code)
+                    call.record_status(response.status_code)
+                    rate_bucket.update_from_headers(response.headers, response.status_code)
             
             if response.status_code != 200:
                 print(f"⚠️  PageSpeed returned status {response.status_code}")
@@ -1177,11 +2365,15 @@ class DeepAnalyzer:
                 "performance_score": performance_score,
                 "loading_time": loading_time,
                 "strategy": "desktop",
-                "lighthouse_data": lighthouse_result
             }
             
-        except requests.exceptions.Timeout:
-            print(f"❌ PageSpeed timeout after 45s")
+        except (RateLimitExceeded, CircuitOpenError, BudgetExhausted) as e:
+            print(f"🚦 PageSpeed skipped: {str(e)}")
+            logger.warning(f"PageSpeed skipped for {url}: {str(e)}")
+            return None
+            
+        except httpx.TimeoutException:
+            print(f"❌ PageSpeed timeout")
             logger.warning(f"PageSpeed timeout for: {url} - site too slow, skipping")
             return None
             
@@ -1190,12 +2382,45 @@ class DeepAnalyzer:
             logger.error(f"PageSpeed fetch failed: {str(e)}")
             return None
     
-    def _analyze_with_gemini(
+    @staticmethod
+    def _canonical_url(url: str) -> str:
+        """
+        Canonical form of a website URL for cache keys
+        
+        Lowercases scheme and host, drops default ports, fragments, tracking
+        parameters (utm_*, gclid, fbclid) and trailing slashes, sorts the query.
+        """
+        url = url.strip()
+        if "://" not in url:
+            url = f"http://{url}"
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return url.lower()  # Unparseable (e.g. broken IPv6 literal): the API call will fail anyway
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").rstrip(".")
+        try:
+            port = parts.port
+        except ValueError:
+            port = None  # Invalid port: the API call will fail anyway
+        if (scheme, port) in (("http", 80), ("https", 443)):
+            port = None
+        netloc = f"{host}:{port}" if port else host
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in ("gclid", "fbclid")
+        ))
+        path = parts.path.rstrip("/") or "/"
+        return urlunsplit((scheme, netloc, path, query, ""))
+    
+    async def _analyze_with_gemini(
         self,
         url: Optional[str],
         map_data: Dict[str, Any],
         pagespeed_data: Optional[Dict[str, Any]],
-        security_data: Optional[Dict[str, Any]] = None
+        security_data: Optional[Dict[str, Any]] = None,
+        deadline: Optional[Deadline] = None,
+        usage: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Analyze business with Gemini AI
@@ -1205,6 +2430,8 @@ class DeepAnalyzer:
             map_data: Google Maps business data
             pagespeed_data: PageSpeed Insights data (can be None)
             security_data: Security audit data (can be None)
+            deadline: Lead budget (bounds GEMINI_TIMEOUT; fallback below GEMINI_MIN_BUDGET)
+            usage: Collects the lead's token counts (its share of a batch plus any single call)
         
         Returns:
             Gemini analysis with scores, report, and pitch
@@ -1214,51 +2441,97 @@ class DeepAnalyzer:
             logger.warning("Gemini API key not available, returning fallback data...")
             return self._get_fallback_analysis(url, map_data)
         
-        print(f"⏳ Calling Gemini AI for: {map_data.get('name', 'Unknown')[:50]}...")
-        
         try:
             # Construct prompt
             prompt = self._build_gemini_prompt(url, map_data, pagespeed_data, security_data)
+            generation_config = {
+                "temperature": 0.3,  # Lower temperature for more consistent JSON
+                "max_output_tokens": self.gemini_max_output_tokens,
+                "top_p": 0.95,
+                "top_k": 40,
+                # JSON mode: output is constrained to the schema (no code fences, no broken JSON)
+                "response_mime_type": "application/json",
+                "response_schema": GEMINI_RESPONSE_SCHEMA,
+            }
             
-            # Call Gemini with timeout handling
-            model = genai.GenerativeModel(self.gemini_model)
-            
-            # Gemini doesn't support timeout parameter directly, but we can catch exceptions
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.3,  # Lower temperature for more consistent JSON
-                    "max_output_tokens": 4096,  # Increased to prevent truncation
-                    "top_p": 0.95,
-                    "top_k": 40,
-                }
-            )
-            
-            # Parse response
-            response_text = response.text
-            logger.debug(f"Gemini raw response length: {len(response_text)} chars")
-            
-            # DEBUG: Print FULL response
-            print(f"📝 Gemini FULL raw response ({len(response_text)} chars):")
-            print(response_text)
-            print("=" * 80)
+            # Identical prompt -> reuse the earlier analysis (memory tier first, then disk)
+            cache_key = None
+            if self._gemini_cache is not None:
+                cache_key = make_key(self.gemini_model, GEMINI_SYSTEM_INSTRUCTION, generation_config, prompt)
+                gemini_data = self._gemini_cache.get_from_memory(cache_key)
+                if gemini_data is None:
+                    gemini_data = await asyncio.to_thread(self._gemini_cache.get, cache_key)
+                if gemini_data is not None:
+                    print(f"⚡ Gemini cache hit: Lead Quality = {gemini_data.get('lead_quality', 'Unknown')}")
+                    return gemini_data
+            
+            deadline = deadline or Deadline()
+            if not deadline.allows(self.stage_min_seconds["gemini"]):
+                print("⏭️  Gemini skipped - lead time budget used up, using fallback...")
+                logger.info(f"Gemini skipped for {map_data.get('name', 'Unknown')}: {deadline}")
+                return self._get_fallback_analysis(url, map_data)
             
-            # Clean and parse JSON
-            gemini_data = self._parse_gemini_response(response_text)
+            # Batch mode: share one request with the other leads analyzed right now;
+            # only a lead missing from (or invalid in) the batch answer gets its own call
+            gemini_data = None
+            if self._gemini_batcher is not None:
+                gemini_data, batch_usage = await self._submit_to_gemini_batch(
+                    url, map_data, pagespeed_data, security_data, deadline
+                )
+                self._add_usage(usage, batch_usage)
+                if gemini_data is None:
+                    if not deadline.allows(self.stage_min_seconds["gemini"]):
+                        print("⏭️  Gemini single call skipped - lead time budget used up, using fallback...")
+                        return self._get_fallback_analysis(url, map_data)
+                    print(f"↩️  {map_data.get('name', 'Unknown')[:50]} not analyzed in batch - single Gemini call")
             
-            # Check if parsing failed (returns None)
             if gemini_data is None:
-                print(f"❌ Gemini JSON Parse Failed - using fallback")
-                return self._get_fallback_analysis(url, map_data)
+                print(f"⏳ Calling Gemini AI for: {map_data.get('name', 'Unknown')[:50]}...")
+                
+                # Warmed model for the static prefix (created once per process)
+                model = await self._gemini.model(GEMINI_SYSTEM_INSTRUCTION)
+                
+                # Gemini has no timeout parameter: bound the call by the lead's remaining budget
+                # (429 ResourceExhausted / 5xx / timeouts shrink the adaptive Gemini limit)
+                with self._breakers.breaker("gemini").guard():
+                    await self._rate_limiter.bucket("gemini").acquire()
+                    deadline.require(self.stage_min_seconds["gemini"], "Gemini")
+                    async with self._concurrency.limiter("gemini").slot():
+                        # Streamed: fields are parsed as they arrive
+                        parser, call_usage = await asyncio.wait_for(
+                            self._stream_gemini_json(model, prompt, generation_config),
+                            timeout=deadline.timeout(self.gemini_timeout)
+                        )
+                self._add_usage(usage, {"calls": 1, **call_usage})
+                
+                print(
+                    f"📝 Gemini response: {len(parser.value or {})} fields{' (cut off)' if not parser.done else ''}, "
+                    f"tokens: {call_usage['prompt_tokens']} in ({call_usage['cached_tokens']} cached) / {call_usage['output_tokens']} out"
+                )
+                gemini_data = self._validated_analysis(parser.value)
+                
+                # Check if parsing failed (returns None)
+                if gemini_data is None:
+                    print(f"❌ Gemini JSON Parse Failed - using fallback")
+                    return self._get_fallback_analysis(url, map_data)
             
             print(f"✅ Gemini done: Lead Quality = {gemini_data.get('lead_quality', 'Unknown')}")
             logger.info(f"✅ Gemini analysis complete: Lead Quality = {gemini_data.get('lead_quality', 'Unknown')}")
             
+            # Only real model output is cached (every fallback path returns above or below)
+            if cache_key is not None:
+                await asyncio.to_thread(self._gemini_cache.set, cache_key, gemini_data)
+            
             return gemini_data
             
-        except json.JSONDecodeError as e:
-            print(f"❌ Gemini JSON Parse Error: {str(e)[:100]}")
-            logger.error(f"Gemini JSON parsing failed: {str(e)}")
+        except (CircuitOpenError, BudgetExhausted) as e:
+            print(f"🔌 Gemini skipped: {str(e)}")
+            logger.warning(f"Gemini skipped, using fallback: {str(e)}")
+            return self._get_fallback_analysis(url, map_data)
+            
+        except asyncio.TimeoutError:
+            print(f"❌ Gemini timeout - using fallback")
+            logger.warning(f"Gemini timeout for: {map_data.get('name', 'Unknown')}")
             return self._get_fallback_analysis(url, map_data)
             
         except Exception as e:
@@ -1266,7 +2539,189 @@ class DeepAnalyzer:
             logger.error(f"Gemini analysis failed: {str(e)}")
             return self._get_fallback_analysis(url, map_data)
     
-    def _build_gemini_prompt(
+    async def _submit_to_gemini_batch(
+        self,
+        url: Optional[str],
+        map_data: Dict[str, Any],
+        pagespeed_data: Optional[Dict[str, Any]],
+        security_data: Optional[Dict[str, Any]],
+        deadline: Deadline
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Analyze one business as part of the next Gemini batch
+        
+        Returns:
+            (validated analysis, the lead's share of the batch's tokens);
+            the analysis is None if the batch did not deliver one - also
+            when the whole batch timed out or failed (the caller then makes
+            a single-lead call if the lead's deadline still allows it)
+        
+        Raises:
+            CircuitOpenError: Gemini's circuit is open (a single call would fail as well)
+        """
+        try:
+            return await self._gemini_batcher.submit({
+                "place_id": map_data.get("place_id"),
+                "name": map_data.get("name", "Unknown"),
+                "context": self._build_business_context(url, map_data, pagespeed_data, security_data),
+                "deadline": deadline,
+            })
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            # Batch-level timeout, rate limit, budget of the batch or a provider error:
+            # the lead's own deadline decides whether its single call is still worth it
+            logger.warning(f"Gemini batch failed for {map_data.get('name', 'Unknown')}: {type(e).__name__} {str(e)}")
+            return None, {}
+    
+    async def _analyze_gemini_batch(
+        self,
+        items: List[Dict[str, Any]],
+        deliver: Callable[[int, Any], None]
+    ) -> List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Analyze several businesses with one Gemini request (MicroBatcher handler)
+        
+        The shared instructions and JSON schema are sent once; the answer is
+        a JSON array with one object per business, keyed by place_id. Each
+        element is validated on its own as soon as it has streamed in and
+        handed to its lead right away, so one bad element does not cost the
+        others their analysis and nobody waits for the end of the batch.
+        
+        Args:
+            items: Batch items from _submit_to_gemini_batch
+            deliver: Hands one item's result to its caller early
+        
+        Each lead is charged an equal share of the prompt tokens and the
+        output tokens streamed since the previous element (usage is read
+        from the running totals of the stream).
+        
+        Returns:
+            (analysis, token share) per item (same order); analysis is None
+            where the answer had no valid element
+        """
+        if len(items) == 1:
+            return [(None, {})]  # A batch of one is an ordinary single-lead call
+        
+        # place_id identifies each business in the answer (made unique within the batch)
+        ids: List[str] = []
+        for index, item in enumerate(items, 1):
+            item_id = str(item["place_id"] or f"lead-{index}")
+            if item_id in ids:
+                item_id = f"{item_id}-{index}"
+            ids.append(item_id)
+        
+        prompt = self._build_gemini_batch_prompt(list(zip(ids, (item["context"] for item in items))))
+        generation_config = {
+            "temperature": 0.3,
+            "max_output_tokens": self.gemini_batch_tokens_per_lead * len(items),
+            "top_p": 0.95,
+            "top_k": 40,
+            "response_mime_type": "application/json",
+            "response_schema": GEMINI_BATCH_RESPONSE_SCHEMA,
+        }
+        
+        index_by_id = {item_id: index for index, item_id in enumerate(ids)}
+        results: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]] = [(None, {})] * len(items)
+        output_charged = [0]
+        
+        def on_element(element: Any, usage_so_far: Dict[str, int]):
+            if not isinstance(element, dict):
+                return
+            place_id = str(element.pop("place_id", ""))
+            index = index_by_id.get(place_id)
+            if index is None or results[index][0] is not None:
+                logger.warning(f"Gemini batch element with unexpected place_id: {place_id!r}")
+                return
+            analysis = self._validated_analysis(element)
+            if analysis is not None:
+                share = {
+                    "calls": round(1 / len(items), 3),
+                    "batch_size": len(items),
+                    "prompt_tokens": usage_so_far["prompt_tokens"] // len(items),
+                    "cached_tokens": usage_so_far["cached_tokens"] // len(items),
+                    "output_tokens": usage_so_far["output_tokens"] - output_charged[0],
+                }
+                output_charged[0] = usage_so_far["output_tokens"]
+                results[index] = (analysis, share)
+                deliver(index, results[index])
+        
+        print(f"⏳ Calling Gemini AI for a batch of {len(items)} businesses...")
+        model = await self._gemini.model(GEMINI_BATCH_SYSTEM_INSTRUCTION)
+        
+        with self._breakers.breaker("gemini").guard():
+            await self._rate_limiter.bucket("gemini").acquire()
+            # Worth waiting for as long as any lead of the batch still has time
+            timeout = min(self.gemini_batch_timeout, max(item["deadline"].remaining() for item in items))
+            if timeout < self.stage_min_seconds["gemini"]:
+                raise BudgetExhausted(f"Gemini batch needs {self.stage_min_seconds['gemini']:.0f}s, {timeout:.1f}s left")
+            async with self._concurrency.limiter("gemini").slot():
+                parser, batch_usage = await asyncio.wait_for(
+                    self._stream_gemini_json(model, prompt, generation_config, on_item=on_element),
+                    timeout=timeout
+                )
+        
+        valid = sum(1 for analysis, _ in results if analysis is not None)
+        print(
+            f"✅ Gemini batch done: {valid}/{len(items)} analyses valid{' (cut off)' if not parser.done else ''}, "
+            f"tokens: {batch_usage['prompt_tokens']} in ({batch_usage['cached_tokens']} cached) / {batch_usage['output_tokens']} out"
+        )
+        logger.info(f"Gemini batch: {valid}/{len(items)} valid elements")
+        return results
+    
+    async def _stream_gemini_json(
+        self,
+        model: Any,
+        prompt: str,
+        generation_config: Dict[str, Any],
+        on_item: Optional[Callable[[Any, Dict[str, int]], None]] = None
+    ) -> Tuple[JSONStreamParser, Dict[str, int]]:
+        """
+        Stream a JSON-mode Gemini response through the incremental parser
+        
+        Args:
+            model: Warmed genai.GenerativeModel (from GeminiClient)
+            prompt: Per-business part of the prompt
+            generation_config: Generation config (with response schema)
+            on_item: Called with every top-level field / array element as soon as
+                it is complete, plus the token counts streamed so far
+        
+        Returns:
+            (parser holding everything that completed - parser.done = the JSON
+            was closed, token counts of the call)
+        """
+        parser = JSONStreamParser()
+        usage_metadata = None
+        response = await model.generate_content_async(prompt, generation_config=generation_config, stream=True)
+        async for chunk in response:
+            # Every chunk carries the running token totals of the call
+            usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # Chunk without text (e.g. only the finish reason)
+            items = parser.feed(text)
+            if on_item and items:
+                usage_so_far = self._gemini.usage_of(usage_metadata)
+                for item in items:
+                    on_item(item, usage_so_far)
+        
+        if not parser.done:
+            logger.warning(f"Gemini response ended before the JSON was complete ({len(parser.value or [])} items)")
+        return parser, self._gemini.record_usage(usage_metadata)
+    
+    @staticmethod
+    def _add_usage(usage: Optional[Dict[str, Any]], counts: Dict[str, Any]):
+        """Add token counts to a lead's usage (no-op without a usage dict)"""
+        if usage is None:
+            return
+        for name, count in counts.items():
+            if name == "batch_size":
+                usage[name] = count
+            else:
+                usage[name] = round(usage.get(name, 0) + count, 3)
+    
+    def _build_business_context(
         self,
         url: Optional[str],
         map_data: Dict[str, Any],
@@ -1274,7 +2729,7 @@ class DeepAnalyzer:
         security_data: Optional[Dict[str, Any]] = None
     ) -> str:
         """
-        Build the Gemini AI prompt
+        Describe one business and its automatic signals for a Gemini prompt
         
         Args:
             url: Website URL
@@ -1283,7 +2738,7 @@ class DeepAnalyzer:
             security_data: Security audit data
         
         Returns:
-            Complete prompt string
+            Business block (name, type, address, website, rating, signals)
         """
         # Extract business info
         business_name = map_data.get("name", "Unknown Business")
@@ -1308,127 +2763,112 @@ class DeepAnalyzer:
             security_context = f"\nSecurity Score: {sec_score}/100"
             if sec_issues:
                 security_context += f"\nSecurity Issues: {', '.join(sec_issues[:3])}"
-        
-        prompt = f"""Analysiere dieses Business und erstelle einen Lead-Report.
-
-Business: {business_name}
+            if security_data.get("tech_stack"):
+                security_context += f"\nErkannte Technologien: {', '.join(security_data['tech_stack'][:10])}"
+            if "title" in security_data:
+                security_context += f"\nSeitentitel: {security_data['title'] or 'fehlt'}"
+                security_context += f"\nMeta Description: {security_data['meta_description'] or 'fehlt'}"
+                security_context += f"\nCopyright-Jahr: {security_data['copyright_year'] or 'nicht angegeben'}"
+                security_context += f"\nStrukturierte Daten: {', '.join(security_data['json_ld_types'][:5]) or 'keine'}"
+        
+        return f"""Business: {business_name}
 Typ: {business_type}
 Adresse: {address}
 {website_context}
-Rating: {rating} ({reviews} Bewertungen){pagespeed_context}{security_context}
-
-WICHTIG:
-- Antworte NUR mit einem JSON-Objekt (keine Markdown-Codeblocks, kein Text davor/danach).
-- Alle scores muessen INTEGER sein (0-100).
-- Nutze die AUTOMATISCHEN SIGNale oben:
-  - Wenn PageSpeed Score fehlt/Timeout: erwaehne das als Issue.
-  - Wenn Security Issues existieren: uebernimm sie in issues_found (mind. 1-2 davon).
-- Bitte NICHT immer die gleichen Score-Zahlen verwenden; schaetze realistisch je Website/Quelle.
-
-JSON Format:
+Rating: {rating} ({reviews} Bewertungen){pagespeed_context}{security_context}"""
+    
+    def _build_gemini_prompt(
+        self,
+        url: Optional[str],
+        map_data: Dict[str, Any],
+        pagespeed_data: Optional[Dict[str, Any]],
+        security_data: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Build the per-business part of the Gemini prompt
+        
+        Instructions and JSON format are the static prefix
+        (GEMINI_SYSTEM_INSTRUCTION), sent as system instruction.
+        
+        Args:
+            url: Website URL
+            map_data: Google Maps data
+            pagespeed_data: PageSpeed data
+            security_data: Security audit data
+        
+        Returns:
+            Complete prompt string
+        """
+        context = self._build_business_context(url, map_data, pagespeed_data, security_data)
+        
+        prompt = f"""Analysiere dieses Business und erstelle einen Lead-Report.
 
-{{
-  "lead_quality": "High|Medium|Low",
-  "tech_stack": ["..."],
-  "scores": {{
-    "ui": 0,
-    "ux": 0,
-    "seo": 0,
-    "content": 0,
-    "total": 0
-  }},
-  "report_card": {{
-    "executive_summary": "Kurze Zusammenfassung (<= 160 Zeichen)",
-    "issues_found": ["..."],
-    "recommendations": ["..."]
-  }},
-  "email_pitch": {{
-    "subject": "Betreff (<= 80 Zeichen)",
-    "body_text": "Email Text (<= 300 Zeichen)"
-  }}
-}}
+{context}
 """
         
         return prompt
     
-    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
+    def _build_gemini_batch_prompt(self, businesses: List[tuple]) -> str:
         """
-        Parse Gemini response and extract JSON with robust error handling
+        Build the per-batch part of a Gemini prompt for several businesses
+        
+        Instructions and JSON format are the static prefix
+        (GEMINI_BATCH_SYSTEM_INSTRUCTION); the prompt holds the business
+        blocks, each headed by the place_id the answer must echo.
         
         Args:
-            response_text: Raw response from Gemini
+            businesses: (place_id, business context) pairs
         
         Returns:
-            Parsed JSON data or None if parsing fails
+            Complete prompt string
+        """
+        blocks = "\n\n".join(f"### place_id: {place_id}\n{context}" for place_id, context in businesses)
+        
+        return f"""Analysiere die folgenden {len(businesses)} Businesses.
+
+{blocks}
+"""
+    
+    def _validated_analysis(self, data: Any) -> Optional[Dict[str, Any]]:
+        """
+        Return a parsed analysis if it is complete, else None (caller falls back)
+        
+        Args:
+            data: Parsed JSON (possibly partial if the response was cut off)
         """
         try:
-            # Remove markdown code blocks if present
-            cleaned = response_text.strip()
-            cleaned = re.sub(r'^```json\s*', '', cleaned)
-            cleaned = re.sub(r'^```\s*', '', cleaned)
-            cleaned = re.sub(r'\s*```$', '', cleaned)
-            cleaned = cleaned.strip()
-            
-            # Try to fix common JSON issues
-            # Replace smart quotes with regular quotes
-            cleaned = cleaned.replace('"', '"').replace('"', '"')
-            cleaned = cleaned.replace(''', "'").replace(''', "'")
-            
-            # Try to find JSON object if there's extra text
-            if not cleaned.startswith('{'):
-                # Find first { and last }
-                start = cleaned.find('{')
-                end = cleaned.rfind('}')
-                if start != -1 and end != -1:
-                    cleaned = cleaned[start:end+1]
-            
-            # Check if JSON is truncated (incomplete closing braces)
-            if cleaned.count('{') > cleaned.count('}'):
-                logger.warning("JSON appears truncated - attempting repair")
-                # Try to close the JSON properly
-                missing_braces = cleaned.count('{') - cleaned.count('}')
-                cleaned += '}' * missing_braces
-            
-            # Handle unterminated strings
-            # Count quotes to see if string is not closed
-            quote_count = cleaned.count('"') - cleaned.count('\\"')
-            if quote_count % 2 != 0:
-                logger.warning("Unterminated string detected - attempting repair")
-                # Try to close the string and JSON
-                cleaned += '"}'
-            
-            # Try to parse JSON
-            data = json.loads(cleaned)
-            
-            # Validate required fields
-            required_fields = ["lead_quality", "scores", "report_card", "email_pitch"]
-            for field in required_fields:
-                if field not in data:
-                    logger.warning(f"Missing required field: {field}")
-                    raise ValueError(f"Missing required field: {field}")
-            
-            # Validate nested structures
-            if not isinstance(data.get("scores"), dict):
-                raise ValueError("scores must be a dict")
-            if not isinstance(data.get("report_card"), dict):
-                raise ValueError("report_card must be a dict")
-            if not isinstance(data.get("email_pitch"), dict):
-                raise ValueError("email_pitch must be a dict")
-            
-            logger.info("✅ Successfully parsed Gemini JSON response")
-            return data
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Gemini response: {str(e)}")
-            logger.debug(f"Cleaned response (first 500 chars): {cleaned[:500] if 'cleaned' in locals() else 'N/A'}")
-            logger.debug(f"Raw response length: {len(response_text)} chars")
-            # Don't raise - return None to trigger fallback
-            return None
-        except Exception as e:
-            logger.error(f"Failed to parse Gemini response: {str(e)}")
-            logger.debug(f"Raw response (first 500 chars): {response_text[:500]}")
-            # Don't raise - return None to trigger fallback
+            self._validate_gemini_data(data)
+        except ValueError as e:
+            logger.error(f"Invalid Gemini analysis: {str(e)}")
             return None
+        
+        logger.info("✅ Successfully parsed Gemini JSON response")
+        return data
+    
+    @staticmethod
+    def _validate_gemini_data(data: Any):
+        """
+        Check that a parsed analysis has the fields the pipeline relies on
+        
+        Raises:
+            ValueError: If a required field is missing or has the wrong type
+        """
+        if not isinstance(data, dict):
+            raise ValueError("analysis must be a JSON object")
+        
+        # Validate required fields
+        for field in GEMINI_REQUIRED_FIELDS:
+            if field not in data:
+                logger.warning(f"Missing required field: {field}")
+                raise ValueError(f"Missing required field: {field}")
+        
+        # Validate nested structures
+        if not isinstance(data.get("scores"), dict):
+            raise ValueError("scores must be a dict")
+        if not isinstance(data.get("report_card"), dict):
+            raise ValueError("report_card must be a dict")
+        if not isinstance(data.get("email_pitch"), dict):
+            raise ValueError("email_pitch must be a dict")
     
     def _get_fallback_analysis(
         self,
@@ -1488,7 +2928,53 @@ JSON Format:
                 "body_text": f"Guten Tag,\n\nich habe {business_name} auf Google Maps gefunden und festgestellt: {main_issue}. In Ihrer Branche ist eine professionelle Online-Präsenz heute unverzichtbar. Wir helfen Unternehmen wie Ihrem, mehr Kunden online zu gewinnen. Haben Sie 15 Minuten für ein kurzes Gespräch?\n\nMit freundlichen Grüßen"
             }
         }
-    
+
+    def _get_local_analysis(
+        self,
+        url: Optional[str],
+        map_data: Dict[str, Any],
+        security_data: Optional[Dict[str, Any]],
+        prescore: int
+    ) -> Dict[str, Any]:
+        """
+        Analysis of a lead that stayed below the pre-score threshold
+
+        Same shape as the Gemini analysis, built from local data only:
+        a low pre-score means a site with little to fix, so the quality
+        scores mirror it (total = 100 - pre-score).
+
+        Args:
+            url: Website URL
+            map_data: Google Maps data
+            security_data: Security audit data (can be None)
+            prescore: Result of _local_prescore
+
+        Returns:
+            Local analysis data (lead_quality "Low")
+        """
+        analysis = self._get_fallback_analysis(url, map_data)
+        business_name = map_data.get("name", "Unknown Business")
+        total = 100 - prescore
+        mobile_score = (security_data or {}).get("mobile_score")
+
+        analysis["lead_quality"] = "Low"
+        analysis["scores"] = {
+            "ui": mobile_score if mobile_score else total,
+            "ux": total,
+            "seo": total,
+            "content": total,
+            "total": total
+        }
+        analysis["report_card"] = {
+            "executive_summary": f"{business_name}: Schnellanalyse ohne PageSpeed und AI (Pre-Score {prescore}/100). Die Website zeigt wenig offensichtlichen Handlungsbedarf.",
+            "issues_found": [
+                "Schnellanalyse - nur lokale Signale geprüft",
+                "Vollständige Analyse auf Anfrage verfügbar"
+            ],
+            "recommendations": analysis["report_card"]["recommendations"]
+        }
+        return analysis
+
     def _merge_analysis_data(
         self,
         url: Optional[str],
@@ -1549,8 +3035,9 @@ JSON Format:
         security_issues = security_data.get("security_issues", []) if security_data else []
         mobile_score = security_data.get("mobile_score") if security_data else None
         
-        # Extract tech stack
-        tech_stack = gemini_data.get("tech_stack", ["Unknown"])
+        # Extract tech stack (local fingerprints; Gemini's guess only if none matched)
+        tech_stack = (security_data or {}).get("tech_stack") or gemini_data.get("tech_stack", ["Unknown"])
+        has_ads_pixel = bool((security_data or {}).get("has_ads_pixel"))
         
         # Extract report card and merge with security issues
         report_card = gemini_data.get("report_card", {})
@@ -1595,10 +3082,10 @@ JSON Format:
 
             # Technical details
             "tech_stack": tech_stack,
-            "has_ads_pixel": False,  # To be detected in website scraping
+            "has_ads_pixel": has_ads_pixel,  # Detected from tracking/conversion pixel fingerprints
             "google_speed_score": google_speed_score,
             "loading_time": loading_time,
-            "copyright_year": datetime.utcnow().year,  # To be extracted from website
+            "copyright_year": (security_data or {}).get("copyright_year") or datetime.utcnow().year,  # Current year if the site states none
             
             # Lead classification
             "lead_strength": lead_strength,
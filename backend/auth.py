@@ -4,12 +4,13 @@ JWT Token validation for Supabase Auth
 """
 import os
 import logging
-import requests
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 
+from http_client import get_http_clients
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -45,7 +46,7 @@ def _get_jwks_keys() -> dict:
             headers = {}
             if SUPABASE_KEY:
                 headers["apikey"] = SUPABASE_KEY
-            response = requests.get(JWKS_URL, headers=headers, timeout=5)
+            response = get_http_clients().sync_client().get(JWKS_URL, headers=headers, timeout=5)
             response.raise_for_status()
             _jwks_cache = response.json()
             logger.info(f"✅ Loaded JWKS keys from {JWKS_URL}")
@@ -59,7 +60,7 @@ def _get_user_from_supabase(token: str) -> dict:
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise HTTPException(status_code=401, detail="Supabase auth not configured")
     try:
-        response = requests.get(
+        response = get_http_clients().sync_client().get(
             f"{SUPABASE_URL}/auth/v1/user",
             headers={
                 "Authorization": f"Bearer {token}",
@@ -0,0 +1,262 @@
+"""
+LeadScraper AI - Persistent Cache
+SQLite-backed TTL + LRU cache for provider responses, shared by all processes
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import contextlib
+import copy
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, accessed_at);
+"""
+
+
+def make_key(*parts: Any) -> str:
+    """Stable cache key for JSON-serializable parts (order matters)"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PersistentCache:
+    """
+    TTL + LRU cache for one namespace (e.g. RapidAPI pages) in a local SQLite file
+
+    - Entries expire ttl seconds after they were stored; with stale_ttl,
+      expired entries are kept that much longer and get_entry() still
+      returns them (marked stale) so callers can serve them while they
+      refresh in the background
+    - Beyond max_entries, the least recently read entries are evicted
+    - Values are stored as JSON
+    - With memory_entries, the most recently used entries are also kept
+      in process memory, so repeated hits skip SQLite (and JSON parsing)
+      and return in microseconds; memory hits do not refresh the entry's
+      LRU position on disk
+
+    The cache is an optimization only: database errors are logged and
+    treated as a miss, never raised. Every call opens its own connection,
+    so one instance can be shared by threads and the file by processes
+    (WAL mode). Calls block briefly - async callers use asyncio.to_thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl: float,
+        max_entries: int = 10000,
+        stale_ttl: float = 0.0,
+        memory_entries: int = 0
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = max(0.0, stale_ttl)
+        self.max_entries = max(1, max_entries)
+        self.memory_entries = max(0, memory_entries)
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, stored_at)
+        self._stats = {"hits": 0, "memory_hits": 0, "stale_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            self._record("errors")
+            logger.error(f"⚠️  Cache '{namespace}' unavailable ({path}): {str(e)}")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _record(self, stat: str, count: int = 1):
+        with self._lock:
+            self._stats[stat] += count
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a fresh entry
+
+        Args:
+            key: Cache key (see make_key)
+
+        Returns:
+            Cached value, or None on a miss (absent or expired)
+        """
+        entry = self.get_entry(key, allow_stale=False)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str, allow_stale: bool = True) -> Optional[Tuple[Any, bool]]:
+        """
+        Look up an entry that may be past its ttl (but within stale_ttl)
+
+        Args:
+            key: Cache key (see make_key)
+            allow_stale: Also return expired entries within stale_ttl
+
+        Returns:
+            (value, fresh) or None on a miss
+        """
+        value = self.get_from_memory(key)
+        if value is not None:
+            return value, True
+
+        now = time.time()
+        max_age = self.ttl + (self.stale_ttl if allow_stale else 0.0)
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, stored_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is None or now - row[1] > max_age:
+                    self._record("misses")
+                    return None
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key)
+                )
+            value = json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            self._record("errors")
+            logger.warning(f"Cache '{self.namespace}' read failed: {str(e)}")
+            return None
+
+        fresh = now - row[1] <= self.ttl
+        self._record("hits" if fresh else "stale_hits")
+        if fresh:
+            self._remember(key, value, row[1])
+        return value, fresh
+
+    def get_from_memory(self, key: str) -> Optional[Any]:
+        """
+        Look up a fresh entry in the in-process tier only (no I/O, safe on the event loop)
+
+        Returns:
+            Copy of the cached value, or None if not in memory
+        """
+        if not self.memory_entries:
+            return None
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is None:
+                return None
+            if time.time() - cached[1] > self.ttl:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            # Callers may modify what they get back
+            return copy.deepcopy(cached[0])
+
+    def _remember(self, key: str, value: Any, stored_at: float):
+        """Keep a copy in the in-process tier (if enabled)"""
+        if not self.memory_entries:
+            return
+        with self._lock:
+            self._memory[key] = (copy.deepcopy(value), stored_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def set(self, key: str, value: Any):
+        """
+        Store an entry (replacing any previous one) and evict beyond max_entries
+
+        Args:
+            key: Cache key (see make_key)
+            value: JSON-serializable value
+        """
+        now = time.time()
+        try:
+            data = json.dumps(value, default=str)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, data, now, now)
+                )
+                evicted = self._evict(conn, now)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self._record("errors")
+            logger.warning(f"Cache '{self.namespace}' write failed: {str(e)}")
+            return
+
+        self._remember(key, value, now)
+        self._record("stores")
+        if evicted:
+            self._record("evictions", evicted)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        """Drop expired entries, then the least recently read ones beyond max_entries"""
+        expired = conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND stored_at < ?",
+            (self.namespace, now - self.ttl - self.stale_ttl)
+        ).rowcount
+
+        count = conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return expired
+
+        evicted = conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY accessed_at LIMIT ?)",
+            (self.namespace, self.namespace, overflow)
+        ).rowcount
+        return expired + evicted
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Hit/miss statistics of this process"""
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "max_entries": self.max_entries,
+                "memory_entries": len(self._memory),
+                **self._stats,
+            }
+
+
+def open_cache(
+    namespace: str,
+    ttl: float,
+    max_entries: int,
+    stale_ttl: float = 0.0,
+    memory_entries: int = 0
+) -> PersistentCache:
+    """
+    Open a cache namespace in the shared cache file
+
+    The file is CACHE_PATH (default: backend/cache.db).
+    """
+    path = os.getenv("CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache.db"))
+    return PersistentCache(
+        path, namespace, ttl=ttl, max_entries=max_entries, stale_ttl=stale_ttl, memory_entries=memory_entries
+    )
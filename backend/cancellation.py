@@ -0,0 +1,90 @@
+"""
+LeadScraper AI - Cooperative Cancellation
+Thread-safe cancellation token shared between the API and the analyzer
+"""
+
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation signal for a single bulk search job
+
+    The API side (SSE disconnect, cancel endpoint) and the analyzer side
+    (target reached) can both cancel. Cancelling is idempotent: the first
+    reason wins and registered callbacks run exactly once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel() has been called"""
+        return self._event.is_set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        """Why the job was cancelled (e.g. 'target_reached', 'client_disconnected')"""
+        return self._reason
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        Request cancellation
+
+        Args:
+            reason: Short machine-readable reason
+
+        Returns:
+            True if this call cancelled the token, False if it was already cancelled
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+
+        logger.info(f"🛑 Cancellation requested: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Cancellation callback error: {str(e)}")
+        return True
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Register a callback that runs on cancellation (immediately if already cancelled)
+
+        Args:
+            callback: Function without arguments; must be thread-safe
+
+        Returns:
+            Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def remove():
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+
+                return remove
+
+        callback()
+        return lambda: None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled (or timeout); returns True if cancelled"""
+        return self._event.wait(timeout)
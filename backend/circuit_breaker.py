@@ -0,0 +1,287 @@
+"""
+LeadScraper AI - Circuit Breakers
+Per-provider closed/open/half-open breakers driven by error and timeout rates
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextlib
+from collections import deque
+from typing import Dict, Any, Iterator, Optional
+
+import httpx
+
+from concurrency import (
+    OUTCOME_OK,
+    OUTCOME_TIMEOUT,
+    OUTCOME_OVERLOAD,
+    classify_exception,
+    classify_status,
+)
+
+logger = logging.getLogger(__name__)
+
+# Breaker states
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Defaults per provider: (failure rate to open, min calls in window, seconds open before a trial call)
+PROVIDER_DEFAULTS = {
+    "rapidapi": (0.5, 5, 60.0),
+    "pagespeed": (0.5, 10, 60.0),
+    "gemini": (0.5, 10, 60.0),
+    "supabase": (0.5, 5, 30.0),
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit open - failing fast (next trial in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class _Call:
+    """Handle for one guarded call; lets the caller report the HTTP status"""
+
+    def __init__(self):
+        self.status_code: Optional[int] = None
+
+    def record_status(self, status_code: int):
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one external provider
+
+    - closed: calls pass; outcomes are kept for window_seconds. Once at
+      least min_calls were made and failure_rate_threshold of them failed
+      (timeouts, 429/5xx, network errors), the circuit opens
+    - open: calls fail fast with CircuitOpenError for open_seconds
+    - half_open: up to half_open_max_calls trial calls pass; a failure
+      re-opens the circuit, half_open_max_calls successes close it
+
+    Client errors (4xx, bad input, and for Supabase rows rejected by a
+    constraint, RLS or the schema) say nothing about provider health and
+    are not counted.
+
+    Thread-safe: used from the engine loop and from worker threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 60.0,
+        open_seconds: float = 60.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = max(1, min_calls)
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._outcomes: deque = deque()  # (timestamp, failed)
+        self._opened_at = 0.0
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0}
+        self._transitions = {STATE_OPEN: 0, STATE_HALF_OPEN: 0, STATE_CLOSED: 0}
+
+    @property
+    def state(self) -> str:
+        """Current state (an expired open circuit reports half_open)"""
+        with self._lock:
+            self._check_open_expired(time.monotonic())
+            return self._state
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[_Call]:
+        """
+        Run one provider call through the breaker
+
+        Usage (sync or async code):
+            with breaker.guard() as call:
+                response = await client.get(...)
+                call.record_status(response.status_code)
+
+        Raises:
+            CircuitOpenError: If the circuit is open (the body is not run)
+        """
+        trial = self._before_call()
+        call = _Call()
+        try:
+            yield call
+        except asyncio.CancelledError:
+            # Cancelled by us (job cancelled) - says nothing about the provider
+            self._after_call(trial, None)
+            raise
+        except Exception as exc:
+            self._after_call(trial, self._is_failure_exception(exc))
+            raise
+        else:
+            self._after_call(trial, classify_status(call.status_code) != OUTCOME_OK)
+
+    def _is_failure_exception(self, exc: BaseException) -> Optional[bool]:
+        """True = failure, None = neutral (not counted)"""
+        if isinstance(exc, httpx.TransportError):
+            return True  # Connect errors, resets, timeouts
+        if classify_exception(exc) in (OUTCOME_TIMEOUT, OUTCOME_OVERLOAD):
+            return True
+        return None
+
+    def _before_call(self) -> bool:
+        """Admit a call (returns True for a half-open trial) or raise CircuitOpenError"""
+        with self._lock:
+            now = time.monotonic()
+            self._check_open_expired(now)
+
+            if self._state == STATE_OPEN:
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(self.name, self._opened_at + self.open_seconds - now)
+
+            if self._state == STATE_HALF_OPEN:
+                if self._trials_in_flight >= self.half_open_max_calls:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, 0)
+                self._trials_in_flight += 1
+                return True
+
+            return False
+
+    def _after_call(self, trial: bool, failed: Optional[bool]):
+        with self._lock:
+            now = time.monotonic()
+            if trial:
+                self._trials_in_flight -= 1
+
+            if failed is None:
+                return
+
+            self._stats["calls"] += 1
+            if failed:
+                self._stats["failures"] += 1
+
+            if self._state == STATE_HALF_OPEN:
+                if not trial:
+                    return  # Call admitted before the circuit opened
+                if failed:
+                    self._transition(STATE_OPEN, now, "trial call failed")
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_max_calls:
+                        self._transition(STATE_CLOSED, now, "trial call succeeded")
+                return
+
+            if self._state == STATE_OPEN:
+                return
+
+            self._outcomes.append((now, failed))
+            self._prune(now)
+            total = len(self._outcomes)
+            if failed and total >= self.min_calls:
+                failures = sum(1 for _, was_failure in self._outcomes if was_failure)
+                if failures / total >= self.failure_rate_threshold:
+                    self._transition(STATE_OPEN, now, f"{failures}/{total} calls failed in {self.window_seconds:.0f}s")
+
+    def _prune(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def _check_open_expired(self, now: float):
+        if self._state == STATE_OPEN and now - self._opened_at >= self.open_seconds:
+            self._transition(STATE_HALF_OPEN, now, f"open for {self.open_seconds:.0f}s")
+
+    def _transition(self, state: str, now: float, reason: str):
+        previous = self._state
+        self._state = state
+        self._transitions[state] += 1
+        self._trial_successes = 0
+
+        if state == STATE_OPEN:
+            self._opened_at = now
+            print(f"🔌 {self.name} circuit OPEN ({reason}) - failing fast for {self.open_seconds:.0f}s")
+            logger.warning(f"{self.name} circuit {previous} -> open ({reason})")
+        elif state == STATE_CLOSED:
+            self._outcomes.clear()
+            print(f"🔌 {self.name} circuit closed ({reason})")
+            logger.info(f"{self.name} circuit {previous} -> closed ({reason})")
+        else:
+            logger.info(f"{self.name} circuit {previous} -> half_open ({reason})")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state for the debug endpoint"""
+        with self._lock:
+            now = time.monotonic()
+            self._check_open_expired(now)
+            self._prune(now)
+            return {
+                "state": self._state,
+                "window_calls": len(self._outcomes),
+                "window_failures": sum(1 for _, failed in self._outcomes if failed),
+                "retry_in": round(max(0.0, self._opened_at + self.open_seconds - now), 1) if self._state == STATE_OPEN else None,
+                "transitions": dict(self._transitions),
+                **self._stats,
+            }
+
+
+class CircuitBreakers:
+    """
+    Process-wide registry of circuit breakers, one per provider
+
+    Configured from env per provider (RAPIDAPI_, PAGESPEED_, GEMINI_, SUPABASE_):
+      {PREFIX}_BREAKER_FAILURE_RATE (0-1), {PREFIX}_BREAKER_MIN_CALLS,
+      {PREFIX}_BREAKER_OPEN_SECONDS
+    plus BREAKER_WINDOW_SECONDS and BREAKER_HALF_OPEN_CALLS for all providers.
+    CIRCUIT_BREAKERS=false disables them (circuits never open).
+    """
+
+    def __init__(self):
+        enabled = os.getenv("CIRCUIT_BREAKERS", "true").lower() == "true"
+        window_seconds = float(os.getenv("BREAKER_WINDOW_SECONDS", 60))
+        half_open_max_calls = int(os.getenv("BREAKER_HALF_OPEN_CALLS", 1))
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        for name, (failure_rate, min_calls, open_seconds) in PROVIDER_DEFAULTS.items():
+            prefix = name.upper()
+            self._breakers[name] = CircuitBreaker(
+                name=name,
+                failure_rate_threshold=float(os.getenv(f"{prefix}_BREAKER_FAILURE_RATE", failure_rate)) if enabled else float("inf"),
+                min_calls=int(os.getenv(f"{prefix}_BREAKER_MIN_CALLS", min_calls)),
+                window_seconds=window_seconds,
+                open_seconds=float(os.getenv(f"{prefix}_BREAKER_OPEN_SECONDS", open_seconds)),
+                half_open_max_calls=half_open_max_calls,
+            )
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """Get the breaker for a provider ('rapidapi', 'pagespeed', 'gemini', 'supabase')"""
+        return self._breakers[provider]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current state of all breakers"""
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+
+# Singleton instance
+_circuit_breakers_instance = None
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breakers() -> CircuitBreakers:
+    """Get or create the process-wide circuit breakers"""
+    global _circuit_breakers_instance
+    with _circuit_breakers_lock:
+        if _circuit_breakers_instance is None:
+            _circuit_breakers_instance = CircuitBreakers()
+    return _circuit_breakers_instance
@@ -0,0 +1,252 @@
+"""
+LeadScraper AI - Adaptive Concurrency Control
+AIMD (additive increase, multiplicative decrease) in-flight limits per external provider
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextlib
+from collections import deque
+from typing import Dict, Any, Optional, AsyncIterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Call outcomes
+OUTCOME_OK = "ok"
+OUTCOME_SLOW = "slow"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_OVERLOAD = "overload"  # 429 / 5xx
+OUTCOME_ERROR = "error"  # Client-side errors (4xx, DNS, ...) - no signal about provider load
+
+# Default limits per provider: (initial, min, max, target latency in seconds)
+PROVIDER_DEFAULTS = {
+    "rapidapi": (3, 1, 10, 8.0),
+    "pagespeed": (8, 1, 50, 30.0),
+    "website": (20, 2, 200, 5.0),
+    "gemini": (8, 1, 50, 20.0),
+}
+
+
+def classify_status(status_code: Optional[int]) -> str:
+    """Map an HTTP status code to a call outcome"""
+    if status_code is None:
+        return OUTCOME_OK
+    if status_code == 429 or status_code >= 500:
+        return OUTCOME_OVERLOAD
+    return OUTCOME_OK
+
+
+def classify_exception(exc: BaseException) -> str:
+    """
+    Map an exception raised by a provider call to a call outcome
+
+    Handles httpx errors, google.api_core errors (which carry the HTTP
+    status in .code, e.g. ResourceExhausted = 429) and PostgREST errors
+    (SQLSTATE / PGRST codes as strings; PGRST000-PGRST003 mean the
+    database is unreachable, everything else is a rejected request).
+    """
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return OUTCOME_TIMEOUT
+    if isinstance(exc, httpx.HTTPStatusError):
+        return classify_status(exc.response.status_code)
+    if type(exc).__name__ == "DeadlineExceeded":
+        return OUTCOME_TIMEOUT
+
+    code = getattr(exc, "code", None)
+    if isinstance(code, str) and code.startswith("PGRST00"):
+        return OUTCOME_OVERLOAD
+    if isinstance(code, int):
+        outcome = classify_status(code)
+        if outcome != OUTCOME_OK:
+            return outcome
+    return OUTCOME_ERROR
+
+
+class _Slot:
+    """Handle for one in-flight call; lets the caller report the HTTP status"""
+
+    def __init__(self):
+        self.status_code: Optional[int] = None
+
+    def record_status(self, status_code: int):
+        self.status_code = status_code
+
+
+class AdaptiveLimiter:
+    """
+    AIMD in-flight limit for one external provider
+
+    - Every fast, successful call grows the limit by increase / limit
+      (about +increase per round-trip's worth of calls)
+    - A timeout, 429/5xx or a call slower than target_latency multiplies
+      the limit by decrease_factor, at most once per cooldown window so a
+      single burst of failures does not collapse the limit to the minimum
+
+    Must only be used from one event loop (the analyzer engine loop).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        target_latency: float,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = target_latency
+
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+        self._latency_ewma: Optional[float] = None
+        self._stats = {OUTCOME_OK: 0, OUTCOME_SLOW: 0, OUTCOME_TIMEOUT: 0, OUTCOME_OVERLOAD: 0, OUTCOME_ERROR: 0}
+
+    @property
+    def limit(self) -> int:
+        """Current in-flight limit"""
+        return int(self._limit)
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[_Slot]:
+        """
+        Acquire a permit for one call and feed its outcome back into the limit
+
+        Usage:
+            async with limiter.slot() as slot:
+                response = await client.get(...)
+                slot.record_status(response.status_code)
+        """
+        await self._acquire()
+        slot = _Slot()
+        started = time.monotonic()
+        outcome: Optional[str] = None
+
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            # Cancelled by us (job cancelled) - says nothing about the provider
+            outcome = None
+            raise
+        except Exception as exc:
+            outcome = classify_exception(exc)
+            raise
+        else:
+            outcome = classify_status(slot.status_code)
+        finally:
+            self._release(outcome, time.monotonic() - started)
+
+    async def _acquire(self):
+        while self._in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass on a wake-up we received but can no longer use
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_waiters()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._in_flight += 1
+
+    def _release(self, outcome: Optional[str], latency: float):
+        self._in_flight -= 1
+
+        if outcome is not None:
+            if outcome == OUTCOME_OK and latency > self.target_latency:
+                outcome = OUTCOME_SLOW
+            self._stats[outcome] += 1
+            self._adjust(outcome, latency)
+
+        self._wake_waiters()
+
+    def _adjust(self, outcome: str, latency: float):
+        if outcome in (OUTCOME_OK, OUTCOME_SLOW):
+            self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+
+        if outcome == OUTCOME_OK:
+            self._limit = min(self.max_limit, self._limit + self.increase / max(self._limit, 1.0))
+        elif outcome in (OUTCOME_SLOW, OUTCOME_TIMEOUT, OUTCOME_OVERLOAD):
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                previous = self.limit
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self._last_decrease = now
+                logger.warning(
+                    f"📉 {self.name} concurrency {previous} -> {self.limit} "
+                    f"({outcome}, latency {latency:.1f}s)"
+                )
+
+    def _wake_waiters(self):
+        free = self.limit - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state for the debug endpoint"""
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "target_latency": self.target_latency,
+            "latency_ewma": round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+            "outcomes": dict(self._stats),
+        }
+
+
+class ConcurrencyController:
+    """Process-wide registry of adaptive limiters, one per external provider"""
+
+    def __init__(self):
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        for name, (initial, min_limit, max_limit, target_latency) in PROVIDER_DEFAULTS.items():
+            prefix = name.upper()
+            self._limiters[name] = AdaptiveLimiter(
+                name=name,
+                initial=int(os.getenv(f"{prefix}_CONCURRENCY_INITIAL", initial)),
+                min_limit=int(os.getenv(f"{prefix}_CONCURRENCY_MIN", min_limit)),
+                max_limit=int(os.getenv(f"{prefix}_CONCURRENCY_MAX", max_limit)),
+                target_latency=float(os.getenv(f"{prefix}_TARGET_LATENCY", target_latency)),
+            )
+
+    def limiter(self, provider: str) -> AdaptiveLimiter:
+        """Get the limiter for a provider ('rapidapi', 'pagespeed', 'website', 'gemini')"""
+        return self._limiters[provider]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current limits of all providers"""
+        return {name: limiter.snapshot() for name, limiter in self._limiters.items()}
+
+
+# Singleton instance
+_controller_instance = None
+_controller_lock = threading.Lock()
+
+def get_concurrency_controller() -> ConcurrencyController:
+    """Get or create the concurrency controller singleton"""
+    global _controller_instance
+    with _controller_lock:
+        if _controller_instance is None:
+            _controller_instance = ConcurrencyController()
+    return _controller_instance
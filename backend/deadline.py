@@ -0,0 +1,88 @@
+"""
+LeadScraper AI - Deadline Budgets
+Per-job and per-lead time budgets shared by all analysis stages
+"""
+
+import time
+from typing import Optional
+
+
+class BudgetExhausted(Exception):
+    """Raised when too little of a deadline is left to start a call (not a provider failure)"""
+
+
+class Deadline:
+    """
+    Point in time by which a job or a lead must be finished
+
+    Stages do not use fixed timeouts but ask the deadline how much time
+    is left (timeout()), and skip optional work when too little remains
+    (allows()). A lead's deadline is a child of its job's deadline, so it
+    never outlives the job.
+
+    Immutable and based on time.monotonic(), so it can be shared freely
+    between coroutines and threads.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None):
+        """
+        Args:
+            seconds: Budget from now (None or <= 0 = unbounded)
+            parent: Deadline this one may not outlive
+        """
+        expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+
+    @property
+    def bounded(self) -> bool:
+        """False for an unbounded deadline"""
+        return self.expires_at is not None
+
+    @property
+    def expired(self) -> bool:
+        """True once no time is left"""
+        return self.remaining() <= 0
+
+    def remaining(self) -> float:
+        """Seconds left (inf if unbounded, never negative)"""
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, cap: float) -> float:
+        """
+        Timeout for one call: the remaining budget, at most cap
+
+        Args:
+            cap: The call's own upper bound (e.g. 45s for PageSpeed)
+        """
+        return min(cap, self.remaining())
+
+    def allows(self, seconds: float) -> bool:
+        """True if at least seconds are left (i.e. a stage needing that long is worth starting)"""
+        return self.remaining() >= seconds
+
+    def require(self, seconds: float, what: str = "call"):
+        """
+        Raise BudgetExhausted unless at least seconds are left
+
+        Used after waiting for a rate limit, right before the provider call.
+        """
+        if not self.allows(seconds):
+            raise BudgetExhausted(f"{what} needs {seconds:.0f}s, {self.remaining():.1f}s left")
+
+    def child(self, seconds: Optional[float]) -> "Deadline":
+        """Sub-budget of at most seconds that ends no later than this deadline"""
+        return Deadline(seconds, parent=self)
+
+    def shortened(self, seconds: float) -> "Deadline":
+        """Deadline ending seconds earlier (reserves time for a later stage)"""
+        deadline = Deadline()
+        if self.expires_at is not None:
+            deadline.expires_at = self.expires_at - seconds
+        return deadline
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.1f}s)" if self.bounded else "Deadline(unbounded)"
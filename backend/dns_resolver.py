@@ -0,0 +1,241 @@
+"""
+LeadScraper AI - Cached DNS Resolution
+Async resolver with positive/negative TTL cache and Happy Eyeballs connects for website fetches
+"""
+
+import os
+import time
+import socket
+import asyncio
+import logging
+import ipaddress
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+import httpcore
+
+logger = logging.getLogger(__name__)
+
+
+class DNSResolver:
+    """
+    Async hostname resolver with a TTL cache
+
+    - Successful lookups are cached for ttl seconds, resolution failures
+      (NXDOMAIN, no addresses) for negative_ttl seconds, so a dead domain
+      fails within milliseconds on every later lookup. Timeouts are not
+      cached - a slow resolver says nothing about the domain
+    - Concurrent lookups of the same host share one query
+    - Lookups are bounded by timeout so a slow resolver cannot eat the
+      whole website-fetch budget
+
+    Must only be used from one event loop (the analyzer engine loop).
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        negative_ttl: float = 60.0,
+        timeout: float = 3.0,
+        max_entries: int = 10000
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_entries = max_entries
+
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # host -> (expires, addresses, error)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "failures": 0}
+
+    async def resolve(self, host: str, timeout: Optional[float] = None) -> List[str]:
+        """
+        Resolve a hostname to IP addresses (Happy Eyeballs order: address families interleaved)
+
+        Args:
+            host: Hostname or IP literal
+            timeout: Upper bound for an uncached lookup (default: self.timeout)
+
+        Returns:
+            Non-empty list of IP addresses
+
+        Raises:
+            httpcore.ConnectError: If the host does not resolve (cached for negative_ttl)
+            httpcore.ConnectTimeout: If the lookup times out (not cached)
+        """
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        key = host.lower().rstrip(".")
+        cached = self._cache.get(key)
+        if cached is not None:
+            expires, addresses, error = cached
+            if expires > time.monotonic():
+                self._cache.move_to_end(key)
+                if error:
+                    self._stats["negative_hits"] += 1
+                    raise httpcore.ConnectError(error)
+                self._stats["hits"] += 1
+                return addresses
+            del self._cache[key]
+
+        future = self._in_flight.get(key)
+        if future is None:
+            self._stats["misses"] += 1
+            future = asyncio.ensure_future(self._lookup(key, min(timeout or self.timeout, self.timeout)))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._lookup_done(key, done))
+
+        # Shield: one caller giving up must not cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    def _lookup_done(self, key: str, future: asyncio.Future):
+        self._in_flight.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # Mark retrieved even if every waiter gave up
+
+    async def _lookup(self, host: str, timeout: float) -> List[str]:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(
+                loop.getaddrinfo(host, None, type=socket.SOCK_STREAM),
+                timeout=timeout
+            )
+            addresses = self._interleave([info[4][0] for info in infos], [info[0] for info in infos])
+            if not addresses:
+                raise socket.gaierror(f"No addresses for {host}")
+        except asyncio.TimeoutError:
+            self._stats["failures"] += 1
+            raise httpcore.ConnectTimeout(f"DNS lookup timed out for {host}")
+        except OSError as e:
+            error = f"DNS lookup failed for {host}: {e}"
+            self._stats["failures"] += 1
+            self._store(host, self.negative_ttl, [], error)
+            raise httpcore.ConnectError(error)
+
+        self._store(host, self.ttl, addresses, None)
+        return addresses
+
+    def _store(self, host: str, ttl: float, addresses: List[str], error: Optional[str]):
+        self._cache[host] = (time.monotonic() + ttl, addresses, error)
+        self._cache.move_to_end(host)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _interleave(addresses: List[str], families: List[int]) -> List[str]:
+        """De-duplicate and alternate address families, preferred family first (RFC 8305)"""
+        by_family: "OrderedDict[int, List[str]]" = OrderedDict()
+        seen: Set[str] = set()
+        for address, family in zip(addresses, families):
+            if address not in seen:
+                seen.add(address)
+                by_family.setdefault(family, []).append(address)
+
+        ordered = []
+        queues = list(by_family.values())
+        while any(queues):
+            for queue in queues:
+                if queue:
+                    ordered.append(queue.pop(0))
+        return ordered
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cache statistics"""
+        return {"entries": len(self._cache), **self._stats}
+
+
+class CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend that resolves through DNSResolver and
+    connects with Happy Eyeballs
+
+    Connection attempts to the resolved addresses are staggered by
+    happy_eyeballs_delay (a failed attempt starts the next one at once);
+    the first established connection wins and the others are cancelled.
+    TLS still uses the original hostname for SNI and certificate checks.
+    """
+
+    def __init__(self, resolver: DNSResolver, happy_eyeballs_delay: float = 0.25):
+        self.resolver = resolver
+        self.happy_eyeballs_delay = happy_eyeballs_delay
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options=None
+    ) -> httpcore.AsyncNetworkStream:
+        addresses = await self.resolver.resolve(host, timeout=timeout)
+
+        def connect(address: str):
+            return self._backend.connect_tcp(
+                address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+            )
+
+        if len(addresses) == 1:
+            return await connect(addresses[0])
+
+        pending: Set[asyncio.Task] = set()
+        errors: List[BaseException] = []
+        try:
+            for address in addresses:
+                pending.add(asyncio.ensure_future(connect(address)))
+                stream = await self._first_connected(pending, errors, self.happy_eyeballs_delay)
+                if stream is not None:
+                    return stream
+
+            while pending:
+                stream = await self._first_connected(pending, errors, None)
+                if stream is not None:
+                    return stream
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(self._close_late_connection)
+
+        raise errors[-1] if errors else httpcore.ConnectError(f"Could not connect to {host}")
+
+    @staticmethod
+    async def _first_connected(
+        pending: Set[asyncio.Task],
+        errors: List[BaseException],
+        timeout: Optional[float]
+    ) -> Optional[httpcore.AsyncNetworkStream]:
+        """Wait up to timeout for an attempt to finish; returns its stream or None"""
+        done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            pending.discard(task)
+            if task.exception() is None:
+                return task.result()
+            errors.append(task.exception())
+        return None
+
+    @staticmethod
+    def _close_late_connection(task: asyncio.Task):
+        """A losing attempt that connected anyway must not leak its socket"""
+        if not task.cancelled() and task.exception() is None:
+            asyncio.ensure_future(task.result().aclose())
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+def create_network_backend() -> CachingNetworkBackend:
+    """Create a caching network backend from env settings"""
+    resolver = DNSResolver(
+        ttl=float(os.getenv("DNS_CACHE_TTL", 300)),
+        negative_ttl=float(os.getenv("DNS_NEGATIVE_TTL", 60)),
+        timeout=float(os.getenv("DNS_TIMEOUT", 3)),
+        max_entries=int(os.getenv("DNS_CACHE_SIZE", 10000)),
+    )
+    return CachingNetworkBackend(resolver, happy_eyeballs_delay=float(os.getenv("HAPPY_EYEBALLS_DELAY", 0.25)))
@@ -0,0 +1,197 @@
+"""
+LeadScraper AI - Gemini Client
+Warmed model handles per static prompt prefix, context caching and token accounting
+"""
+
+import time
+import asyncio
+import hashlib
+import logging
+import datetime
+import threading
+from typing import Any, Dict, Tuple
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+# Prefix cache modes (GEMINI_PREFIX_CACHE)
+PREFIX_CACHE_OFF = "off"  # Prefix sent as system instruction with every call
+PREFIX_CACHE_LOCAL = "local"  # In-process stand-in for context caching (tests, offline)
+PREFIX_CACHE_REMOTE = "remote"  # Gemini context caching (genai.caching.CachedContent)
+
+
+class LocalPrefixCache:
+    """
+    In-process stand-in for Gemini context caching
+
+    Stores each static prefix once and hands out models that send it as
+    system instruction. Same interface as RemotePrefixCache, but makes no
+    API calls - for tests and for running without context caching.
+    """
+
+    def __init__(self):
+        self._prefixes: Dict[str, str] = {}
+
+    def create(self, model_name: str, system_instruction: str, ttl: float) -> str:
+        handle = f"local/{hashlib.sha256(system_instruction.encode('utf-8')).hexdigest()[:16]}"
+        self._prefixes[handle] = system_instruction
+        return handle
+
+    def model(self, model_name: str, handle: str) -> genai.GenerativeModel:
+        return genai.GenerativeModel(model_name, system_instruction=self._prefixes[handle])
+
+
+class RemotePrefixCache:
+    """
+    Gemini context caching: the prefix is stored by the API for ttl seconds
+    and its tokens are billed at the cached rate on every call that uses it
+
+    The API only caches prefixes above a model-specific minimum size;
+    create() raises for smaller ones (GeminiClient then falls back).
+    """
+
+    def create(self, model_name: str, system_instruction: str, ttl: float) -> Any:
+        return genai.caching.CachedContent.create(
+            model=model_name,
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl),
+            display_name="leadscraper-prompt-prefix",
+        )
+
+    def model(self, model_name: str, handle: Any) -> genai.GenerativeModel:
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+
+class GeminiClient:
+    """
+    Process-wide Gemini model handles, one per static prompt prefix
+
+    Prompts are split into a static prefix (instructions, JSON format),
+    passed as system instruction, and the per-business part sent with
+    each call. The model handle for a prefix is created once and reused,
+    so its async client and connections stay warm. With a prefix cache
+    the prefix is created once per ttl as cached context; if the API
+    refuses (too small, model without caching), the plain system
+    instruction is used - Gemini 2.5 models still cache repeated prefixes
+    implicitly.
+
+    Token counts of every call are recorded (record_usage), so spend per
+    lead and per process is measurable.
+
+    Must only be used from one event loop (the analyzer engine loop).
+    """
+
+    def __init__(self, model_name: str, prefix_cache: str = PREFIX_CACHE_OFF, cache_ttl: float = 3600.0):
+        """
+        Args:
+            model_name: Gemini model (e.g. models/gemini-2.5-flash)
+            prefix_cache: 'off', 'local' or 'remote'
+            cache_ttl: Seconds a cached prefix lives (recreated shortly before it expires)
+        """
+        self.model_name = model_name
+        self.prefix_cache = prefix_cache
+        self.cache_ttl = cache_ttl
+
+        if prefix_cache == PREFIX_CACHE_REMOTE:
+            self._backend = RemotePrefixCache()
+        elif prefix_cache == PREFIX_CACHE_LOCAL:
+            self._backend = LocalPrefixCache()
+        else:
+            self._backend = None
+
+        self._models: Dict[str, Tuple[genai.GenerativeModel, float]] = {}  # prefix hash -> (model, renew_at)
+        self._creating: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._prefix_stats = {"prefixes_created": 0, "prefix_fallbacks": 0, "model_reuses": 0}
+        self._usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+
+    async def model(self, system_instruction: str) -> genai.GenerativeModel:
+        """
+        Get the warmed model for a static prompt prefix
+
+        Args:
+            system_instruction: Static prefix (identical for every call of a kind)
+
+        Returns:
+            genai.GenerativeModel to call with the per-business prompt only
+        """
+        key = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+        entry = self._models.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            self._prefix_stats["model_reuses"] += 1
+            return entry[0]
+
+        # Concurrent first calls share one creation
+        task = self._creating.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create(key, system_instruction))
+            self._creating[key] = task
+            task.add_done_callback(lambda _: self._creating.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _create(self, key: str, system_instruction: str) -> genai.GenerativeModel:
+        model = None
+        renew_at = float("inf")
+
+        if self._backend is not None:
+            try:
+                handle = await asyncio.to_thread(self._backend.create, self.model_name, system_instruction, self.cache_ttl)
+                model = self._backend.model(self.model_name, handle)
+                renew_at = time.monotonic() + self.cache_ttl * 0.9  # Before the cached prefix expires
+                self._prefix_stats["prefixes_created"] += 1
+                print(f"🧊 Gemini prompt prefix cached ({self.prefix_cache}, {len(system_instruction)} chars)")
+                logger.info(f"Gemini prefix {key[:12]} cached ({self.prefix_cache}, ttl {self.cache_ttl:.0f}s)")
+            except Exception as e:
+                # Keep using the plain system instruction for this prefix
+                self._prefix_stats["prefix_fallbacks"] += 1
+                logger.warning(f"Gemini context caching unavailable, sending prefix with each call: {str(e)}")
+
+        if model is None:
+            model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+
+        self._models[key] = (model, renew_at)
+        return model
+
+    @staticmethod
+    def usage_of(usage_metadata: Any) -> Dict[str, int]:
+        """
+        Token counts from a response's usage_metadata
+
+        Returns:
+            prompt_tokens (incl. cached), cached_tokens and output_tokens (0 if unknown)
+        """
+        return {
+            "prompt_tokens": int(getattr(usage_metadata, "prompt_token_count", 0) or 0),
+            "cached_tokens": int(getattr(usage_metadata, "cached_content_token_count", 0) or 0),
+            "output_tokens": int(getattr(usage_metadata, "candidates_token_count", 0) or 0),
+        }
+
+    def record_usage(self, usage_metadata: Any) -> Dict[str, int]:
+        """
+        Record the token counts of one finished call
+
+        Args:
+            usage_metadata: Last usage_metadata of the response (None if it had none)
+
+        Returns:
+            Token counts of the call (see usage_of)
+        """
+        usage = self.usage_of(usage_metadata)
+        with self._lock:
+            self._usage["calls"] += 1
+            for name, count in usage.items():
+                self._usage[name] += count
+        return usage
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Prefix cache state and token totals of this process"""
+        with self._lock:
+            usage = dict(self._usage)
+        return {
+            "model": self.model_name,
+            "prefix_cache": self.prefix_cache,
+            "prefixes": len(self._models),
+            **self._prefix_stats,
+            **usage,
+        }
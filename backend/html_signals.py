@@ -0,0 +1,263 @@
+"""
+LeadScraper AI - HTML Signal Extraction
+Single tokenizer pass over a fetched page for contact, mobile, SEO and tech signals
+"""
+
+import re
+import json
+import logging
+from datetime import datetime
+from html import unescape
+from typing import Any, Dict, List, Optional
+
+from tech_detect import get_tech_detector, trie_pattern
+
+logger = logging.getLogger(__name__)
+
+# Markers of a responsive layout (bonus points in the mobile score)
+RESPONSIVE_HINTS = ("bootstrap", "responsive", "@media", "flexbox", "grid-template")
+
+_TAG_NAME_END = frozenset(" \t\r\n\f/>")
+_HREF = re.compile(r"""\s[Hh][Rr][Ee][Ff]\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_ATTRIBUTE = re.compile(r"""([A-Za-z_:][-A-Za-z0-9_:.]*)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_EMAIL_LOCAL = re.compile(r"[A-Za-z0-9._%+-]+$")  # Searched backwards from the @ (endpos = @)
+_EMAIL_DOMAIN = re.compile(r"[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_YEAR = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+_SCRIPT_END = re.compile(r"</[Ss][Cc][Rr][Ii][Pp][Tt]")
+_TITLE_END = re.compile(r"</[Tt][Ii][Tt][Ll][Ee]")
+
+_COPYRIGHT_WINDOW = 40  # Characters after the copyright sign searched for years
+
+
+def _event_words() -> Dict[str, str]:
+    """
+    Event words of the single pass -> kind
+
+    Case variants are listed instead of matching with IGNORECASE, so the
+    page is neither lowercased nor copied.
+    """
+    words = {"@": "at"}
+    for tag in ("meta", "title", "a", "script"):
+        for variant in (tag, tag.upper(), tag.capitalize()):
+            words["<" + variant] = "tag"
+    for mark in ("©", "&copy;", "&#169;", "&#xA9;", "Copyright", "copyright", "COPYRIGHT"):
+        words[mark] = "copyright"
+    for hint in RESPONSIVE_HINTS:
+        if hint != "@media":  # Found via the @ event
+            for variant in (hint, hint.capitalize()):
+                words[variant] = "hint"
+    return words
+
+
+_EVENT_WORDS = _event_words()
+
+
+class HTMLSignalExtractor:
+    """
+    Extracts every signal the audit needs from a page in one pass
+
+    A single compiled regex - a prefix trie of all event words: tags of
+    interest, @ signs, copyright marks, responsive hints and, when a tech
+    matcher is embedded, the anchors of the tech-stack fingerprints -
+    finds every event position. Each event is then handled locally with
+    position-bounded matches on the original string: attributes, the
+    email around an @, the years after a copyright mark. The page is
+    never lowercased or sliced as a whole.
+    """
+
+    def __init__(self, tech_matcher: Any = None):
+        """
+        Args:
+            tech_matcher: tech_detect literal matcher whose anchors are scanned
+                in the same pass (its hits are returned as tech_hits)
+        """
+        self._tech = tech_matcher
+        tech_anchors = set(tech_matcher.anchors) if tech_matcher is not None else set()
+        words = set(_EVENT_WORDS) | tech_anchors
+
+        # The trie matches the longest word at a position: shorter words it starts with
+        # (e.g. "<a" inside a fingerprint "<app-root") are handled with it
+        self._events: Dict[str, List[tuple]] = {}
+        self._tech_anchor: Dict[str, Optional[str]] = {}
+        for word in words:
+            self._events[word] = [(kind, len(event)) for event, kind in _EVENT_WORDS.items() if word.startswith(event)]
+            prefixes = [anchor for anchor in tech_anchors if word.startswith(anchor)]
+            self._tech_anchor[word] = max(prefixes, key=len) if prefixes else None
+        self._regex = re.compile(trie_pattern(words))
+
+    def extract(self, html: str, url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Scan a page once
+
+        Args:
+            html: Page HTML (as read for the audit; may be empty)
+            url: Page URL (links to its host count as internal)
+
+        Returns:
+            Dict with emails (lowercase, page order), viewport (content or
+            None), responsive_hints, copyright_year (latest year next to a
+            copyright mark, or None), title, meta_description,
+            json_ld_types, links (internal/external/mailto/tel counts) and
+            tech_hits (fingerprint literal -> position)
+        """
+        signals: Dict[str, Any] = {
+            "emails": [],
+            "viewport": None,
+            "responsive_hints": [],
+            "copyright_year": None,
+            "title": None,
+            "meta_description": None,
+            "json_ld_types": [],
+            "links": {"internal": 0, "external": 0, "mailto": 0, "tel": 0},
+            "tech_hits": {},
+        }
+        if not html:
+            return signals
+
+        host = self._host(url)
+        emails: Dict[str, None] = {}
+        hints: Dict[str, None] = {}
+        max_year = datetime.utcnow().year + 1
+
+        search = self._regex.search
+        match = search(html)
+        while match is not None:
+            word = match.group()
+            position = match.start()
+
+            for kind, length in self._events[word]:
+                end = position + length
+                if kind == "tag":
+                    if html[end:end + 1] in _TAG_NAME_END:
+                        self._handle_tag(html, word[1:length].lower(), end, host, signals)
+                elif kind == "at":
+                    email = self._email_at(html, position)
+                    if email:
+                        emails[email] = None
+                    elif html.startswith("media", end):
+                        hints["@media"] = None
+                elif kind == "copyright":
+                    for year_match in _YEAR.finditer(html, end, end + _COPYRIGHT_WINDOW):
+                        year = int(year_match.group())
+                        if 1990 <= year <= max_year and year > (signals["copyright_year"] or 0):
+                            signals["copyright_year"] = year
+                elif kind == "hint":
+                    hints[word[:length].lower()] = None
+
+            if self._tech_anchor[word] is not None:
+                self._tech.resolve(html, self._tech_anchor[word], position, signals["tech_hits"])
+
+            # Events may overlap (a fingerprint inside a tag): continue right after this one's start
+            match = search(html, position + 1)
+
+        signals["emails"] = list(emails)
+        signals["responsive_hints"] = [hint for hint in RESPONSIVE_HINTS if hint in hints]
+        return signals
+
+    def _handle_tag(self, html: str, tag: str, start: int, host: str, signals: Dict[str, Any]):
+        """Read the attributes (and for title / JSON-LD the content) of a tag of interest"""
+        end = html.find(">", start)
+        if end == -1:
+            return
+
+        if tag == "a":
+            # Most frequent tag: only its href is read
+            href = _HREF.search(html, start - 1, end)
+            if href is None:
+                return
+            href = (href.group(1) or href.group(2) or href.group(3) or "").strip()
+            scheme = href[:7].lower()
+            if scheme.startswith("mailto:"):
+                signals["links"]["mailto"] += 1  # The address itself is found by its @ event
+            elif scheme.startswith("tel:"):
+                signals["links"]["tel"] += 1
+            elif href and not href.startswith(("#", "javascript:")):
+                link_host = self._host(href) if "//" in href else ""
+                key = "external" if link_host and link_host != host else "internal"
+                signals["links"][key] += 1
+            return
+
+        if tag == "title":
+            if signals["title"] is None:
+                close = _TITLE_END.search(html, end)
+                if close:
+                    signals["title"] = unescape(html[end + 1:close.start()]).strip()[:200]
+            return
+
+        attributes = {
+            name.lower(): first if first is not None else second if second is not None else bare
+            for name, first, second, bare in (m.groups() for m in _ATTRIBUTE.finditer(html, start, end))
+        }
+
+        if tag == "meta":
+            name = attributes.get("name", "").lower()
+            if name == "viewport" and signals["viewport"] is None:
+                signals["viewport"] = unescape(attributes.get("content", ""))
+            elif name == "description" and signals["meta_description"] is None:
+                signals["meta_description"] = unescape(attributes.get("content", "")).strip()[:300]
+
+        elif tag == "script" and attributes.get("type", "").lower() == "application/ld+json":
+            close = _SCRIPT_END.search(html, end)
+            if close:
+                self._add_json_ld_types(html[end + 1:close.start()], signals["json_ld_types"])
+
+    @staticmethod
+    def _email_at(html: str, position: int) -> Optional[str]:
+        """Email address around the @ at position (None if it is not one)"""
+        local = _EMAIL_LOCAL.search(html, max(0, position - 64), position)
+        if local is None:
+            return None
+        domain = _EMAIL_DOMAIN.match(html, position + 1)
+        if domain is None:
+            return None
+        return f"{local.group()}@{domain.group()}".strip(".").lower()
+
+    @staticmethod
+    def _add_json_ld_types(text: str, types: List[str]):
+        """Collect the @type values of a JSON-LD block (malformed blocks are skipped)"""
+        try:
+            data = json.loads(text)
+        except ValueError:
+            logger.debug("Skipping malformed JSON-LD block")
+            return
+
+        pending = [data]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, list):
+                pending.extend(item)
+            elif isinstance(item, dict):
+                value = item.get("@type")
+                for name in (value if isinstance(value, list) else [value]):
+                    if isinstance(name, str) and name not in types:
+                        types.append(name)
+                if "@graph" in item:
+                    pending.append(item["@graph"])
+
+    @staticmethod
+    def _host(url: Optional[str]) -> str:
+        """Lowercase host of a URL without www. ("" if there is none)"""
+        if not url:
+            return ""
+        host = url.split("//", 1)[-1]
+        for separator in "/?#":
+            host = host.split(separator, 1)[0]
+        host = host.rsplit("@", 1)[-1].split(":", 1)[0].lower()
+        return host[4:] if host.startswith("www.") else host
+
+
+# Singleton instance
+_extractor_instance = None
+
+
+def get_html_signal_extractor() -> HTMLSignalExtractor:
+    """
+    Get or create the HTMLSignalExtractor singleton (tech fingerprints embedded)
+
+    Returns:
+        HTMLSignalExtractor instance
+    """
+    global _extractor_instance
+    if _extractor_instance is None:
+        _extractor_instance = HTMLSignalExtractor(get_tech_detector().html_matcher)
+    return _extractor_instance
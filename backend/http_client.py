@@ -0,0 +1,252 @@
+"""
+LeadScraper AI - Shared HTTP Clients
+Process-wide pooled keep-alive HTTP clients for all outbound calls
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import importlib.util
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+import httpx
+import httpcore
+
+from dns_resolver import create_network_backend
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional 'h2' package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Client profiles: (max connections, max keep-alive connections, HTTP/2)
+#   api:     few hosts (RapidAPI, googleapis), many requests each -> keep connections, multiplex
+#   website: hundreds of one-off small-business hosts -> wide pool, little keep-alive, HTTP/1.1
+CLIENT_DEFAULTS = {
+    "api": (100, 50, True),
+    "website": (200, 20, False),
+}
+
+# httpcore -> httpx exceptions, most specific first, so callers keep catching httpx errors
+HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+def _map_httpcore_error(error: Exception) -> Exception:
+    for httpcore_error, httpx_error in HTTPCORE_ERRORS:
+        if isinstance(error, httpcore_error):
+            mapped = httpx_error(str(error))
+            mapped.__cause__ = error
+            return mapped
+    return error
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except Exception as e:
+            raise _map_httpcore_error(e)
+
+    async def aclose(self):
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+
+class NetworkBackendTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport over an explicitly built httpcore connection pool
+
+    httpx.AsyncHTTPTransport does not accept an httpcore network backend,
+    so the website client uses this transport to connect through the
+    caching DNS resolver (dns_resolver.create_network_backend). Only the
+    public httpcore.AsyncConnectionPool API is used.
+    """
+
+    def __init__(self, network_backend, limits: httpx.Limits, http2: bool = False):
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=network_backend,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        try:
+            response = await self._pool.handle_async_request(core_request)
+        except Exception as e:
+            raise _map_httpcore_error(e)
+
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_ResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._pool.aclose()
+
+
+class HttpClients:
+    """
+    Pooled HTTP clients shared by every module of this process
+
+    httpx keeps one connection pool per origin inside each client, so all
+    RapidAPI, PageSpeed and Supabase calls reuse warm TCP/TLS connections
+    (multiplexed over HTTP/2 where the host supports it).
+
+    - async_client(profile): for the analyzer; bound to the analyzer
+      engine loop, so it must only be used from that loop
+    - sync_client(): thread-safe client for synchronous callers (auth)
+
+    Pool sizes are configured from env per profile:
+      HTTP_{PROFILE}_MAX_CONNECTIONS, HTTP_{PROFILE}_MAX_KEEPALIVE,
+      HTTP_{PROFILE}_HTTP2 (true/false), plus HTTP_KEEPALIVE_EXPIRY (seconds)
+
+    The website client resolves through the cached async DNS resolver and
+    connects with Happy Eyeballs (DNS_CACHE=false uses the system resolver).
+    """
+
+    def __init__(self):
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+        self._settings: Dict[str, tuple] = {}
+        for profile, (max_connections, max_keepalive, http2) in CLIENT_DEFAULTS.items():
+            prefix = f"HTTP_{profile.upper()}"
+            self._settings[profile] = (
+                int(os.getenv(f"{prefix}_MAX_CONNECTIONS", max_connections)),
+                int(os.getenv(f"{prefix}_MAX_KEEPALIVE", max_keepalive)),
+                os.getenv(f"{prefix}_HTTP2", str(http2)).lower() == "true" and HTTP2_AVAILABLE,
+            )
+
+        if not HTTP2_AVAILABLE:
+            logger.warning("⚠️  'h2' not installed - outbound calls use HTTP/1.1 only (pip install \"httpx[http2]\")")
+
+        self.dns_cache_enabled = os.getenv("DNS_CACHE", "true").lower() == "true"
+        self.network_backend = create_network_backend() if self.dns_cache_enabled else None
+
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_client: Optional[httpx.Client] = None
+        self._sync_lock = threading.Lock()
+
+    def _limits(self, profile: str) -> httpx.Limits:
+        max_connections, max_keepalive, _ = self._settings[profile]
+        return httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def async_client(self, profile: str = "api") -> httpx.AsyncClient:
+        """
+        Get the pooled async client for a profile ('api' or 'website')
+
+        Must be called on the analyzer engine loop (the client's connections
+        belong to the loop that first used them).
+        """
+        client = self._async_clients.get(profile)
+        if client is None:
+            limits, http2 = self._limits(profile), self._settings[profile][2]
+            if profile == "website" and self.network_backend is not None:
+                transport = NetworkBackendTransport(self.network_backend, limits, http2=http2)
+            else:
+                transport = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+            client = httpx.AsyncClient(transport=transport)
+            self._async_clients[profile] = client
+        return client
+
+    def sync_client(self) -> httpx.Client:
+        """Get the pooled synchronous client (thread-safe, uses the 'api' profile)"""
+        if self._sync_client is None:
+            with self._sync_lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(limits=self._limits("api"), http2=self._settings["api"][2])
+        return self._sync_client
+
+    async def warm_async(self, urls: Iterable[str], profile: str = "api"):
+        """
+        Open keep-alive connections to the given hosts ahead of the first real call
+
+        Args:
+            urls: Any URL per host (only the connection matters, not the response)
+            profile: Client profile to warm
+        """
+        client = self.async_client(profile)
+
+        async def warm(url: str):
+            try:
+                await client.head(url, timeout=5)
+            except httpx.HTTPError as e:
+                logger.warning(f"Connection warm-up failed for {url}: {str(e)}")
+
+        await asyncio.gather(*[warm(url) for url in urls])
+        logger.info(f"🔥 Warmed {profile} connections: {', '.join(urls)}")
+
+    def warm_sync(self, urls: Iterable[str]):
+        """Open keep-alive connections for the synchronous client"""
+        client = self.sync_client()
+        for url in urls:
+            try:
+                client.head(url, timeout=5)
+            except httpx.HTTPError as e:
+                logger.warning(f"Connection warm-up failed for {url}: {str(e)}")
+        logger.info(f"🔥 Warmed sync connections: {', '.join(urls)}")
+
+    async def aclose(self):
+        """Close the async clients (on the engine loop)"""
+        for client in self._async_clients.values():
+            await client.aclose()
+        self._async_clients.clear()
+
+    def close(self):
+        """Close the synchronous client"""
+        with self._sync_lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+
+# Singleton instance
+_http_clients_instance = None
+_http_clients_lock = threading.Lock()
+
+def get_http_clients() -> HttpClients:
+    """Get or create the process-wide HTTP clients"""
+    global _http_clients_instance
+    with _http_clients_lock:
+        if _http_clients_instance is None:
+            _http_clients_instance = HttpClients()
+    return _http_clients_instance
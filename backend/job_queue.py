@@ -0,0 +1,560 @@
+"""
+LeadScraper AI - Durable Job Queue
+SQLite-backed queue for bulk search jobs, shared by the API and worker processes
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import contextlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from scheduler import FairScheduler, QueueFullError
+
+logger = logging.getLogger(__name__)
+
+# Job states
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+FINISHED_STATUSES = ("completed", "partial", "cancelled", "failed")
+
+# Job kinds (params["kind"]; bulk searches have none)
+KIND_FULL_LEAD = "full_lead"  # Full analysis of one lead of a finished bulk search
+
+# Optional fields of a job summary besides status, message and totals
+SUMMARY_DETAILS = ("stop_reason", "circuit_breakers", "cache", "gemini_batching", "gemini_usage", "prescore")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    claimed_at REAL,
+    finished_at REAL,
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_reason TEXT,
+    checkpoint TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, status);
+
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, id);
+"""
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker no longer owns the job it is running"""
+
+
+def job_summary(
+    status: str,
+    message: Optional[str],
+    total_found: int,
+    total_scanned: int,
+    pages_fetched: int,
+    details: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Result summary of a finished job - the same shape however the job ended
+
+    Args:
+        status: Final job status
+        message: Message shown to the user
+        total_found: Leads found across all attempts
+        total_scanned: Businesses scanned
+        pages_fetched: RapidAPI pages fetched
+        details: Source of the SUMMARY_DETAILS fields (missing ones are None)
+    """
+    details = details or {}
+    return {
+        "status": status,
+        "message": message,
+        "total_found": total_found,
+        "total_scanned": total_scanned,
+        "pages_fetched": pages_fetched,
+        **{key: details.get(key) for key in SUMMARY_DETAILS},
+    }
+
+
+class JobQueue:
+    """
+    Persistent bulk search queue with leases
+
+    - The API enqueues jobs and reads their events; workers claim jobs,
+      append events (leads, status) and finish them
+    - A claimed job is leased to one worker; the worker renews the lease
+      with heartbeat(). If the worker dies, the lease expires and the job
+      is handed to the next worker, which resumes from the last checkpoint
+    - Admission and claim order follow the FairScheduler rules (global
+      and per-user running limits, per-user queue limit, round-robin
+      across users), applied inside the claim transaction
+    - Cancellation is a flag the worker picks up on its next heartbeat
+    - The event log of a job (leads, progress) is purged event_retention
+      seconds after the job finished; its summary row is kept
+
+    Every call opens its own connection, so one instance can be shared by
+    threads and the file by processes (WAL mode).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        scheduler: Optional[FairScheduler] = None,
+        lease_seconds: float = 30.0,
+        max_attempts: int = 3,
+        event_retention: float = 72 * 3600.0
+    ):
+        self.path = path
+        self.scheduler = scheduler or FairScheduler()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.event_retention = event_retention  # Seconds (0 = keep events forever)
+        self._next_purge = 0.0
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+        with self._transaction() as conn:
+            self._purge_events(conn, time.time())
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction; takes the database write lock up front"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for key in ("params", "checkpoint", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    @staticmethod
+    def _final_summary(conn: sqlite3.Connection, job_id: str, status: str, message: str, stop_reason: str) -> Dict[str, Any]:
+        """Summary for a job that ends without its worker's result (totals from its leads and last checkpoint)"""
+        total_found = conn.execute(
+            "SELECT COUNT(*) FROM job_events WHERE job_id = ? AND type = 'lead'", (job_id,)
+        ).fetchone()[0]
+        row = conn.execute("SELECT checkpoint FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        checkpoint = json.loads(row["checkpoint"]) if row is not None and row["checkpoint"] else {}
+        return job_summary(
+            status=status,
+            message=message,
+            total_found=total_found,
+            total_scanned=checkpoint.get("total_scanned", 0),
+            pages_fetched=checkpoint.get("page", 0),
+            details={"stop_reason": stop_reason},
+        )
+
+    @staticmethod
+    def _insert_event(conn: sqlite3.Connection, job_id: str, event_type: str, data: Dict[str, Any]):
+        conn.execute(
+            "INSERT INTO job_events (job_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, event_type, json.dumps(data, default=str), time.time())
+        )
+
+    # ------------------------------------------------------------------
+    # API side
+    # ------------------------------------------------------------------
+
+    def enqueue(self, job_id: str, user_id: str, params: Dict[str, Any]):
+        """
+        Add a job to the queue
+
+        Args:
+            job_id: Analysis ID
+            user_id: Owner (fairness and ownership checks are per user)
+            params: Search parameters (industry, location, target_results, filters),
+                or kind KIND_FULL_LEAD with the lead to analyze
+
+        Raises:
+            QueueFullError: If the user already has max_queued_per_user jobs waiting
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            queued = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status = ?",
+                (user_id, STATUS_QUEUED)
+            ).fetchone()[0]
+            self.scheduler.admit(queued)
+
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, params, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, json.dumps(params), STATUS_QUEUED, now, now)
+            )
+
+        logger.info(f"📥 Job {job_id} queued for user {user_id}")
+
+    def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a job (None if unknown or not owned by user_id)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (user_id is not None and row["user_id"] != user_id):
+            return None
+        return self._row_to_job(row)
+
+    def events(self, job_id: str, after_id: int = 0, event_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Events of a job in insertion order
+
+        Args:
+            job_id: Analysis ID
+            after_id: Only events with a larger ID (for incremental polling)
+            event_type: Only events of this type (e.g. 'lead')
+
+        Returns:
+            List of {"id", "type", "data"}
+        """
+        query = "SELECT id, type, data FROM job_events WHERE job_id = ? AND id > ?"
+        args: List[Any] = [job_id, after_id]
+        if event_type:
+            query += " AND type = ?"
+            args.append(event_type)
+
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY id", args).fetchall()
+        return [{"id": row["id"], "type": row["type"], "data": json.loads(row["data"])} for row in rows]
+
+    def leads(self, job_id: str) -> List[Dict[str, Any]]:
+        """
+        All leads a job has produced so far (across restarts)
+
+        A 'lead_update' event (on-demand full analysis of a lead) replaces
+        the lead with the same place ID in place.
+        """
+        leads: List[Dict[str, Any]] = []
+        positions: Dict[str, int] = {}
+        for event in self.events(job_id):
+            lead = event["data"]
+            place_id = lead.get("google_maps_place_id")
+            if event["type"] == "lead":
+                if place_id:
+                    positions[place_id] = len(leads)
+                leads.append(lead)
+            elif event["type"] == "lead_update" and place_id in positions:
+                leads[positions[place_id]] = lead
+        return leads
+
+    def request_cancel(self, job_id: str, reason: str = "cancelled") -> Optional[str]:
+        """
+        Cancel a job
+
+        Queued jobs are cancelled right away; running jobs are flagged and
+        stopped by their worker on its next heartbeat.
+
+        Returns:
+            'cancelling', 'already_cancelled' (or already finished), or None if unknown
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status, cancel_reason FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] in FINISHED_STATUSES or row["cancel_reason"]:
+                return "already_cancelled"
+
+            if row["status"] == STATUS_QUEUED:
+                summary = self._final_summary(
+                    conn, job_id, "cancelled", "Search cancelled before it started", f"cancelled ({reason})"
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', cancel_reason = ?, result = ?, "
+                    "finished_at = ?, updated_at = ? WHERE id = ?",
+                    (reason, json.dumps(summary), now, now, job_id)
+                )
+                self._insert_event(conn, job_id, "complete", summary)
+            else:
+                conn.execute(
+                    "UPDATE jobs SET cancel_reason = ?, updated_at = ? WHERE id = ?",
+                    (reason, now, job_id)
+                )
+
+        logger.info(f"🛑 Cancellation requested for job {job_id}: {reason}")
+        return "cancelling"
+
+    @staticmethod
+    def _queued_jobs(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        """Queued jobs with the per-user state the scheduler orders them by"""
+        rows = conn.execute(
+            """
+            SELECT j.id, j.user_id, j.created_at,
+                   (SELECT COUNT(*) FROM jobs r WHERE r.user_id = j.user_id AND r.status = 'running') AS user_running,
+                   COALESCE((SELECT MAX(c.claimed_at) FROM jobs c WHERE c.user_id = j.user_id), 0) AS last_claimed
+            FROM jobs j
+            WHERE j.status = ?
+            """,
+            (STATUS_QUEUED,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position of a queued job in claim order (None if not queued)"""
+        with self._connect() as conn:
+            queued = self._queued_jobs(conn)
+        return self.scheduler.positions(queued).get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue state for the debug endpoint"""
+        with self._connect() as conn:
+            by_status = {
+                row["status"]: row["count"]
+                for row in conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+            }
+            workers = [
+                row["worker_id"]
+                for row in conn.execute("SELECT worker_id FROM jobs WHERE status = ?", (STATUS_RUNNING,))
+            ]
+        return {
+            "max_concurrent_jobs": self.scheduler.max_concurrent_jobs,
+            "max_jobs_per_user": self.scheduler.max_jobs_per_user,
+            "max_queued_per_user": self.scheduler.max_queued_per_user,
+            "jobs": by_status,
+            "busy_workers": workers,
+        }
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def _expire_leases(self, conn: sqlite3.Connection, now: float):
+        """Requeue (or fail) running jobs whose worker stopped heartbeating"""
+        expired = conn.execute(
+            "SELECT id, worker_id, attempts, cancel_reason FROM jobs WHERE status = ? AND lease_expires < ?",
+            (STATUS_RUNNING, now)
+        ).fetchall()
+
+        for row in expired:
+            if row["cancel_reason"] or row["attempts"] >= self.max_attempts:
+                status = "cancelled" if row["cancel_reason"] else "failed"
+                error = None if row["cancel_reason"] else f"Worker lost {row['attempts']} times"
+                summary = self._final_summary(
+                    conn, row["id"], status, f"Search {status}: worker stopped responding", "worker_lost"
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, result = ?, worker_id = NULL, "
+                    "lease_expires = NULL, finished_at = ?, updated_at = ? WHERE id = ?",
+                    (status, error, json.dumps(summary), now, now, row["id"])
+                )
+                self._insert_event(conn, row["id"], "complete", summary)
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                    (STATUS_QUEUED, now, row["id"])
+                )
+                self._insert_event(conn, row["id"], "status", {"message": "Worker lost - search requeued"})
+            logger.warning(f"⚠️  Lease of job {row['id']} (worker {row['worker_id']}) expired")
+
+    def _purge_events(self, conn: sqlite3.Connection, now: float):
+        """Delete the event logs of jobs finished more than event_retention ago (at most every few minutes)"""
+        if self.event_retention <= 0 or now < self._next_purge:
+            return
+        self._next_purge = now + min(600.0, self.event_retention)
+
+        cursor = conn.execute(
+            "DELETE FROM job_events WHERE job_id IN "
+            "(SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?)",
+            (now - self.event_retention,)
+        )
+        if cursor.rowcount:
+            logger.info(f"🧹 Purged {cursor.rowcount} events of finished jobs")
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next job for a worker
+
+        Args:
+            worker_id: Unique worker name (host + pid)
+
+        Returns:
+            Job dict (params / checkpoint decoded) or None if nothing is claimable
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, now)
+            self._purge_events(conn, now)
+
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_RUNNING,)).fetchone()[0]
+            job_id = self.scheduler.next_job(running, self._queued_jobs(conn))
+            if job_id is None:
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_expires = ?, attempts = attempts + 1, "
+                "claimed_at = ?, started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?",
+                (STATUS_RUNNING, worker_id, now + self.lease_seconds, now, now, now, job_id)
+            )
+            job = self._row_to_job(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+            resumed = bool(job["checkpoint"])
+            self._insert_event(conn, job["id"], "status", {
+                "message": "Search resumed" if resumed else "Search started",
+                "resumed": resumed,
+            })
+
+        logger.info(f"▶️  Job {job['id']} claimed by {worker_id} (attempt {job['attempts']})")
+        return job
+
+    def heartbeat(self, job_id: str, worker_id: str, checkpoint: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Renew a job lease and store the latest checkpoint
+
+        Returns:
+            Cancellation reason if the job should stop, else None
+
+        Raises:
+            LeaseLostError: If the job is no longer leased to this worker
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if checkpoint is not None:
+                cursor = conn.execute(
+                    "UPDATE jobs SET lease_expires = ?, checkpoint = ?, updated_at = ? "
+                    "WHERE id = ? AND worker_id = ? AND status = ?",
+                    (now + self.lease_seconds, json.dumps(checkpoint), now, job_id, worker_id, STATUS_RUNNING)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                    (now + self.lease_seconds, now, job_id, worker_id, STATUS_RUNNING)
+                )
+            if cursor.rowcount == 0:
+                raise LeaseLostError(f"Job {job_id} is no longer leased to {worker_id}")
+
+            row = conn.execute("SELECT cancel_reason FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["cancel_reason"]
+
+    def add_event(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        """Append a progress event (e.g. 'lead') for the API to stream"""
+        with self._transaction() as conn:
+            self._insert_event(conn, job_id, event_type, data)
+
+    def finish(self, job_id: str, worker_id: str, status: str, result: Dict[str, Any]) -> bool:
+        """
+        Mark a job finished and publish its 'complete' event
+
+        Args:
+            job_id: Analysis ID
+            worker_id: Worker holding the lease
+            status: 'completed', 'partial' or 'cancelled'
+            result: Summary (status, message, totals - leads are stored as events)
+
+        Returns:
+            False if the lease was lost in the meantime (result discarded)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, worker_id = NULL, lease_expires = NULL, "
+                "finished_at = ?, updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (status, json.dumps(result, default=str), now, now, job_id, worker_id, STATUS_RUNNING)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._insert_event(conn, job_id, "complete", result)
+        return True
+
+    def fail(self, job_id: str, worker_id: str, error: str, checkpoint: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Report a crashed job: requeue it while attempts remain, else mark it failed
+
+        Returns:
+            True if the job was requeued
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts, cancel_reason FROM jobs WHERE id = ? AND worker_id = ? AND status = ?",
+                (job_id, worker_id, STATUS_RUNNING)
+            ).fetchone()
+            if row is None:
+                return False
+
+            if row["attempts"] < self.max_attempts and not row["cancel_reason"]:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL, lease_expires = NULL, error = ?, "
+                    "checkpoint = COALESCE(?, checkpoint), updated_at = ? WHERE id = ?",
+                    (STATUS_QUEUED, error, json.dumps(checkpoint) if checkpoint else None, now, job_id)
+                )
+                self._insert_event(conn, job_id, "status", {"message": "Search failed - retrying"})
+                return True
+
+            if checkpoint:
+                conn.execute("UPDATE jobs SET checkpoint = ? WHERE id = ?", (json.dumps(checkpoint), job_id))
+            summary = self._final_summary(conn, job_id, "failed", f"Search failed: {error}", "failed")
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', worker_id = NULL, lease_expires = NULL, error = ?, result = ?, "
+                "finished_at = ?, updated_at = ? WHERE id = ?",
+                (error, json.dumps(summary), now, now, job_id)
+            )
+            self._insert_event(conn, job_id, "error", summary)
+        return False
+
+    def release(self, job_id: str, worker_id: str, checkpoint: Optional[Dict[str, Any]] = None):
+        """Hand a job back to the queue on worker shutdown (does not count as an attempt)"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, lease_expires = NULL, attempts = attempts - 1, "
+                "checkpoint = COALESCE(?, checkpoint), updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (STATUS_QUEUED, json.dumps(checkpoint) if checkpoint else None, now, job_id, worker_id, STATUS_RUNNING)
+            )
+            if cursor.rowcount:
+                self._insert_event(conn, job_id, "status", {"message": "Worker restarting - search requeued"})
+
+
+# Singleton instance
+_job_queue_instance = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Get or create the job queue for this process"""
+    global _job_queue_instance
+    with _job_queue_lock:
+        if _job_queue_instance is None:
+            _job_queue_instance = JobQueue(
+                path=os.getenv("JOB_QUEUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db")),
+                scheduler=FairScheduler(
+                    max_concurrent_jobs=int(os.getenv("MAX_CONCURRENT_JOBS", 4)),
+                    max_jobs_per_user=int(os.getenv("MAX_JOBS_PER_USER", 1)),
+                    max_queued_per_user=int(os.getenv("MAX_QUEUED_JOBS_PER_USER", 5)),
+                ),
+                lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", 30)),
+                max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 3)),
+                event_retention=float(os.getenv("JOB_EVENT_RETENTION_HOURS", 72)) * 3600,
+            )
+    return _job_queue_instance
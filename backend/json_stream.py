@@ -0,0 +1,131 @@
+"""
+LeadScraper AI - Streaming JSON Parser
+Incremental parser yielding top-level fields / array elements as they complete
+"""
+
+import re
+import json
+import logging
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Characters that matter outside / inside a JSON string
+_STRUCTURE = re.compile(r'["{}\[\],]')
+_STRING_END = re.compile(r'["\\]')
+
+
+class JSONStreamParser:
+    """
+    Parses one JSON object or array while its text arrives in chunks
+
+    feed() returns every top-level item completed by the new text - the
+    (key, value) pairs of an object, or the elements of an array - so
+    callers can use them before the rest has arrived. Each item is decoded
+    with json.loads once it is complete; nothing is guessed or repaired.
+    An item that does not decode is counted in errors and skipped.
+
+    Text before the first { or [ (e.g. a code fence) and after the
+    closing bracket is ignored. If the stream stops early (token limit),
+    value holds the items completed up to that point.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0  # Next character to scan
+        self._depth = 0
+        self._in_string = False
+        self._item_start = 0  # Where the current top-level item begins (after the last separator)
+        self.root: Optional[str] = None  # "object" or "array" once the root has started
+        self.value: Any = None  # dict or list of the items completed so far
+        self.done = False
+        self.errors = 0
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add the next chunk of text
+
+        Args:
+            text: Next part of the JSON document
+
+        Returns:
+            Items completed by this chunk ((key, value) pairs for an object root)
+        """
+        if self.done or not text:
+            return []
+        self._buffer += text
+        completed: List[Any] = []
+
+        if self.root is None and not self._find_root():
+            return completed
+
+        buffer = self._buffer
+        while not self.done:
+            if self._in_string:
+                match = _STRING_END.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(buffer):
+                        self._pos = match.start()  # Escaped character not here yet
+                        break
+                    self._pos = match.end() + 1
+                    continue
+                self._in_string = False
+                self._pos = match.end()
+                continue
+
+            match = _STRUCTURE.search(buffer, self._pos)
+            if match is None:
+                self._pos = len(buffer)
+                break
+            char = match.group()
+            self._pos = match.end()
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_item(match.start(), completed)
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                self._complete_item(match.start(), completed)
+
+        return completed
+
+    def _find_root(self) -> bool:
+        """Skip to the opening bracket of the root (False if not seen yet)"""
+        match = re.search(r'[{\[]', self._buffer)
+        if match is None:
+            self._buffer = ""
+            return False
+        self.root = "object" if match.group() == "{" else "array"
+        self.value = {} if self.root == "object" else []
+        self._buffer = self._buffer[match.end():]
+        self._pos = 0
+        self._depth = 1
+        return True
+
+    def _complete_item(self, end: int, completed: List[Any]):
+        """Decode the top-level item ending at end (exclusive)"""
+        text = self._buffer[self._item_start:end].strip()
+        self._item_start = end + 1
+        if not text:
+            return  # Empty container or trailing comma
+
+        try:
+            if self.root == "object":
+                item = json.loads("{" + text + "}").popitem()
+                self.value[item[0]] = item[1]
+            else:
+                item = json.loads(text)
+                self.value.append(item)
+        except (ValueError, KeyError) as e:
+            self.errors += 1
+            logger.warning(f"Skipping malformed JSON item: {str(e)}")
+            return
+        completed.append(item)
@@ -7,22 +7,27 @@ import os
 import uuid
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import json
 import asyncio
-import threading
 
 # Load environment variables
 load_dotenv()
 
 # Import analyzer
 from analyzer import get_analyzer
+from concurrency import get_concurrency_controller
+from rate_limiter import get_rate_limiter
+from circuit_breaker import get_circuit_breakers
+from job_queue import get_job_queue, QueueFullError, KIND_FULL_LEAD
+from worker import start_worker_processes, stop_worker_processes
+from http_client import get_http_clients
 from pdf_generator import PDFReportGenerator
 from auth import get_current_user, get_user_id
 from fastapi import Depends
@@ -105,6 +110,17 @@ class BulkScanRequest(BaseModel):
     filters: Optional[SniperFilters] = Field(
         default_factory=SniperFilters, description="Sniper Mode filters"
     )
+    maxSecondsPerLead: Optional[int] = Field(
+        None, ge=10, le=300,
+        description="Time budget per analyzed lead in seconds (default: LEAD_MAX_SECONDS); slow checks are skipped when it runs out"
+    )
+    refreshPageSpeed: bool = Field(
+        default=False, description="Ignore cached PageSpeed results and measure every website again"
+    )
+    fullAnalysis: bool = Field(
+        default=False,
+        description="Run PageSpeed and Gemini for every lead; when PRESCORE_THRESHOLD is set, leads below it otherwise get a local analysis only"
+    )
 
     class Config:
         json_schema_extra = {
@@ -112,6 +128,7 @@ class BulkScanRequest(BaseModel):
                 "industry": "Zahnarzt",
                 "location": "Zürich",
                 "targetResults": 25,
+                "maxSecondsPerLead": 45,
                 "filters": {
                     "maxRating": "4.5",
                     "minReviews": 10,
@@ -169,11 +186,18 @@ class AnalysisResponse(BaseModel):
     googleMapsPhotoCount: Optional[int] = Field(None, ge=0)
     googleMapsPlaceId: Optional[str] = None
 
+    # Per-stage wall times in seconds (pagespeed, website, gemini, save, total)
+    stageTimings: Optional[Dict[str, float]] = None
+
+    # Two-tier analysis: local pre-score and which tier produced the scores (local | full)
+    prescore: Optional[int] = Field(None, ge=0, le=100)
+    analysisTier: Optional[str] = Field(None, pattern="^(local|full)$")
+
 
 class BulkScanResponse(BaseModel):
     """Response model for bulk scan endpoint"""
     analysisId: str = Field(..., description="UUID of the bulk analysis job")
-    status: str = Field(..., description="'processing' | 'completed' | 'failed'")
+    status: str = Field(..., description="'queued' | 'running' | 'completed' | 'partial' | 'cancelled' | 'failed'")
     totalFound: int = Field(..., ge=0, description="Number of leads found matching filters")
     totalScanned: int = Field(..., ge=0, description="Total businesses scanned from Google Maps")
     leads: List[AnalysisResponse] = Field(
@@ -208,6 +232,130 @@ app.add_middleware(
 )
 
 
+# ============================================
+# Process Lifecycle, Job Queue & Workers
+# ============================================
+
+# Bulk searches run in worker processes (see worker.py); the API only
+# enqueues them and streams their progress from the durable job queue.
+# EMBEDDED_WORKERS=true starts the workers together with the API
+# (development); set it to false when running `python worker.py` separately.
+embedded_workers = os.getenv("EMBEDDED_WORKERS", "true").lower() == "true"
+worker_processes: list = []
+
+
+@app.on_event("startup")
+async def warm_http_connections():
+    """Open the pooled keep-alive connection to Supabase Auth before the first request"""
+    supabase_url = os.getenv("SUPABASE_URL")
+    if supabase_url:
+        await asyncio.to_thread(get_http_clients().warm_sync, [f"{supabase_url}/auth/v1/health"])
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    get_http_clients().close()
+
+
+@app.on_event("startup")
+async def start_embedded_workers():
+    """Start the job worker processes alongside the API (EMBEDDED_WORKERS=true)"""
+    global worker_processes
+    get_job_queue()  # Create the queue database before workers race for it
+    if embedded_workers:
+        count = int(os.getenv("MAX_CONCURRENT_JOBS", 4))
+        worker_processes = start_worker_processes(count, daemon=True)
+        print(f"👷 Started {count} embedded job worker process(es)")
+
+
+@app.on_event("shutdown")
+async def stop_embedded_workers():
+    """Hand running jobs back to the queue and stop the embedded workers"""
+    if worker_processes:
+        await asyncio.to_thread(stop_worker_processes, worker_processes)
+
+
+def lead_to_frontend(lead_data: dict) -> dict:
+    """Map a stored lead (database fields) to the frontend Analysis format"""
+    return {
+        "id": lead_data["id"],
+        "website": lead_data.get("website", ""),
+        "companyName": lead_data.get("company_name", ""),
+        "email": lead_data.get("email", ""),
+        "phone": lead_data.get("business_phone"),
+        "location": lead_data.get("business_address", ""),
+        "industry": lead_data.get("industry"),
+        "companySize": lead_data.get("company_size"),
+        "uiScore": lead_data.get("ui_score", 0),
+        "seoScore": lead_data.get("seo_score", 0),
+        "techScore": lead_data.get("tech_score", 0),
+        "performanceScore": lead_data.get("performance_score"),
+        "securityScore": lead_data.get("security_score"),
+        "mobileScore": lead_data.get("mobile_score"),
+        "totalScore": lead_data.get("total_score", 0),
+        # local_only leads are finished analyses for the frontend; analysisTier tells them apart
+        "status": "completed" if lead_data.get("status") == "local_only" else lead_data.get("status", "completed"),
+        "lastChecked": lead_data.get("last_checked", datetime.utcnow().isoformat()),
+        "issues": lead_data.get("issues", []),
+        "source": lead_data.get("source", "Google Maps"),
+        "techStack": lead_data.get("tech_stack", []),
+        "hasAdsPixel": lead_data.get("has_ads_pixel", False),
+        "googleSpeedScore": lead_data.get("google_speed_score", 0),
+        "loadingTime": lead_data.get("loading_time", "0s"),
+        "copyrightYear": lead_data.get("copyright_year", datetime.utcnow().year),
+        "leadStrength": lead_data.get("lead_strength"),
+        "googleMapsRating": lead_data.get("google_maps_rating"),
+        "googleMapsReviews": lead_data.get("google_maps_reviews"),
+        "googleMapsPriceLevel": lead_data.get("google_maps_price_level"),
+        "googleMapsPhotoCount": lead_data.get("google_maps_photo_count"),
+        "googleMapsPlaceId": lead_data.get("google_maps_place_id"),
+        "stageTimings": lead_data.get("stage_timings"),
+        "prescore": lead_data.get("prescore"),
+        "analysisTier": lead_data.get("analysis_tier")
+    }
+
+
+def lead_to_map_data(lead_data: dict) -> dict:
+    """Rebuild the Google Maps business data of a stored lead (input for a re-analysis)"""
+    return {
+        "name": lead_data.get("company_name"),
+        "place_id": lead_data.get("google_maps_place_id"),
+        "full_address": lead_data.get("business_address", ""),
+        "phone_number": lead_data.get("business_phone"),
+        "email": lead_data.get("email"),
+        "rating": lead_data.get("google_maps_rating"),
+        "review_count": lead_data.get("google_maps_reviews", 0),
+        "photo_count": lead_data.get("google_maps_photo_count", 0),
+        "type": lead_data.get("industry"),
+    }
+
+
+def enqueue_bulk_search(analysis_id: str, user_id: str, request: BulkScanRequest):
+    """Put a bulk search on the durable job queue (raises QueueFullError)"""
+    get_job_queue().enqueue(analysis_id, user_id, {
+        "industry": request.industry,
+        "location": request.location,
+        "target_results": request.targetResults,
+        "filters": request.filters.dict() if request.filters else {},
+        "max_seconds_per_lead": request.maxSecondsPerLead,
+        "refresh_pagespeed": request.refreshPageSpeed,
+        "full_analysis": request.fullAnalysis,
+    })
+
+
+def enqueue_full_lead_analysis(job_id: str, user_id: str, analysis_id: str, lead_data: dict):
+    """Put the full analysis of one lead of a bulk search on the job queue (raises QueueFullError)"""
+    website = lead_data.get("website") or ""
+    get_job_queue().enqueue(job_id, user_id, {
+        "kind": KIND_FULL_LEAD,
+        "analysis_id": analysis_id,
+        "url": None if website.startswith("no-website-") else website,
+        "map_data": lead_to_map_data(lead_data),
+        "industry": lead_data.get("industry"),
+        "target_results": 1,
+    })
+
+
 # ============================================
 # API Endpoints
 # ============================================
@@ -223,7 +371,7 @@ async def root():
     }
 
 
-@app.post("/api/v1/analyses/bulk-search", response_model=BulkScanResponse)
+@app.post("/api/v1/analyses/bulk-search", response_model=BulkScanResponse, status_code=202)
 async def bulk_search(
     request: BulkScanRequest, 
     background_tasks: BackgroundTasks,
@@ -235,6 +383,10 @@ async def bulk_search(
     Searches Google Maps for businesses matching the specified criteria
     and applies Sniper Mode filters to find high-value leads.
     
+    Returns 202 with the analysis ID as soon as the search is queued; the
+    search runs in a worker process. Poll GET /api/v1/analyses/{analysisId}
+    for progress and results (or use bulk-search-stream for live updates).
+    
     Requires: Valid JWT token in Authorization header
     """
     user_id = current_user["user_id"]
@@ -261,95 +413,33 @@ async def bulk_search(
     print("=" * 60)
     
     try:
-        # Get analyzer instance
-        analyzer = get_analyzer()
-        
-        # Convert filters to dictionary
-        filters_dict = request.filters.dict() if request.filters else {}
-        
-        # Process bulk search (synchronous for now)
-        result = analyzer.process_bulk_search(
-            industry=request.industry,
-            location=request.location,
-            target_results=request.targetResults,
-            filters=filters_dict,
-            bulk_analysis_id=analysis_id,
-            user_id=user_id  # Pass authenticated user_id
-        )
-        
-        # Convert leads to AnalysisResponse format
-        leads = []
-        for lead_data in result.get("leads", []):
-            # Map database fields to frontend format
-            analysis_response = AnalysisResponse(
-                id=lead_data["id"],
-                website=lead_data.get("website", ""),
-                companyName=lead_data.get("company_name", ""),
-                email=lead_data.get("email", ""),
-                phone=lead_data.get("business_phone"),
-                location=lead_data.get("business_address", ""),
-                industry=lead_data.get("industry"),
-                companySize=lead_data.get("company_size"),
-                uiScore=lead_data.get("ui_score", 0),
-                seoScore=lead_data.get("seo_score", 0),
-                techScore=lead_data.get("tech_score", 0),
-                performanceScore=lead_data.get("performance_score"),
-                securityScore=lead_data.get("security_score"),
-                mobileScore=lead_data.get("mobile_score"),
-                totalScore=lead_data.get("total_score", 0),
-                status=lead_data.get("status", "completed"),
-                lastChecked=lead_data.get("last_checked", datetime.utcnow().isoformat()),
-                issues=lead_data.get("issues", []),
-                source=lead_data.get("source", "Google Maps"),
-                techStack=lead_data.get("tech_stack", []),
-                hasAdsPixel=lead_data.get("has_ads_pixel", False),
-                googleSpeedScore=lead_data.get("google_speed_score", 0),
-                loadingTime=lead_data.get("loading_time", "0s"),
-                copyrightYear=lead_data.get("copyright_year", datetime.utcnow().year),
-                leadStrength=lead_data.get("lead_strength"),
-                googleMapsRating=lead_data.get("google_maps_rating"),
-                googleMapsReviews=lead_data.get("google_maps_reviews"),
-                googleMapsPriceLevel=lead_data.get("google_maps_price_level"),
-                googleMapsPhotoCount=lead_data.get("google_maps_photo_count"),
-                googleMapsPlaceId=lead_data.get("google_maps_place_id")
-            )
-            leads.append(analysis_response)
-        
-        # Return successful response
-        return BulkScanResponse(
-            analysisId=analysis_id,
-            status=result.get("status", "completed"),
-            totalFound=result.get("total_found", 0),
-            totalScanned=result.get("total_scanned", 0),
-            leads=leads,
-            message=result.get("message", f"Found {result.get('total_found', 0)} leads matching criteria")
-        )
-        
-    except Exception as e:
-        print(f"ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        # Return error response
-        return BulkScanResponse(
-            analysisId=analysis_id,
-            status="failed",
-            totalFound=0,
-            totalScanned=0,
-            leads=[],
-            message=f"Search failed: {str(e)}"
-        )
+        enqueue_bulk_search(analysis_id, user_id, request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    return BulkScanResponse(
+        analysisId=analysis_id,
+        status="queued",
+        totalFound=0,
+        totalScanned=0,
+        leads=[],
+        message=f"Search queued - poll /api/v1/analyses/{analysis_id} for progress"
+    )
 
 
 @app.post("/api/v1/analyses/bulk-search-stream")
 async def bulk_search_stream(
     request: BulkScanRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Bulk Google Maps Search with Server-Sent Events (SSE) streaming (PROTECTED)
     
     Streams results in real-time as each lead is analyzed.
+    The search is queued for the worker processes; while it waits for a
+    free worker the stream sends 'queued' events with the current queue
+    position. The job is cancelled as soon as the client disconnects.
     
     Requires: Valid JWT token in Authorization header
     """
@@ -366,129 +456,88 @@ async def bulk_search_stream(
     print(f"Target Results: {request.targetResults}")
     print("=" * 60)
     
-    # Create an async queue for real-time event streaming
-    event_queue: asyncio.Queue = asyncio.Queue()
+    try:
+        enqueue_bulk_search(analysis_id, user_id, request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    job_queue = get_job_queue()
     
     async def event_generator():
-        """Generate SSE events as leads complete"""
+        """Generate SSE events from the job's progress in the queue"""
+        stream_finished = False
+        last_event_id = 0
+        last_position = None
+        completed_count = 0
+        idle_since = asyncio.get_running_loop().time()
         try:
             # Send initial status
             yield f"data: {json.dumps({'type': 'status', 'message': 'Starting search...', 'analysisId': analysis_id})}\n\n"
-            await asyncio.sleep(0.1)  # Give client time to connect
             
-            # Capture the running loop for thread-safe queue access
-            loop = asyncio.get_running_loop()
-
-            # Define callback for each completed lead
-            completed_count = [0]  # Use list to allow modification in nested function
-            
-            def on_lead_complete(lead_data: dict):
-                """Called when a single lead completes analysis"""
-                completed_count[0] += 1
+            while True:
+                events = await asyncio.to_thread(job_queue.events, analysis_id, last_event_id)
                 
-                # Convert to frontend format
-                analysis_response = {
-                    "type": "lead",
-                    "data": {
-                        "id": lead_data["id"],
-                        "website": lead_data.get("website", ""),
-                        "companyName": lead_data.get("company_name", ""),
-                        "email": lead_data.get("email", ""),
-                        "phone": lead_data.get("business_phone"),
-                        "location": lead_data.get("business_address", ""),
-                        "industry": lead_data.get("industry"),
-                        "companySize": lead_data.get("company_size"),
-                        "uiScore": lead_data.get("ui_score", 0),
-                        "seoScore": lead_data.get("seo_score", 0),
-                        "techScore": lead_data.get("tech_score", 0),
-                        "performanceScore": lead_data.get("performance_score"),
-                        "securityScore": lead_data.get("security_score"),
-                        "mobileScore": lead_data.get("mobile_score"),
-                        "totalScore": lead_data.get("total_score", 0),
-                        "status": lead_data.get("status", "completed"),
-                        "lastChecked": lead_data.get("last_checked", datetime.utcnow().isoformat()),
-                        "issues": lead_data.get("issues", []),
-                        "source": lead_data.get("source", "Google Maps"),
-                        "techStack": lead_data.get("tech_stack", []),
-                        "hasAdsPixel": lead_data.get("has_ads_pixel", False),
-                        "googleSpeedScore": lead_data.get("google_speed_score", 0),
-                        "loadingTime": lead_data.get("loading_time", "0s"),
-                        "copyrightYear": lead_data.get("copyright_year", datetime.utcnow().year),
-                        "leadStrength": lead_data.get("lead_strength"),
-                        "googleMapsRating": lead_data.get("google_maps_rating"),
-                        "googleMapsReviews": lead_data.get("google_maps_reviews"),
-                        "googleMapsPriceLevel": lead_data.get("google_maps_price_level"),
-                        "googleMapsPhotoCount": lead_data.get("google_maps_photo_count"),
-                        "googleMapsPlaceId": lead_data.get("google_maps_place_id")
-                    },
-                    "progress": {
-                        "completed": completed_count[0],
-                        "target": request.targetResults
-                    }
-                }
+                if not events:
+                    position = await asyncio.to_thread(job_queue.queue_position, analysis_id)
+                    if position is not None and position != last_position:
+                        last_position = position
+                        events = [{"id": last_event_id, "type": "queued", "data": {
+                            "position": position,
+                            "message": f"Waiting for a free worker (position {position} in queue)"
+                        }}]
                 
-                # Put event in queue for immediate streaming (thread-safe)
-                print(f"🟢 Queueing lead event: {completed_count[0]}/{request.targetResults}")
-                loop.call_soon_threadsafe(event_queue.put_nowait, ("lead", analysis_response))
-            
-            # Run analyzer in background thread
-            def run_analyzer():
-                try:
-                    analyzer = get_analyzer()
-                    filters_dict = request.filters.dict() if request.filters else {}
-                    
-                    result = analyzer.process_bulk_search(
-                        industry=request.industry,
-                        location=request.location,
-                        target_results=request.targetResults,
-                        filters=filters_dict,
-                        bulk_analysis_id=analysis_id,
-                        user_id=user_id,  # Pass authenticated user_id
-                        stream_callback=on_lead_complete
-                    )
+                for event in events:
+                    last_event_id = max(last_event_id, event["id"])
+                    event_type, data = event["type"], event["data"]
                     
-                    # Send completion event
-                    loop.call_soon_threadsafe(event_queue.put_nowait, ("complete", {
-                        "type": "complete",
-                        "analysisId": analysis_id,
-                        "totalFound": result.get("total_found", 0),
-                        "totalScanned": result.get("total_scanned", 0),
-                        "status": result.get("status", "completed"),
-                        "message": result.get("message", f"Found {result.get('total_found', 0)} leads")
-                    }))
-                except Exception as e:
-                    print(f"Analyzer error: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    loop.call_soon_threadsafe(event_queue.put_nowait, ("error", {
-                        "type": "error",
-                        "message": f"Search failed: {str(e)}"
-                    }))
-            
-            # Start analyzer in background thread
-            analyzer_thread = threading.Thread(target=run_analyzer, daemon=True)
-            analyzer_thread.start()
-            
-            # Stream events from queue as they arrive
-            while True:
-                try:
-                    # Wait for next event (with keep-alive)
-                    event_type, event_data = await asyncio.wait_for(event_queue.get(), timeout=10.0)
+                    if event_type == "lead":
+                        completed_count += 1
+                        payload = {
+                            "type": "lead",
+                            "data": lead_to_frontend(data),
+                            "progress": {
+                                "completed": completed_count,
+                                "target": request.targetResults
+                            }
+                        }
+                    elif event_type == "lead_update":
+                        payload = {"type": "lead_update", "data": lead_to_frontend(data)}
+                    elif event_type == "complete":
+                        payload = {
+                            "type": "complete",
+                            "analysisId": analysis_id,
+                            "totalFound": data.get("total_found", 0),
+                            "totalScanned": data.get("total_scanned", 0),
+                            "status": data.get("status", "completed"),
+                            "message": data.get("message", f"Found {data.get('total_found', 0)} leads")
+                        }
+                    else:
+                        payload = {"type": event_type, "analysisId": analysis_id, **data}
                     
-                    # Log the event
                     print(f"📤 Streaming event: {event_type}")
-                    
-                    # Yield the event immediately
-                    yield f"data: {json.dumps(event_data)}\n\n"
-                    await asyncio.sleep(0)  # Allow flush to client
+                    yield f"data: {json.dumps(payload)}\n\n"
                     
                     # If complete or error, stop streaming
                     if event_type in ("complete", "error"):
-                        break
-                except asyncio.TimeoutError:
+                        stream_finished = True
+                        return
+                
+                now = asyncio.get_running_loop().time()
+                if events:
+                    idle_since = now
+                elif now - idle_since >= 10.0:
+                    idle_since = now
+                    # Stop burning API quota once the browser tab is gone
+                    if await http_request.is_disconnected():
+                        print(f"🔌 Client disconnected - cancelling {analysis_id}")
+                        await asyncio.to_thread(job_queue.request_cancel, analysis_id, "client_disconnected")
+                        stream_finished = True
+                        return
+                    
                     # Keep-alive to prevent buffering/timeouts
                     yield ": keep-alive\n\n"
-                    await asyncio.sleep(0)
+                
+                await asyncio.sleep(0.5)
                     
         except Exception as e:
             print(f"Streaming error: {str(e)}")
@@ -500,6 +549,14 @@ async def bulk_search_stream(
                 "message": f"Stream error: {str(e)}"
             }
             yield f"data: {json.dumps(error_event)}\n\n"
+        finally:
+            # Client went away (generator closed) before the job finished: stop it
+            # (in a thread without awaiting: the SQLite write may wait on the lock,
+            # and a cancelled stream must not block the event loop)
+            if not stream_finished:
+                asyncio.get_running_loop().run_in_executor(
+                    None, job_queue.request_cancel, analysis_id, "client_disconnected"
+                )
     
     return StreamingResponse(
         event_generator(),
@@ -512,6 +569,28 @@ async def bulk_search_stream(
     )
 
 
+@app.get("/api/v1/debug/concurrency")
+async def debug_concurrency(current_user: dict = Depends(get_current_user)):
+    """
+    Current adaptive concurrency limits per external provider (PROTECTED)
+    
+    Shows the AIMD in-flight limit, in-flight and waiting calls, latency
+    and outcome counts for RapidAPI, PageSpeed, website fetches and Gemini,
+    plus the token-bucket rate limits and circuit breakers (of the API
+    process; every worker process has its own, reported in each job's
+    result) and the state of the job queue.
+    
+    Requires: Valid JWT token in Authorization header
+    """
+    return {
+        "providers": get_concurrency_controller().snapshot(),
+        "rate_limits": get_rate_limiter().snapshot(),
+        "circuit_breakers": get_circuit_breakers().snapshot(),
+        "jobs": get_job_queue().stats(),
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+
 @app.get("/api/v1/analyses")
 async def list_analyses(
     limit: int = Query(default=50, ge=1, le=100, description="Number of results to return"),
@@ -552,27 +631,129 @@ async def get_analysis_status(
     """
     Get analysis status by ID (PROTECTED)
     
-    Returns the current status and progress of a bulk analysis job.
+    Returns the current status and progress of a bulk analysis job and
+    the leads found so far (all leads once the job has finished).
     
     Requires: Valid JWT token in Authorization header
     """
     user_id = current_user["user_id"]
-    # TODO: Implement database query with user_id filter
-    # For now, return dummy response
+    job_queue = get_job_queue()
+    
+    job = await asyncio.to_thread(job_queue.get, analysis_id, user_id)
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No analysis with ID {analysis_id}"
+        )
+    
+    lead_rows = await asyncio.to_thread(job_queue.leads, analysis_id)
+    result = job["result"] or {}
+    checkpoint = job["checkpoint"] or {}
+    queue_position = None
+    if job["status"] == "queued":
+        queue_position = await asyncio.to_thread(job_queue.queue_position, analysis_id)
+    
+    def to_iso(timestamp: Optional[float]) -> Optional[str]:
+        return datetime.utcfromtimestamp(timestamp).isoformat() + "Z" if timestamp else None
+    
     return {
         "id": analysis_id,
-        "status": "processing",
+        "status": job["status"],
         "progress": {
-            "scanned": 0,
-            "found": 0,
-            "target": 0
+            "scanned": result.get("total_scanned", checkpoint.get("total_scanned", 0)),
+            "found": len(lead_rows) or result.get("total_found", 0),  # Event log purged after JOB_EVENT_RETENTION_HOURS
+            "target": job["params"]["target_results"],
+            "queuePosition": queue_position
         },
-        "leads": [],
-        "createdAt": datetime.utcnow().isoformat() + "Z",
-        "completedAt": None
+        "leads": [lead_to_frontend(lead_data) for lead_data in lead_rows],
+        "message": result.get("message") or job.get("error"),
+        "createdAt": to_iso(job["created_at"]),
+        "startedAt": to_iso(job["started_at"]),
+        "completedAt": to_iso(job["finished_at"])
     }
 
 
+@app.post("/api/v1/analyses/{analysis_id}/cancel")
+async def cancel_analysis(
+    analysis_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Cancel a queued or running bulk analysis job (PROTECTED)
+    
+    Queued jobs never start. Running jobs are stopped by their worker
+    within one heartbeat, aborting queued leads and in-flight PageSpeed /
+    Gemini calls. Leads already completed are kept.
+    
+    Requires: Valid JWT token in Authorization header
+    """
+    user_id = current_user["user_id"]
+    job_queue = get_job_queue()
+    if not await asyncio.to_thread(job_queue.get, analysis_id, user_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No analysis with ID {analysis_id}"
+        )
+    
+    status = await asyncio.to_thread(job_queue.request_cancel, analysis_id, "cancelled_by_user")
+    return {
+        "id": analysis_id,
+        "status": status
+    }
+
+
+@app.post("/api/v1/analyses/{analysis_id}/leads/{place_id}/full", response_model=BulkScanResponse, status_code=202)
+async def run_full_lead_analysis(
+    analysis_id: str,
+    place_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Queue the full analysis (PageSpeed + Gemini) of one lead of a bulk search (PROTECTED)
+    
+    Leads below PRESCORE_THRESHOLD are stored with local scores only
+    (status local_only, analysisTier "local"). This queues a one-lead job
+    that analyzes one of them completely in a worker process, overwrites
+    its stored row and replaces the lead in the bulk search's results
+    (lead_update event). Returns 202 with the job's ID; poll
+    GET /api/v1/analyses/{analysisId} of that job for the analyzed lead.
+    
+    Requires: Valid JWT token in Authorization header
+    """
+    user_id = current_user["user_id"]
+    job_queue = get_job_queue()
+    job = await asyncio.to_thread(job_queue.get, analysis_id, user_id)
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No analysis with ID {analysis_id}"
+        )
+    
+    leads = await asyncio.to_thread(job_queue.leads, analysis_id)
+    lead = next((lead for lead in leads if lead.get("google_maps_place_id") == place_id), None)
+    if lead is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No lead {place_id} in analysis {analysis_id}"
+        )
+    
+    job_id = str(uuid.uuid4())
+    print(f"🔬 Full analysis queued: {lead.get('company_name', 'Unknown')} ({analysis_id} -> job {job_id})")
+    try:
+        await asyncio.to_thread(enqueue_full_lead_analysis, job_id, user_id, analysis_id, lead)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    return BulkScanResponse(
+        analysisId=job_id,
+        status="queued",
+        totalFound=0,
+        totalScanned=0,
+        leads=[],
+        message=f"Full analysis queued - poll /api/v1/analyses/{job_id} for the result"
+    )
+
+
 @app.get("/api/v1/analyses/{analysis_id}/pdf")
 async def download_pdf_report(
     analysis_id: str,
@@ -0,0 +1,127 @@
+"""
+LeadScraper AI - Micro-Batching
+Collects concurrent single-item requests into batches for one provider call
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Groups items submitted by concurrent callers into batches
+
+    A batch is sent as soon as max_size items are pending, or max_wait
+    seconds after its first item arrived - whichever comes first. The
+    handler gets the batch's items and returns one result per item (same
+    order); each caller receives the result for its own item. A handler
+    that produces results one by one (e.g. from a streamed response) can
+    hand each to its caller early with deliver(index, result). If the
+    handler raises, every caller still waiting gets the exception.
+
+    A caller that is cancelled before its batch is sent is dropped from
+    it; once the batch is running, its result is simply discarded.
+
+    Must only be used from one event loop (the analyzer engine loop).
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any], Callable[[int, Any], None]], Awaitable[List[Any]]],
+        max_size: int = 10,
+        max_wait: float = 1.0,
+        name: str = "batch"
+    ):
+        """
+        Args:
+            handler: Processes one batch: (items, deliver) -> list of results
+            max_size: Items per batch (1 = every item is its own batch)
+            max_wait: Seconds to wait for a batch to fill up
+            name: Used in log messages
+        """
+        self.handler = handler
+        self.max_size = max(1, max_size)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+
+        self._pending: List[tuple] = []  # (item, future)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self._stats = {"batches": 0, "items": 0, "largest": 0, "failed_batches": 0}
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Add an item to the next batch and wait for its result
+
+        Args:
+            item: Whatever the handler expects
+
+        Returns:
+            The handler's result for this item
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send everything pending (still wanted by its caller) as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]):
+        self._stats["batches"] += 1
+        self._stats["items"] += len(batch)
+        self._stats["largest"] = max(self._stats["largest"], len(batch))
+        try:
+            results = await self.handler(
+                [item for item, _ in batch],
+                lambda index, result: self._deliver(batch[index][1], result)
+            )
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name} handler returned {len(results)} results for {len(batch)} items")
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            self._stats["failed_batches"] += 1
+            logger.warning(f"{self.name} of {len(batch)} failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            self._deliver(future, result)
+
+    @staticmethod
+    def _deliver(future: asyncio.Future, result: Any):
+        if not future.done():
+            future.set_result(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Batch counts and sizes of this process"""
+        stats = dict(self._stats)
+        stats["avg_size"] = round(stats["items"] / stats["batches"], 1) if stats["batches"] else 0.0
+        stats["pending"] = len(self._pending)
+        return {"max_size": self.max_size, "max_wait": self.max_wait, **stats}
@@ -0,0 +1,34 @@
+-- =====================================================
+-- SUPABASE Migration: Two-tier analysis
+-- Stores which tier produced a lead's scores
+-- =====================================================
+
+-- Step 1: Allow the 'local_only' status (lead below PRESCORE_THRESHOLD,
+-- scored from local signals only - full analysis available on demand)
+ALTER TABLE analyses
+DROP CONSTRAINT IF EXISTS analyses_status_check;
+
+ALTER TABLE analyses
+ADD CONSTRAINT analyses_status_check
+CHECK (status IN ('analyzing', 'completed', 'failed', 'local_only'));
+
+-- Step 2: Tier that produced the scores ('local' or 'full')
+ALTER TABLE analyses
+ADD COLUMN IF NOT EXISTS analysis_tier VARCHAR(10) CHECK (analysis_tier IN ('local', 'full'));
+
+-- Step 3: Local pre-score (NULL when the lead was not pre-scored)
+ALTER TABLE analyses
+ADD COLUMN IF NOT EXISTS prescore INTEGER CHECK (prescore >= 0 AND prescore <= 100);
+
+-- Step 4: Find leads still waiting for their full analysis
+CREATE INDEX IF NOT EXISTS idx_analyses_local_only
+ON analyses (bulk_analysis_id) WHERE status = 'local_only';
+
+-- =====================================================
+-- Verification Query (Run this to check)
+-- =====================================================
+
+-- Leads per tier
+SELECT analysis_tier, status, COUNT(*)
+FROM analyses
+GROUP BY analysis_tier, status;
@@ -0,0 +1,255 @@
+"""
+LeadScraper AI - Provider Rate Limiting
+Process-wide token buckets shared by every bulk search job
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, Mapping
+
+logger = logging.getLogger(__name__)
+
+# Defaults per provider: (requests per minute, burst)
+PROVIDER_DEFAULTS = {
+    "rapidapi": (60, 5),
+    "pagespeed": (400, 10),
+    "gemini": (60, 5),
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider's daily request cap is used up"""
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with an optional daily cap
+
+    Callers reserve a token and sleep until it becomes available, so
+    concurrent jobs are paced instead of bursting into provider quota
+    errors. Rate-limit response headers tighten the pace further while
+    the provider reports little remaining quota. A reservation whose
+    caller is cancelled while waiting is refunded, and callers that would
+    have to wait longer than max_wait fail fast instead of queueing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        daily_cap: int = 0,
+        max_wait: float = 60.0,
+        header_window: float = 3600.0
+    ):
+        self.name = name
+        self.rate = max(rate, 0.001)  # Tokens per second
+        self.burst = max(1, burst)
+        self.daily_cap = daily_cap  # 0 = unlimited
+        self.max_wait = max_wait  # Fail fast instead of pausing longer than this
+        self.header_window = header_window  # Only pace on quota windows up to this long (not monthly quotas)
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0  # Hard pause (quota exhausted / Retry-After)
+        self._header_rate: Optional[float] = None  # Pace derived from rate-limit headers
+        self._header_rate_until = 0.0
+        self._day = datetime.utcnow().date()
+        self._used_today = 0
+
+    def _current_rate(self, now: float) -> float:
+        if self._header_rate is not None and now < self._header_rate_until:
+            return min(self.rate, self._header_rate)
+        return self.rate
+
+    def _refill(self, now: float):
+        """Credit tokens for the time elapsed since the last update (at the rate in effect)"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._current_rate(now))
+        self._updated = now
+
+    def _reserve(self) -> float:
+        """Take one token (possibly in advance); returns seconds to wait before using it"""
+        with self._lock:
+            today = datetime.utcnow().date()
+            if today != self._day:
+                self._day = today
+                self._used_today = 0
+
+            if self.daily_cap and self._used_today >= self.daily_cap:
+                raise RateLimitExceeded(f"{self.name} daily cap of {self.daily_cap} requests reached")
+
+            now = time.monotonic()
+            if self._blocked_until - now > self.max_wait:
+                raise RateLimitExceeded(
+                    f"{self.name} quota exhausted - provider resets in {self._blocked_until - now:.0f}s"
+                )
+
+            self._refill(now)
+            rate = self._current_rate(now)
+
+            # The queue of earlier reservations counts against max_wait as well
+            tokens = self._tokens - 1
+            wait = max(-tokens / rate if tokens < 0 else 0.0, self._blocked_until - now)
+            if wait > self.max_wait:
+                raise RateLimitExceeded(
+                    f"{self.name} rate limit backlog too long - next request in {wait:.0f}s"
+                )
+
+            self._tokens = tokens
+            self._used_today += 1
+            return wait
+
+    def _refund(self):
+        """Give back a reservation that was never used (caller cancelled while waiting)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.burst, self._tokens + 1)
+            if self._used_today > 0:
+                self._used_today -= 1
+
+    async def acquire(self):
+        """
+        Wait (without blocking the event loop) until a request may be sent
+
+        Raises:
+            RateLimitExceeded: Daily cap used up, or the wait would exceed max_wait
+        """
+        wait = self._reserve()
+        if wait > 0:
+            logger.debug(f"⏳ {self.name} rate limit: waiting {wait:.2f}s")
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Deadline or job cancel: the request is never sent, so neither is its quota used
+                self._refund()
+                raise
+
+    def acquire_sync(self):
+        """Blocking variant of acquire() for synchronous callers"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def update_from_headers(self, headers: Mapping[str, str], status_code: Optional[int] = None):
+        """
+        Pace the bucket from provider rate-limit headers
+
+        Understands RapidAPI (x-ratelimit-requests-remaining / -reset), the
+        generic x-ratelimit-remaining / -reset pair and Retry-After.
+
+        Args:
+            headers: Response headers (case-insensitive mapping)
+            status_code: Response status (429 honours Retry-After)
+        """
+        lowered = {k.lower(): v for k, v in headers.items()}
+        remaining = _parse_float(lowered.get("x-ratelimit-requests-remaining", lowered.get("x-ratelimit-remaining")))
+        reset = _parse_float(lowered.get("x-ratelimit-requests-reset", lowered.get("x-ratelimit-reset")))
+        retry_after = _parse_float(lowered.get("retry-after"))
+
+        # Epoch timestamps instead of "seconds until reset"
+        if reset is not None and reset > 10 ** 9:
+            reset = max(0.0, reset - time.time())
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)  # Settle elapsed time at the old rate before re-pacing
+
+            if status_code == 429:
+                pause = retry_after if retry_after is not None else 1.0 / self.rate
+                self._blocked_until = max(self._blocked_until, now + pause)
+                self._tokens = min(self._tokens, 0.0)
+                logger.warning(f"🚦 {self.name} returned 429 - pausing for {pause:.1f}s")
+                return
+
+            if remaining is None:
+                return
+
+            if remaining <= 0:
+                pause = reset if reset is not None else 60.0
+                self._blocked_until = max(self._blocked_until, now + pause)
+                logger.warning(f"🚦 {self.name} quota exhausted - pausing for {pause:.1f}s")
+            elif reset and reset <= self.header_window:
+                # Spread the remaining quota evenly over the reset window
+                self._header_rate = remaining / reset
+                self._header_rate_until = now + reset
+            elif remaining <= self.burst:
+                logger.warning(f"🚦 {self.name} quota almost used up: {remaining:.0f} requests remaining")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state for the debug endpoint"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "rate_per_second": round(self._current_rate(now), 3),
+                "configured_rate_per_second": round(self.rate, 3),
+                "burst": self.burst,
+                "tokens": round(min(self.burst, self._tokens + (now - self._updated) * self._current_rate(now)), 2),
+                "paused_for": round(max(0.0, self._blocked_until - now), 1),
+                "daily_cap": self.daily_cap or None,
+                "used_today": self._used_today,
+            }
+
+
+class RateLimiter:
+    """
+    Registry of token buckets, one per provider
+
+    Configured from env per provider (RAPIDAPI_, PAGESPEED_, GEMINI_):
+      {PREFIX}_RATE_LIMIT_PER_SECOND (or {PREFIX}_RATE_LIMIT_PER_MINUTE)
+      {PREFIX}_RATE_BURST
+      {PREFIX}_DAILY_CAP (0 = unlimited)
+
+    Buckets live in process memory. When jobs run in several worker
+    processes, RATE_LIMIT_PROCESSES splits every limit evenly between them
+    so the processes together stay within the configured budget.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        processes = max(1, int(os.getenv("RATE_LIMIT_PROCESSES", 1)))
+        for name, (per_minute, burst) in PROVIDER_DEFAULTS.items():
+            prefix = name.upper()
+            per_second = os.getenv(f"{prefix}_RATE_LIMIT_PER_SECOND")
+            rate = float(per_second) if per_second else float(os.getenv(f"{prefix}_RATE_LIMIT_PER_MINUTE", per_minute)) / 60.0
+            rate = rate / processes
+            daily_cap = int(os.getenv(f"{prefix}_DAILY_CAP", 0))
+            self._buckets[name] = TokenBucket(
+                name=name,
+                rate=rate,
+                burst=max(1, int(os.getenv(f"{prefix}_RATE_BURST", burst)) // processes),
+                daily_cap=-(-daily_cap // processes),  # Round up so a small cap never becomes 0 (= unlimited)
+            )
+            logger.info(f"🚦 {name} rate limit: {rate:.2f} req/s, burst {self._buckets[name].burst}")
+
+    def bucket(self, provider: str) -> TokenBucket:
+        """Get the bucket for a provider ('rapidapi', 'pagespeed', 'gemini')"""
+        return self._buckets[provider]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current state of all buckets"""
+        return {name: bucket.snapshot() for name, bucket in self._buckets.items()}
+
+
+# Singleton instance
+_rate_limiter_instance = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Get or create the process-wide rate limiter"""
+    global _rate_limiter_instance
+    with _rate_limiter_lock:
+        if _rate_limiter_instance is None:
+            _rate_limiter_instance = RateLimiter()
+    return _rate_limiter_instance
@@ -0,0 +1,106 @@
+"""
+LeadScraper AI - Bulk Search Job Scheduler
+Fair multi-tenant admission and claim order for bulk search jobs
+"""
+
+import logging
+from typing import Any, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a user already has too many jobs waiting"""
+
+
+class FairScheduler:
+    """
+    Fairness rules for bulk search jobs
+
+    - At most max_concurrent_jobs run at once (across all workers)
+    - At most max_jobs_per_user run at once for a single user
+    - At most max_queued_per_user wait per user; further searches are rejected
+    - Waiting jobs are served round-robin across users - the user served
+      least recently goes first, FIFO per user - so one user queuing many
+      large searches cannot starve everyone else
+
+    The scheduler holds no job state: the durable job queue reads the
+    queued jobs inside its claim transaction and asks the scheduler which
+    one to start, so the same rules hold for any number of worker
+    processes. Queue positions are derived from the same order.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_jobs: int = 4,
+        max_jobs_per_user: int = 1,
+        max_queued_per_user: int = 5
+    ):
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.max_jobs_per_user = max(1, max_jobs_per_user)
+        self.max_queued_per_user = max(0, max_queued_per_user)
+
+    def admit(self, queued: int):
+        """
+        Check that a user may queue another job
+
+        Args:
+            queued: Jobs the user already has waiting
+
+        Raises:
+            QueueFullError: If the user already has max_queued_per_user jobs waiting
+        """
+        if queued >= self.max_queued_per_user:
+            raise QueueFullError(
+                f"Too many queued searches ({queued}) - wait for running searches to finish"
+            )
+
+    def next_job(self, running: int, candidates: List[Mapping[str, Any]]) -> Optional[str]:
+        """
+        Pick the next job to start
+
+        Args:
+            running: Jobs running right now (all users)
+            candidates: Queued jobs with id, user_id, created_at, user_running
+                (running jobs of that user) and last_claimed (latest claim
+                of that user, 0 if never served)
+
+        Returns:
+            Job ID, or None if the limits allow no job to start
+        """
+        if running >= self.max_concurrent_jobs:
+            return None
+
+        admissible = [job for job in candidates if job["user_running"] < self.max_jobs_per_user]
+        if not admissible:
+            return None
+
+        job = min(admissible, key=lambda job: (job["user_running"], job["last_claimed"], job["created_at"]))
+        return job["id"]
+
+    def positions(self, queued: List[Mapping[str, Any]]) -> Dict[str, int]:
+        """
+        1-based queue positions in claim order
+
+        Simulates the round-robin over users: least recently served user
+        first, one job per user per round, FIFO within a user.
+
+        Args:
+            queued: Queued jobs with id, user_id, created_at and last_claimed
+
+        Returns:
+            Job ID -> position
+        """
+        per_user: Dict[str, List[str]] = {}
+        for job in sorted(queued, key=lambda job: (job["last_claimed"], job["created_at"])):
+            per_user.setdefault(job["user_id"], []).append(job["id"])
+
+        positions: Dict[str, int] = {}
+        queues = list(per_user.values())
+        depth = 0
+        while any(depth < len(queue) for queue in queues):
+            for queue in queues:
+                if depth < len(queue):
+                    positions[queue[depth]] = len(positions) + 1
+            depth += 1
+        return positions
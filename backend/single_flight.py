@@ -0,0 +1,86 @@
+"""
+LeadScraper AI - Single-Flight Deduplication
+Concurrent requests for the same work share one in-flight computation
+"""
+
+import copy
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-flight computation and the number of callers waiting for it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Registry of in-flight computations by key
+
+    The first caller for a key starts the computation; callers arriving
+    while it runs attach to it and receive the same result (or exception).
+    Every caller gets its own deep copy, so nobody can modify what another
+    caller sees. Once the computation finishes, the key is free again.
+
+    A caller that is cancelled (e.g. its job was cancelled) detaches; the
+    computation is only cancelled when no caller is left waiting for it.
+
+    Must only be used from one event loop (the analyzer engine loop).
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"started": 0, "joined": 0}
+
+    async def run(self, key: Optional[str], factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory() once per key at a time
+
+        Args:
+            key: Deduplication key (None = always run, no sharing)
+            factory: Creates the computation's coroutine (only called for the first caller)
+
+        Returns:
+            Copy of the computation's result
+        """
+        if key is None:
+            return await factory()
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+            self._stats["started"] += 1
+        else:
+            self._stats["joined"] += 1
+            logger.debug(f"Joining in-flight computation: {key}")
+
+        flight.waiters += 1
+        try:
+            # Shield: one caller giving up must not cancel the computation for the others
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the result any more; later callers start afresh
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+        return copy.deepcopy(result)
+
+    def _finished(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # Mark retrieved even if every caller gave up
+
+    def snapshot(self) -> Dict[str, Any]:
+        """In-flight count and how often callers were deduplicated"""
+        return {"in_flight": len(self._flights), **self._stats}
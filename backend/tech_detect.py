@@ -0,0 +1,617 @@
+"""
+LeadScraper AI - Tech Stack Detection
+Local fingerprint engine (Wappalyzer-style) for the website fetch we already do
+"""
+
+import re
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Categories that count as an advertising / conversion pixel (has_ads_pixel)
+ADS_CATEGORIES = {"Advertising"}
+
+# Fingerprints per technology
+#   html:      literal substrings of the HTML (markup, script src, inline code; case-sensitive)
+#   generator: literal substrings of <meta name="generator" content="...">
+#   headers:   {lowercase header name: regex searched in its value ("" = header present)}
+#   cookies:   regexes for cookie names set by the response (full match)
+#   implies:   technologies that are present whenever this one is
+TECH_SIGNATURES: Dict[str, Dict[str, Any]] = {
+    # CMS
+    "WordPress": {
+        "category": "CMS",
+        "html": ["/wp-content/", "/wp-includes/", "/wp-json/"],
+        "generator": ["WordPress"],
+        "headers": {"link": r"rel=\"https://api\.w\.org/\"", "x-pingback": r"/xmlrpc\.php"},
+        "cookies": [r"wordpress_\w+", r"wp-settings-\d+"],
+        "implies": ["PHP"],
+    },
+    "Joomla": {
+        "category": "CMS",
+        "html": ["/media/jui/", "/media/system/js/core.js"],
+        "generator": ["Joomla!"],
+        "implies": ["PHP"],
+    },
+    "Drupal": {
+        "category": "CMS",
+        "html": ["/sites/default/files/", "drupal-settings-json", "Drupal.settings"],
+        "generator": ["Drupal"],
+        "headers": {"x-generator": r"Drupal", "x-drupal-cache": r""},
+        "implies": ["PHP"],
+    },
+    "TYPO3": {
+        "category": "CMS",
+        "html": ["/typo3conf/", "/typo3temp/"],
+        "generator": ["TYPO3"],
+        "implies": ["PHP"],
+    },
+    "Contao": {
+        "category": "CMS",
+        "html": ["/assets/contao/", "/system/modules/"],
+        "generator": ["Contao"],
+        "implies": ["PHP"],
+    },
+    "Craft CMS": {
+        "category": "CMS",
+        "headers": {"x-powered-by": r"Craft CMS"},
+        "cookies": [r"CraftSessionId"],
+        "implies": ["PHP"],
+    },
+    "Ghost": {
+        "category": "CMS",
+        "generator": ["Ghost"],
+        "headers": {"x-ghost-cache-status": r""},
+    },
+    # Website builders
+    "Wix": {
+        "category": "Website Builder",
+        "html": ["static.wixstatic.com", "static.parastorage.com"],
+        "generator": ["Wix.com"],
+        "headers": {"x-wix-request-id": r""},
+    },
+    "Squarespace": {
+        "category": "Website Builder",
+        "html": ["static1.squarespace.com", "Static.SQUARESPACE_CONTEXT"],
+        "headers": {"server": r"Squarespace"},
+    },
+    "Jimdo": {
+        "category": "Website Builder",
+        "html": ["assets.jimstatic.com", "jimdo.com", "jimdofree.com"],
+    },
+    "Webflow": {
+        "category": "Website Builder",
+        "html": ["data-wf-page=", "assets.website-files.com", "cdn.prod.website-files.com"],
+        "generator": ["Webflow"],
+    },
+    "Weebly": {
+        "category": "Website Builder",
+        "html": ["editmysite.com", "weebly.com/weebly/"],
+    },
+    "GoDaddy Website Builder": {
+        "category": "Website Builder",
+        "html": ["img1.wsimg.com"],
+        "generator": ["Go Daddy Website Builder", "Starfield Technologies"],
+    },
+    "Duda": {
+        "category": "Website Builder",
+        "html": ["dd-cdn.multiscreensite.com", "irp.cdn-website.com"],
+    },
+    "Elementor": {
+        "category": "Page Builder",
+        "html": ["/wp-content/plugins/elementor/", "elementor-kit-"],
+        "generator": ["Elementor"],
+        "implies": ["WordPress"],
+    },
+    "Divi": {
+        "category": "Page Builder",
+        "html": ["/wp-content/themes/Divi/", "et_pb_section"],
+        "implies": ["WordPress"],
+    },
+    "WPBakery": {
+        "category": "Page Builder",
+        "html": ["/wp-content/plugins/js_composer/", "vc_row wpb_row"],
+        "generator": ["WPBakery"],
+        "implies": ["WordPress"],
+    },
+    # E-commerce
+    "Shopify": {
+        "category": "E-commerce",
+        "html": ["cdn.shopify.com", "Shopify.theme"],
+        "headers": {"x-shopid": r"", "x-shopify-stage": r""},
+        "cookies": [r"_shopify_\w+"],
+    },
+    "WooCommerce": {
+        "category": "E-commerce",
+        "html": ["/wp-content/plugins/woocommerce/", "woocommerce-no-js"],
+        "generator": ["WooCommerce"],
+        "cookies": [r"woocommerce_\w+"],
+        "implies": ["WordPress"],
+    },
+    "Magento": {
+        "category": "E-commerce",
+        "html": ["Mage.Cookies", "text/x-magento-init"],
+        "cookies": [r"X-Magento-Vary"],
+        "implies": ["PHP"],
+    },
+    "Shopware": {
+        "category": "E-commerce",
+        "html": ["/themes/Frontend/Responsive/", "window.shopwareCsrfToken"],
+        "generator": ["Shopware"],
+        "cookies": [r"session-\d+", r"sw-states"],
+        "implies": ["PHP"],
+    },
+    "PrestaShop": {
+        "category": "E-commerce",
+        "html": ["var prestashop =", "var prestashop="],
+        "generator": ["PrestaShop"],
+        "cookies": [r"PrestaShop-\w+"],
+        "implies": ["PHP"],
+    },
+    "Wix Stores": {
+        "category": "E-commerce",
+        "html": ["wixstores"],
+        "implies": ["Wix"],
+    },
+    # JavaScript frameworks and libraries
+    "React": {
+        "category": "JavaScript Framework",
+        "html": ["data-reactroot", "react-dom.production.min.js", "/react.production.min.js"],
+    },
+    "Next.js": {
+        "category": "JavaScript Framework",
+        "html": ["/_next/static/", "__NEXT_DATA__"],
+        "headers": {"x-powered-by": r"Next\.js"},
+        "implies": ["React"],
+    },
+    "Vue.js": {
+        "category": "JavaScript Framework",
+        "html": ["/vue.js", "/vue.min.js", "/vue.global.prod.js", "/vue.runtime.", "data-v-app"],
+    },
+    "Nuxt.js": {
+        "category": "JavaScript Framework",
+        "html": ["/_nuxt/", "window.__NUXT__"],
+        "implies": ["Vue.js"],
+    },
+    "Angular": {
+        "category": "JavaScript Framework",
+        "html": ["ng-version=", "<app-root"],
+    },
+    "Gatsby": {
+        "category": "JavaScript Framework",
+        "html": ['id="___gatsby"'],
+        "generator": ["Gatsby"],
+        "implies": ["React"],
+    },
+    "jQuery": {
+        "category": "JavaScript Library",
+        "html": ["/jquery.js", "/jquery.min.js", "/jquery-3.", "/jquery-1.", "code.jquery.com", "jquery/jquery.js"],
+    },
+    "Alpine.js": {
+        "category": "JavaScript Library",
+        "html": ["/alpinejs", "/alpine.min.js"],
+    },
+    # CSS frameworks
+    "Bootstrap": {
+        "category": "CSS Framework",
+        "html": ["/bootstrap.min.css", "/bootstrap.css", "/bootstrap.min.js", "/bootstrap.bundle."],
+    },
+    "Tailwind CSS": {
+        "category": "CSS Framework",
+        "html": ["cdn.tailwindcss.com", "/tailwind.css", "/tailwind.min.css"],
+    },
+    "Foundation": {
+        "category": "CSS Framework",
+        "html": ["/foundation.min.css", "/foundation.css", "/foundation.min.js"],
+    },
+    # Analytics and tag management
+    "Google Analytics": {
+        "category": "Analytics",
+        "html": ["google-analytics.com/analytics.js", "google-analytics.com/ga.js", "gtag/js?id=G-", "gtag/js?id=UA-"],
+        "cookies": [r"_ga", r"_gid"],
+    },
+    "Google Tag Manager": {
+        "category": "Tag Manager",
+        "html": ["googletagmanager.com/gtm.js", "googletagmanager.com/ns.html"],
+    },
+    "Matomo": {
+        "category": "Analytics",
+        "html": ["/matomo.js", "/piwik.js", "_paq.push"],
+        "cookies": [r"_pk_id\.\w+"],
+    },
+    "Hotjar": {
+        "category": "Analytics",
+        "html": ["static.hotjar.com"],
+        "cookies": [r"_hjSessionUser_\d+"],
+    },
+    "Microsoft Clarity": {
+        "category": "Analytics",
+        "html": ["clarity.ms/tag/"],
+    },
+    "Plausible": {
+        "category": "Analytics",
+        "html": ["plausible.io/js/"],
+    },
+    # Advertising / conversion pixels
+    "Meta Pixel": {
+        "category": "Advertising",
+        "html": ["/fbevents.js", "fbq('init'", 'fbq("init"', "facebook.com/tr?id="],
+        "cookies": [r"_fbp"],
+    },
+    "Google Ads": {
+        "category": "Advertising",
+        "html": ["googleadservices.com/pagead/conversion", "gtag/js?id=AW-", "'config', 'AW-", '"config", "AW-'],
+        "cookies": [r"_gcl_au"],
+    },
+    "Google AdSense": {
+        "category": "Advertising",
+        "html": ["pagead2.googlesyndication.com", "adsbygoogle"],
+    },
+    "TikTok Pixel": {
+        "category": "Advertising",
+        "html": ["analytics.tiktok.com/i18n/pixel"],
+        "cookies": [r"_ttp"],
+    },
+    "LinkedIn Insight Tag": {
+        "category": "Advertising",
+        "html": ["snap.licdn.com/li.lms-analytics", "_linkedin_partner_id"],
+    },
+    "Pinterest Tag": {
+        "category": "Advertising",
+        "html": ["s.pinimg.com/ct/core.js", "pintrk('load'", 'pintrk("load"'],
+    },
+    "Microsoft Advertising": {
+        "category": "Advertising",
+        "html": ["bat.bing.com/bat.js"],
+        "cookies": [r"_uetsid", r"_uetvid"],
+    },
+    "Snap Pixel": {
+        "category": "Advertising",
+        "html": ["sc-static.net/scevent.min.js"],
+    },
+    "X Pixel": {
+        "category": "Advertising",
+        "html": ["static.ads-twitter.com/uwt.js"],
+    },
+    # Consent, widgets, fonts
+    "Cookiebot": {
+        "category": "Cookie Consent",
+        "html": ["consent.cookiebot.com"],
+        "cookies": [r"CookieConsent"],
+    },
+    "Usercentrics": {
+        "category": "Cookie Consent",
+        "html": ["app.usercentrics.eu", "privacy-proxy.usercentrics.eu"],
+    },
+    "Borlabs Cookie": {
+        "category": "Cookie Consent",
+        "html": ["/wp-content/plugins/borlabs-cookie/"],
+        "cookies": [r"borlabs-cookie"],
+        "implies": ["WordPress"],
+    },
+    "OneTrust": {
+        "category": "Cookie Consent",
+        "html": ["cdn.cookielaw.org", "optanon-category"],
+        "cookies": [r"OptanonConsent"],
+    },
+    "Google Fonts": {
+        "category": "Font",
+        "html": ["fonts.googleapis.com", "fonts.gstatic.com"],
+    },
+    "Font Awesome": {
+        "category": "Font",
+        "html": ["/font-awesome.min.css", "/font-awesome.css", "/fontawesome.min.css", "kit.fontawesome.com"],
+    },
+    "Google Maps": {
+        "category": "Widget",
+        "html": ["maps.googleapis.com/maps/api/js", "google.com/maps/embed"],
+    },
+    "reCAPTCHA": {
+        "category": "Security",
+        "html": ["google.com/recaptcha/", "g-recaptcha"],
+    },
+    "Calendly": {
+        "category": "Booking",
+        "html": ["assets.calendly.com", "calendly-inline-widget"],
+    },
+    "Doctolib": {
+        "category": "Booking",
+        "html": ["doctolib.de", "doctolib.ch", "doctolib.fr"],
+    },
+    "OpenTable": {
+        "category": "Booking",
+        "html": ["opentable.com/widget", "opentable.de/widget"],
+    },
+    "Tawk.to": {
+        "category": "Live Chat",
+        "html": ["embed.tawk.to"],
+    },
+    # Servers, languages, CDNs (response headers)
+    "Nginx": {
+        "category": "Web Server",
+        "headers": {"server": r"(?i:nginx)"},
+    },
+    "Apache": {
+        "category": "Web Server",
+        "headers": {"server": r"(?i:apache)"},
+    },
+    "LiteSpeed": {
+        "category": "Web Server",
+        "headers": {"server": r"(?i:litespeed)"},
+    },
+    "Microsoft IIS": {
+        "category": "Web Server",
+        "headers": {"server": r"Microsoft-IIS"},
+    },
+    "PHP": {
+        "category": "Programming Language",
+        "headers": {"x-powered-by": r"PHP"},
+        "cookies": [r"PHPSESSID"],
+    },
+    "ASP.NET": {
+        "category": "Programming Language",
+        "html": ["__VIEWSTATE"],
+        "headers": {"x-powered-by": r"ASP\.NET", "x-aspnet-version": r""},
+        "cookies": [r"ASP\.NET_SessionId", r"\.AspNetCore\.\w+"],
+    },
+    "Cloudflare": {
+        "category": "CDN",
+        "headers": {"server": r"cloudflare", "cf-ray": r""},
+        "cookies": [r"__cf_bm", r"__cfduid"],
+    },
+    "Fastly": {
+        "category": "CDN",
+        "headers": {"x-served-by": r"cache-", "via": r"varnish"},
+    },
+    "Amazon CloudFront": {
+        "category": "CDN",
+        "headers": {"x-amz-cf-id": r"", "via": r"CloudFront"},
+    },
+    "Vercel": {
+        "category": "Hosting",
+        "headers": {"server": r"Vercel", "x-vercel-id": r""},
+    },
+    "Netlify": {
+        "category": "Hosting",
+        "headers": {"server": r"Netlify", "x-nf-request-id": r""},
+    },
+}
+
+# <meta name="generator" ...> is found via these literals, its content is matched against "generator"
+_GENERATOR_LITERALS = ('name="generator"', "name='generator'", "name=generator")
+_GENERATOR_CONTENT = re.compile(r"content=[\"']?([^\"'>]*)", re.IGNORECASE)
+
+# Characters an anchor may start at, rarest in typical HTML first (see _LiteralMatcher)
+_ANCHOR_CHARS = "_(?:/.=-<"
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex matching any of the words, factored as a prefix trie
+
+    The regex engine then decides on one character per trie level
+    instead of trying every word at every position; at each node the
+    longer continuation is tried first, so the longest word matches.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            return f"(?:{group})?"
+        return group
+
+    return emit(trie)
+
+
+class _LiteralMatcher:
+    """
+    Finds which of many literals occur in a text in one regex pass
+
+    Aho-Corasick in spirit: the engine only scans for short anchors (the
+    tail of each literal from its rarest character on, e.g. ".shopify.com"
+    for "cdn.shopify.com"), compiled into one trie regex. Most positions
+    are then rejected by a single character check; only at an anchor hit
+    are the literals sharing that anchor compared in full (startswith at
+    the hit position, no copy of the text).
+    """
+
+    def __init__(self, literals: Iterable[str]):
+        """
+        Args:
+            literals: Substrings to look for (case-sensitive)
+        """
+        # anchor -> [(literal, offset of the anchor inside the literal)]
+        anchors: Dict[str, List[Tuple[str, int]]] = {}
+        for literal in set(literals):
+            offset = self._anchor_offset(literal)
+            anchors.setdefault(literal[offset:], []).append((literal, offset))
+
+        # The trie matches the longest anchor at a position: check anchors that are prefixes of it too
+        self._candidates: Dict[str, List[Tuple[str, int]]] = {
+            anchor: [entry for other, entries in anchors.items() if anchor.startswith(other) for entry in entries]
+            for anchor in anchors
+        }
+        self._regex = re.compile(trie_pattern(anchors)) if anchors else None
+
+    @property
+    def anchors(self) -> List[str]:
+        """Anchors the text is scanned for (for scanners that embed them in their own single pass)"""
+        return list(self._candidates)
+
+    @staticmethod
+    def _anchor_offset(literal: str) -> int:
+        for char in _ANCHOR_CHARS:
+            index = literal.find(char)
+            if index != -1 and len(literal) - index >= 3:
+                return index
+        return 0
+
+    def scan(self, text: str) -> Dict[str, int]:
+        """
+        Args:
+            text: Text to search (scanned once)
+
+        Returns:
+            Found literals -> position of their first occurrence
+        """
+        found: Dict[str, int] = {}
+        if self._regex is None or not text:
+            return found
+
+        search = self._regex.search
+        match = search(text)
+        while match is not None:
+            position = match.start()
+            self.resolve(text, match.group(), position, found)
+            # Resume right after the hit's start: anchors may overlap
+            match = search(text, position + 1)
+        return found
+
+    def resolve(self, text: str, anchor: str, position: int, found: Dict[str, int]):
+        """
+        Compare the literals of an anchor hit in full
+
+        Args:
+            text: Scanned text
+            anchor: Matched anchor (one of anchors)
+            position: Where the anchor starts in text
+            found: Found literals -> position (updated)
+        """
+        for literal, offset in self._candidates[anchor]:
+            start = position - offset
+            if literal not in found and start >= 0 and text.startswith(literal, start):
+                found[literal] = start
+
+
+class TechDetector:
+    """
+    Detects a website's technologies from data the audit fetch already has
+
+    All HTML signatures are matched in a single pass over the page
+    (_LiteralMatcher), so adding signatures does not add scans; response
+    headers and cookie names are few and checked directly. Purely local:
+    no requests, no model calls.
+    """
+
+    def __init__(self, signatures: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Args:
+            signatures: Fingerprints per technology (default: TECH_SIGNATURES)
+        """
+        self.signatures = signatures or TECH_SIGNATURES
+        self._order = {tech: index for index, tech in enumerate(self.signatures)}
+
+        self._html_techs: Dict[str, List[str]] = {}  # literal -> technologies
+        self._generator: List[Tuple[str, str]] = []  # (literal, technology)
+        self._headers: Dict[str, List[Tuple[str, re.Pattern]]] = {}  # header -> [(technology, regex)]
+        self._cookies: List[Tuple[str, re.Pattern]] = []
+        for tech, signature in self.signatures.items():
+            for literal in signature.get("html", []):
+                self._html_techs.setdefault(literal, []).append(tech)
+            self._generator.extend((literal, tech) for literal in signature.get("generator", []))
+            for header, pattern in signature.get("headers", {}).items():
+                self._headers.setdefault(header, []).append((tech, re.compile(pattern)))
+            self._cookies.extend((tech, re.compile(pattern)) for pattern in signature.get("cookies", []))
+
+        self._html = _LiteralMatcher(list(self._html_techs) + list(_GENERATOR_LITERALS))
+
+    @property
+    def html_matcher(self) -> _LiteralMatcher:
+        """Matcher of all HTML literals (for scanners that embed it in their own single pass)"""
+        return self._html
+
+    def detect(
+        self,
+        html: str,
+        headers: Iterable[Tuple[str, str]] = (),
+        html_hits: Optional[Dict[str, int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Match all signatures against a fetched page
+
+        Args:
+            html: Page HTML (as read for the audit; may be empty)
+            headers: Response headers as (name, value) pairs, repeated
+                names (Set-Cookie) included
+            html_hits: Literals already found by a scan that embedded
+                html_matcher (the HTML is then not scanned again)
+
+        Returns:
+            Dict with tech_stack (names in signature order), tech_categories
+            (name -> category) and has_ads_pixel
+        """
+        found: Dict[str, None] = {}
+
+        if html_hits is None:
+            html_hits = self._html.scan(html)
+        for literal, position in html_hits.items():
+            if literal in _GENERATOR_LITERALS:
+                self._match_generator(html, position, found)
+            else:
+                found.update(dict.fromkeys(self._html_techs[literal]))
+
+        for name, value in headers:
+            name = name.lower()
+            for tech, regex in self._headers.get(name, ()):
+                if regex.search(value):
+                    found[tech] = None
+            if name == "set-cookie":
+                cookie = value.split("=", 1)[0].strip()
+                for tech, regex in self._cookies:
+                    if regex.fullmatch(cookie):
+                        found[tech] = None
+
+        # Add implied technologies (e.g. WooCommerce -> WordPress -> PHP)
+        pending = list(found)
+        while pending:
+            for implied in self.signatures.get(pending.pop(), {}).get("implies", []):
+                if implied not in found:
+                    found[implied] = None
+                    pending.append(implied)
+
+        tech_stack = sorted(found, key=lambda tech: self._order.get(tech, len(self._order)))
+        categories = {tech: self.signatures.get(tech, {}).get("category", "Other") for tech in tech_stack}
+        return {
+            "tech_stack": tech_stack,
+            "tech_categories": categories,
+            "has_ads_pixel": any(category in ADS_CATEGORIES for category in categories.values()),
+        }
+
+    def _match_generator(self, html: str, position: int, found: Dict[str, None]):
+        """Match the content of the <meta name="generator"> tag around position"""
+        start = html.rfind("<", 0, position)
+        end = html.find(">", position)
+        if start == -1 or end == -1:
+            return
+        content = _GENERATOR_CONTENT.search(html, start, end)
+        if content:
+            for literal, tech in self._generator:
+                if literal in content.group(1):
+                    found[tech] = None
+
+
+# Singleton instance
+_detector_instance = None
+
+
+def get_tech_detector() -> TechDetector:
+    """
+    Get or create the TechDetector singleton (signatures compiled once)
+
+    Returns:
+        TechDetector instance
+    """
+    global _detector_instance
+    if _detector_instance is None:
+        _detector_instance = TechDetector()
+    return _detector_instance
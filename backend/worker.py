@@ -0,0 +1,294 @@
+"""
+LeadScraper AI - Job Worker
+Runs queued bulk searches in separate processes
+
+Usage:
+    python worker.py                 # MAX_CONCURRENT_JOBS worker processes
+    python worker.py --processes 2
+"""
+
+import os
+import time
+import socket
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from cancellation import CancellationToken
+from job_queue import get_job_queue, job_summary, LeaseLostError, KIND_FULL_LEAD
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """
+    Claims jobs from the durable queue and runs them with DeepAnalyzer
+
+    One job at a time per worker (run several worker processes for
+    parallelism). While a job runs, a heartbeat thread renews its lease,
+    stores the analyzer's latest resume checkpoint and turns cancellation
+    requests from the API into the job's CancellationToken.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.queue = get_job_queue()
+        self.heartbeat_interval = float(os.getenv("JOB_HEARTBEAT_INTERVAL", 5))
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", 1))
+        self._stopping = threading.Event()
+        self._current_token: Optional[CancellationToken] = None
+
+    def stop(self):
+        """Stop after the current job (which is cancelled and handed back to the queue)"""
+        self._stopping.set()
+        token = self._current_token
+        if token is not None:
+            token.cancel("worker_shutdown")
+
+    def run_forever(self):
+        """Claim and run jobs until stop() is called"""
+        from analyzer import get_analyzer
+        analyzer = get_analyzer()
+        try:
+            analyzer.warm_up()
+        except Exception as e:
+            logger.warning(f"Connection warm-up failed: {str(e)}")
+
+        print(f"👷 Worker {self.worker_id} ready")
+        while not self._stopping.is_set():
+            try:
+                job = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Failed to claim job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._stopping.wait(self.poll_interval)
+                continue
+
+            self.run_job(analyzer, job)
+        print(f"👷 Worker {self.worker_id} stopped")
+
+    def run_job(self, analyzer, job: Dict[str, Any]):
+        """
+        Run one claimed job to completion (or until cancelled / lease lost)
+
+        Args:
+            analyzer: DeepAnalyzer instance
+            job: Job dict from JobQueue.claim()
+        """
+        job_id = job["id"]
+        params = job["params"]
+        target_results = params["target_results"]
+
+        token = CancellationToken()
+        self._current_token = token
+        if self._stopping.is_set():
+            token.cancel("worker_shutdown")
+
+        # Leads found before a restart are already stored as events
+        previous_leads = self.queue.leads(job_id)
+        latest_checkpoint = [job["checkpoint"]]
+        finished = threading.Event()
+
+        def on_lead(lead_data: Dict[str, Any]):
+            self.queue.add_event(job_id, "lead", lead_data)
+
+        def on_progress(checkpoint: Dict[str, Any]):
+            latest_checkpoint[0] = checkpoint
+
+        def heartbeat():
+            while not finished.wait(self.heartbeat_interval):
+                try:
+                    cancel_reason = self.queue.heartbeat(job_id, self.worker_id, checkpoint=latest_checkpoint[0])
+                except LeaseLostError as e:
+                    logger.warning(str(e))
+                    token.cancel("lease_lost")
+                    return
+                except Exception as e:
+                    logger.error(f"Heartbeat failed for job {job_id}: {str(e)}")
+                    continue
+                if cancel_reason:
+                    token.cancel(cancel_reason)
+
+        heartbeat_thread = threading.Thread(target=heartbeat, name=f"heartbeat-{job_id[:8]}", daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            if previous_leads:
+                print(f"⏯️  Resuming job {job_id}: {len(previous_leads)}/{target_results} leads already found")
+
+            if len(previous_leads) >= target_results:
+                result = {"total_found": 0, "total_scanned": 0, "pages_fetched": 0, "status": "completed", "stop_reason": None}
+            elif params.get("kind") == KIND_FULL_LEAD:
+                result = self._run_full_lead(analyzer, job, on_lead)
+            else:
+                result = analyzer.process_bulk_search(
+                    industry=params["industry"],
+                    location=params["location"],
+                    target_results=target_results - len(previous_leads),
+                    filters=params.get("filters") or {},
+                    bulk_analysis_id=job_id,
+                    stream_callback=on_lead,
+                    user_id=job["user_id"],
+                    cancel_token=token,
+                    resume_from=job["checkpoint"],
+                    progress_callback=on_progress,
+                    max_seconds_per_lead=params.get("max_seconds_per_lead"),
+                    refresh_pagespeed=params.get("refresh_pagespeed", False),
+                    full_analysis=params.get("full_analysis", False)
+                )
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            requeued = self.queue.fail(job_id, self.worker_id, str(e), checkpoint=latest_checkpoint[0])
+            print(f"❌ Job {job_id} failed{' - requeued' if requeued else ''}: {str(e)}")
+            return
+        finally:
+            finished.set()
+            self._current_token = None
+
+        if token.reason == "lease_lost":
+            # Another worker took over; its result wins
+            return
+        if token.reason == "worker_shutdown":
+            self.queue.release(job_id, self.worker_id, checkpoint=latest_checkpoint[0])
+            print(f"⏸️  Job {job_id} handed back to the queue")
+            return
+
+        self.queue.finish(job_id, self.worker_id, result["status"], self._summarize(result, previous_leads, target_results))
+
+    def _run_full_lead(self, analyzer, job: Dict[str, Any], on_lead) -> Dict[str, Any]:
+        """
+        Fully analyze one lead of a bulk search (job kind KIND_FULL_LEAD)
+
+        The analysis replaces the lead in the bulk search's results
+        (lead_update event on that job) and is this job's only lead.
+        """
+        params = job["params"]
+        print(f"🔬 Full analysis on demand: {params['map_data'].get('name', 'Unknown')} ({params['analysis_id']})")
+        analysis = analyzer.analyze_single(
+            url=params.get("url"),
+            map_data=params["map_data"],
+            bulk_analysis_id=params["analysis_id"],
+            industry=params.get("industry"),
+            user_id=job["user_id"],
+            full_analysis=True
+        )
+        # Parent first: once the lead event exists a restarted job counts as done
+        self.queue.add_event(params["analysis_id"], "lead_update", analysis)
+        on_lead(analysis)
+        return {
+            "total_found": 1,
+            "total_scanned": 1,
+            "pages_fetched": 0,
+            "status": "completed",
+            "stop_reason": None,
+            "message": f"Full analysis of {params['map_data'].get('name', 'Unknown')} completed",
+        }
+
+    @staticmethod
+    def _summarize(result: Dict[str, Any], previous_leads: List[Dict], target_results: int) -> Dict[str, Any]:
+        """Job summary across restarts (leads themselves are stored as events)"""
+        total_found = len(previous_leads) + result["total_found"]
+        status = "completed" if total_found >= target_results else result["status"]
+
+        if not previous_leads:
+            message = result.get("message")
+        elif status == "completed":
+            message = f"Found {total_found}/{target_results} leads"
+        elif status == "cancelled":
+            message = f"Search cancelled: found {total_found}/{target_results} leads"
+        else:
+            message = f"Partial results: found {total_found}/{target_results} leads ({result.get('stop_reason') or 'insufficient_results'})"
+
+        return job_summary(status, message, total_found, result["total_scanned"], result["pages_fetched"], result)
+
+
+def _worker_process(process_count: int):
+    """Entry point of one worker process"""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "info").upper())
+
+    # Every process has its own token buckets: split the provider budget between them
+    os.environ.setdefault("RATE_LIMIT_PROCESSES", str(process_count))
+
+    worker = JobWorker()
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run_forever()
+
+
+def start_worker_processes(count: int, daemon: bool = False) -> List[multiprocessing.Process]:
+    """
+    Start worker processes
+
+    Args:
+        count: Number of processes (= jobs running in parallel)
+        daemon: Tie the processes to the parent (used when the API embeds the workers)
+
+    Returns:
+        Started processes
+    """
+    return [_spawn_worker(index, count, daemon) for index in range(count)]
+
+
+def _spawn_worker(index: int, process_count: int, daemon: bool = False) -> multiprocessing.Process:
+    process = multiprocessing.Process(
+        target=_worker_process,
+        args=(process_count,),
+        name=f"job-worker-{index}",
+        daemon=daemon
+    )
+    process.start()
+    return process
+
+
+def stop_worker_processes(processes: List[multiprocessing.Process], timeout: float = 30.0):
+    """Ask workers to hand back their jobs and exit; kill stragglers after timeout"""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()  # SIGTERM -> JobWorker.stop()
+
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LeadScraper AI job worker")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=int(os.getenv("MAX_CONCURRENT_JOBS", 4)),
+        help="Number of worker processes (default: MAX_CONCURRENT_JOBS)"
+    )
+    args = parser.parse_args()
+
+    print(f"Starting {args.processes} job worker process(es)")
+    processes = start_worker_processes(args.processes)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    # Restart crashed workers; their jobs are resumed once the lease expires
+    while not stopping.wait(5):
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning(f"Worker process {process.name} exited ({process.exitcode}) - restarting")
+                processes[index] = _spawn_worker(index, len(processes))
+
+    stop_worker_processes(processes)
+
+
+if __name__ == "__main__":
+    main()